@@ -8,6 +8,29 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set. Put it in a .env file or environment.")
+# async endpoints (database.get_async_db) connect here; by default DATABASE_URL with its driver
+# swapped for asyncpg / aiosqlite. Set it when the URL carries driver-specific options (sslmode=...)
+DATABASE_ASYNC_URL = os.getenv("DATABASE_ASYNC_URL", "")
+
+# optional read replica for the list/get endpoints (app.utils.read_routing); empty: everything on
+# DATABASE_URL. DATABASE_READ_ASYNC_URL works like DATABASE_ASYNC_URL, for the replica
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+DATABASE_READ_ASYNC_URL = os.getenv("DATABASE_READ_ASYNC_URL", "")
+# after a client's POST/PUT/PATCH/DELETE, its reads stay on the primary this many seconds
+# (read-your-writes while the replica catches up; keep it above the usual replication lag)
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+# once the replica cannot be reached, reads go to the primary this long before it is tried again
+READ_REPLICA_RETRY_SECONDS = float(os.getenv("READ_REPLICA_RETRY_SECONDS", "30"))
+
+# connection pool of each engine (sync and async, per worker process): persistent connections,
+# extra ones allowed under load, seconds to wait for a free one before failing, and seconds
+# after which a connection is replaced (-1: never). Live numbers: GET /admin/metrics/pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+# PostgreSQL statement_timeout for every connection, in ms (0: none; ignored on SQLite)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
 
 SMTP_HOST = os.getenv("SMTP_HOST", "")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
@@ -17,8 +40,93 @@ EMAIL_FROM = os.getenv("EMAIL_FROM", "Nidec MIS <noreply@nidec.local>")
 EMAIL_TO_DEFAULT = [
     e.strip() for e in os.getenv("EMAIL_TO_DEFAULT", "").split(",") if e.strip()
 ]
+# "false" for a relay without TLS (e.g. a local aiosmtpd); login only happens when SMTP_USER is set
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# the email worker reuses one SMTP session for this many messages before reconnecting
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+
+# email outbox (app.utils.outbox), delivered by `python -m app.scripts.email_worker`: rows claimed
+# per batch, seconds between polls of an empty queue, and how long a claim is leased to a worker
+# (keep it above a batch's worst-case send time, or a slow batch may be sent twice)
+EMAIL_OUTBOX_BATCH = int(os.getenv("EMAIL_OUTBOX_BATCH", "50"))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "2"))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", "600"))
+# failed sends are retried after BACKOFF seconds, doubling per attempt up to BACKOFF_MAX; after
+# MAX_ATTEMPTS (or a permanent 5xx answer) the row is parked as "dead"
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+EMAIL_OUTBOX_BACKOFF_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_SECONDS", "30"))
+EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("EMAIL_OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+# sent rows are deleted by the worker after this many days (dead ones are kept for inspection)
+EMAIL_OUTBOX_KEEP_DAYS = int(os.getenv("EMAIL_OUTBOX_KEEP_DAYS", "7"))
+
+# notification delivery per kind (app.utils.digest): "immediate" queues one email per event,
+# "digest" folds events into one summary per recipient set every NOTIFY_DIGEST_SECONDS
+# (repeated changes to an item collapse into its net change). Both default to immediate;
+# "digest" suits high-volume stock changes, low-stock alerts are better kept immediate
+NOTIFY_STOCK_CHANGES = os.getenv("NOTIFY_STOCK_CHANGES", "immediate").lower()
+NOTIFY_LOW_STOCK = os.getenv("NOTIFY_LOW_STOCK", "immediate").lower()
+NOTIFY_DIGEST_SECONDS = float(os.getenv("NOTIFY_DIGEST_SECONDS", "300"))
+
 JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")  # change in prod
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
 
 ACCESS_TOKEN_EXPIRE = timedelta(minutes=JWT_EXPIRE_MINUTES)
+
+# GET /dashboard/summary keeps its result in-process for this many seconds (0 disables)
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "5"))
+
+# category low-stock alerts (app.utils.low_stock): a category is LOW below its buffer and CRITICAL
+# below CRITICAL_RATIO x buffer (the dashboard's buckets). To ease back a level the total must climb
+# HYSTERESIS x buffer past the threshold, so a total hovering at the buffer does not flap.
+# The email worker re-evaluates every category each EVAL_SECONDS (0: only after writes)
+LOW_STOCK_CRITICAL_RATIO = float(os.getenv("LOW_STOCK_CRITICAL_RATIO", "0.5"))
+LOW_STOCK_HYSTERESIS = float(os.getenv("LOW_STOCK_HYSTERESIS", "0.1"))
+LOW_STOCK_EVAL_SECONDS = float(os.getenv("LOW_STOCK_EVAL_SECONDS", "60"))
+
+# PATCH /items/{id}/adjust: set to "false" to reject adjustments that would take quantity below 0
+STOCK_ALLOW_NEGATIVE = os.getenv("STOCK_ALLOW_NEGATIVE", "true").lower() in ("1", "true", "yes")
+
+# item code allocation: reuse numbers freed by deleted items before taking counter+1
+ITEM_CODE_FILL_GAPS = os.getenv("ITEM_CODE_FILL_GAPS", "true").lower() in ("1", "true", "yes")
+
+# movement rollups: transactions younger than this are left for the next refresh, so a
+# ledger row whose id was taken before a slower, still-open transaction commits is not skipped
+ROLLUP_SAFETY_LAG_SECONDS = int(os.getenv("ROLLUP_SAFETY_LAG_SECONDS", "5"))
+# most ledger rows a read endpoint folds in before answering (the backfill CLI has no cap)
+ROLLUP_MAX_CATCHUP = int(os.getenv("ROLLUP_MAX_CATCHUP", "50000"))
+
+# ledger archival (python -m app.scripts.archive_ledger): transactions older than this many
+# whole months are moved to gzip NDJSON files under LEDGER_ARCHIVE_DIR, one folder per month
+LEDGER_ARCHIVE_DIR = os.getenv("LEDGER_ARCHIVE_DIR", "archive/ledger")
+LEDGER_ARCHIVE_AFTER_MONTHS = int(os.getenv("LEDGER_ARCHIVE_AFTER_MONTHS", "12"))
+
+# Cache-Control sent with the ETag on catalog GETs (items, categories): clients may keep the
+# body but must revalidate, which costs a 304 while the catalog version is unchanged
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "private, no-cache")
+
+# in-process category cache (app.utils.category_cache): max entries, and how often a lookup
+# re-reads the shared categories version to notice writes made by other workers
+CATEGORY_CACHE_SIZE = int(os.getenv("CATEGORY_CACHE_SIZE", "1024"))
+CATEGORY_CACHE_CHECK_SECONDS = float(os.getenv("CATEGORY_CACHE_CHECK_SECONDS", "1"))
+
+# notification recipient cache (app.utils.recipient_cache): how often a lookup re-reads the
+# shared recipients version to notice changes made through another worker
+RECIPIENT_CACHE_CHECK_SECONDS = float(os.getenv("RECIPIENT_CACHE_CHECK_SECONDS", "5"))
+
+# get_current_user principal cache (app.utils.user_cache): max entries, and how long an entry
+# is trusted before the users row is read again (0 disables the cache)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+# "true": take user id and admin flag from the signed token claims, with no DB lookup at all.
+# A demoted or deleted user then keeps their rights until the token expires (JWT_EXPIRE_MINUTES)
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# password hashing/verification (bcrypt) runs in its own pool, so a login storm cannot occupy
+# the shared request threadpool: worker threads, and how many more logins may wait for one
+# before new ones are turned away with 503 + Retry-After
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+# bcrypt cost of new hashes; stored hashes with a different cost are re-hashed at the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
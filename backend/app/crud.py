@@ -1,9 +1,21 @@
-from sqlalchemy import select, func
+from datetime import datetime
+from typing import Callable
+from sqlalchemy import select, insert, update, delete, case, func, or_, and_, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app import models, schemas
+from app import config, models, schemas
+from app.utils.search import item_search
+from app.utils.codes import release_item_codes
+from app.utils import catalog
 
 # ---- Items ----
-def create_item(db: Session, payload: schemas.ItemCreate) -> models.Item:
+# The write functions below take an optional notify callback. It runs in the write's own
+# transaction, just before the commit, so whatever it queues (outbox emails, low-stock
+# state) commits or rolls back together with the write it reports on.
+
+def create_item(
+    db: Session, payload: schemas.ItemCreate, notify: Callable[[models.Item], None] | None = None
+) -> models.Item:
     item = models.Item(
         code=payload.code,
         name=payload.name,
@@ -11,67 +23,484 @@ def create_item(db: Session, payload: schemas.ItemCreate) -> models.Item:
         category_id=payload.category_id,  # use category_id
     )
     db.add(item)
+    _bump_category_totals(db, item.category_id, item.quantity or 0, 1)
+    catalog.bump(db)
+    if notify:
+        notify(item)
     db.commit()
     db.refresh(item)
     return item
 
+def _list_items_stmt(db: Session | AsyncSession, q: str | None, limit: int, offset: int):
+    stmt = select(models.Item)
+    if q and q.strip():
+        where, score = item_search(db, q)
+        stmt = stmt.where(where).order_by(score, models.Item.id.desc())
+    else:
+        stmt = stmt.order_by(models.Item.id.desc())
+    return stmt.limit(limit).offset(offset)
+
 def list_items(db: Session, q: str | None = None, limit: int = 50, offset: int = 0) -> list[models.Item]:
-    stmt = select(models.Item).order_by(models.Item.id.desc()).limit(limit).offset(offset)
-    if q:
-        like = f"%{q.lower()}%"
-        stmt = (
-            select(models.Item)
-            .where(
-                func.lower(models.Item.code).like(like) |
-                func.lower(models.Item.name).like(like)
-            )
-            .order_by(models.Item.id.desc())
-            .limit(limit).offset(offset)
-        )
-    return db.execute(stmt).scalars().all()
+    return db.execute(_list_items_stmt(db, q, limit, offset)).scalars().all()
+
+def _items_after_stmt(db: Session | AsyncSession, q: str | None, limit: int, after: tuple | None):
+    if q and q.strip():
+        where, score = item_search(db, q)
+        stmt = select(models.Item, score.label("score")).where(where)
+        if after is not None:
+            a_score, a_id = after
+            stmt = stmt.where(or_(score > a_score, and_(score == a_score, models.Item.id < a_id)))
+        return stmt.order_by(score, models.Item.id.desc()).limit(limit + 1)
+
+    stmt = select(models.Item).order_by(models.Item.id.desc()).limit(limit + 1)
+    if after is not None:
+        stmt = stmt.where(models.Item.id < after[0])
+    return stmt
+
+def _items_after_page(rows: list, ranked: bool, limit: int) -> tuple[list[models.Item], tuple | None]:
+    if ranked:
+        items = [r[0] for r in rows[:limit]]
+        if len(rows) > limit:
+            return items, (rows[limit - 1].score, items[-1].id)
+        return items, None
+    items = [r[0] for r in rows]
+    if len(items) > limit:
+        items = items[:limit]
+        return items, (items[-1].id,)
+    return items, None
+
+def list_items_after(
+    db: Session, q: str | None = None, limit: int = 50, after: tuple | None = None
+) -> tuple[list[models.Item], tuple | None]:
+    """
+    Keyset page over items. Without q the key is (id,) ordered id DESC; with q
+    it is (score, id) in search-rank order. Seeks straight past `after`
+    instead of counting off OFFSET rows. Returns the page and the key to
+    continue after (None on the last page).
+    """
+    rows = db.execute(_items_after_stmt(db, q, limit, after)).all()
+    return _items_after_page(rows, bool(q and q.strip()), limit)
 
 def get_item(db: Session, item_id: int) -> models.Item | None:
     return db.get(models.Item, item_id)
 
-def update_item(db: Session, item_id: int, payload: schemas.ItemUpdate) -> models.Item | None:
-    item = db.get(models.Item, item_id)
-    if not item:
+# async twins of the item reads above, for the endpoints on database.get_async_db
+async def list_items_async(db: AsyncSession, q: str | None = None, limit: int = 50, offset: int = 0) -> list[models.Item]:
+    return (await db.execute(_list_items_stmt(db, q, limit, offset))).scalars().all()
+
+async def list_items_after_async(
+    db: AsyncSession, q: str | None = None, limit: int = 50, after: tuple | None = None
+) -> tuple[list[models.Item], tuple | None]:
+    rows = (await db.execute(_items_after_stmt(db, q, limit, after))).all()
+    return _items_after_page(rows, bool(q and q.strip()), limit)
+
+async def get_item_async(db: AsyncSession, item_id: int) -> models.Item | None:
+    return await db.get(models.Item, item_id)
+
+def update_item(
+    db: Session,
+    item_id: int,
+    payload: schemas.ItemUpdate,
+    notify: Callable[[models.Item, int | None], None] | None = None,
+) -> models.Item | None:
+    """
+    The row is read under a write lock: quantity is written as an absolute
+    value, and the ledger row and category deltas are taken from the read, so
+    a concurrent adjust must not slip in between. notify gets (item, previous
+    category_id).
+    """
+    # the read is an UPDATE ... RETURNING rather than SELECT ... FOR UPDATE: it locks the
+    # row on PostgreSQL and also on SQLite, which ignores FOR UPDATE and starts no
+    # transaction for a plain SELECT
+    item = db.execute(
+        update(models.Item)
+        .where(models.Item.id == item_id)
+        .values(updated_at=func.now())
+        .returning(models.Item)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    ).scalar_one_or_none()
+    if item is None:
+        db.rollback()
         return None
+    old_cat, old_qty = item.category_id, item.quantity or 0
     if payload.name is not None:
         item.name = payload.name
     if payload.quantity is not None:
         item.quantity = payload.quantity
     if payload.category_id is not None:
         item.category_id = payload.category_id
+    new_qty = item.quantity or 0
+    if new_qty != old_qty:
+        # a quantity edit is a movement like any other: without its ledger row, as-of
+        # reads, rollups and closing snapshots would be off for any time before it
+        db.add(models.Transaction(item_id=item.id, qty_change=new_qty - old_qty, note="edit"))
+    if item.category_id == old_cat:
+        _bump_category_totals(db, old_cat, new_qty - old_qty, 0)
+    else:
+        _bump_category_totals(db, old_cat, -old_qty, -1)
+        _bump_category_totals(db, item.category_id, new_qty, 1)
+    quantity_only = new_qty != old_qty and payload.name is None and item.category_id == old_cat
+    if not quantity_only:
+        catalog.bump(db)
+    if notify:
+        notify(item, old_cat)
     db.commit()
+    if new_qty != old_qty:
+        catalog.stock_changed(db)
     db.refresh(item)
     return item
 
 def delete_item(db: Session, item_id: int) -> bool:
-    item = db.get(models.Item, item_id)
-    if not item:
-        return False
-    db.delete(item)
+    deleted, _ = delete_items(db, [item_id])
+    return bool(deleted)
+
+DELETE_CHUNK = 500
+
+def delete_items(
+    db: Session, ids: list[int], notify: Callable[[list[dict]], None] | None = None
+) -> tuple[list[dict], int]:
+    """
+    Set-based delete: DELETE FROM items WHERE id IN (...) RETURNING ..., in
+    chunks of DELETE_CHUNK ids, all in one transaction. No ORM objects are
+    loaded; the items' ledger rows go via the FK's ON DELETE CASCADE.
+    Category totals, the code free-list and item_deletions (read by the
+    point-in-time queries) are updated from the RETURNING rows.
+
+    Returns (deleted rows as dicts: id/code/name/quantity/category_id,
+    number of transactions removed by the cascade).
+    """
+    ids = list(dict.fromkeys(int(i) for i in ids))
+    deleted: list[dict] = []
+    tx_count = 0
+    for lo in range(0, len(ids), DELETE_CHUNK):
+        chunk = ids[lo:lo + DELETE_CHUNK]
+        tx_count += db.execute(
+            select(func.count(models.Transaction.id)).where(models.Transaction.item_id.in_(chunk))
+        ).scalar_one()
+        rows = db.execute(
+            delete(models.Item)
+            .where(models.Item.id.in_(chunk))
+            .returning(models.Item.id, models.Item.code, models.Item.name,
+                       models.Item.quantity, models.Item.category_id, models.Item.created_at)
+            .execution_options(synchronize_session=False)
+        ).all()
+        deleted.extend(r._asdict() for r in rows)
+
+    if not deleted:
+        db.rollback()
+        return [], 0
+
+    per_cat: dict[int, list[int]] = {}
+    for d in deleted:
+        acc = per_cat.setdefault(d["category_id"], [0, 0])
+        acc[0] -= d["quantity"] or 0
+        acc[1] -= 1
+    for cid, (dq, dc) in per_cat.items():
+        _bump_category_totals(db, cid, dq, dc)
+    release_item_codes(db, [d["code"] for d in deleted])
+    db.execute(insert(models.ItemDeletion), [
+        {"item_id": d["id"], "code": d["code"], "item_created_at": d.pop("created_at")} for d in deleted
+    ])
+    catalog.bump(db)
+    if notify:
+        notify(deleted)
     db.commit()
-    return True
+    return deleted, tx_count
 
-def adjust_item_quantity(db: Session, item_id: int, delta: int, note: str = "", user_id: int | None = None) -> models.Item | None:
-    item = db.get(models.Item, item_id)
-    if not item:
-        return None
-    item.quantity = (item.quantity or 0) + delta
-    tx = models.Transaction(item_id=item.id, qty_change=delta, note=note, performed_by=user_id)
-    db.add(tx)
+def _ts_param(db: Session, value: datetime):
+    """
+    Bind value for comparing against transactions.created_at. SQLite keeps
+    CURRENT_TIMESTAMP text ('YYYY-MM-DD HH:MM:SS') while a bound datetime is
+    rendered with microseconds, which breaks equality and ordering between
+    the two; compare in the stored form there.
+    """
+    if db.get_bind().dialect.name == "sqlite" and not value.microsecond:
+        return literal(value.strftime("%Y-%m-%d %H:%M:%S"))
+    return value
+
+def list_transactions_after(
+    db: Session,
+    *,
+    item_id: int | None = None,
+    performed_by: int | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    direction: str | None = None,
+    limit: int = 50,
+    after: tuple | None = None,
+) -> tuple[list[models.Transaction], tuple | None]:
+    """
+    Keyset page over the ledger, newest first, keyed on (created_at, id).
+    The filters line up with the composite indexes (item_id, created_at),
+    (performed_by, created_at) and (created_at, id), so a page is an index
+    range scan however long the history is. direction is "in" (qty_change > 0)
+    or "out" (< 0). Returns the page and the key to continue after.
+    """
+    T = models.Transaction
+    stmt = select(T)
+    if item_id is not None:
+        stmt = stmt.where(T.item_id == item_id)
+    if performed_by is not None:
+        stmt = stmt.where(T.performed_by == performed_by)
+    if date_from is not None:
+        stmt = stmt.where(T.created_at >= _ts_param(db, date_from))
+    if date_to is not None:
+        stmt = stmt.where(T.created_at < _ts_param(db, date_to))
+    if direction == "in":
+        stmt = stmt.where(T.qty_change > 0)
+    elif direction == "out":
+        stmt = stmt.where(T.qty_change < 0)
+    if after is not None:
+        a_ts, a_id = after
+        stmt = stmt.where(tuple_(T.created_at, T.id) < tuple_(_ts_param(db, a_ts), a_id))
+
+    rows = db.execute(
+        stmt.order_by(T.created_at.desc(), T.id.desc()).limit(limit + 1)
+    ).scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1].created_at, rows[-1].id)
+    return rows, None
+
+def adjust_item_quantity(
+    db: Session,
+    item_id: int,
+    delta: int,
+    note: str = "",
+    user_id: int | None = None,
+    allow_negative: bool | None = None,
+    notify: Callable[[models.Item], None] | None = None,
+) -> tuple[models.Item, int | None] | None:
+    """
+    Applies the delta in the database with a single
+    UPDATE items SET quantity = quantity + :d ... RETURNING, so concurrent
+    adjusts serialize on the row lock instead of overwriting each other.
+    The ledger row and category totals go out in the same transaction.
+
+    Returns (item, category total_quantity after the change), or None if the
+    item does not exist; raises ValueError if the guard (quantity + delta >= 0,
+    unless negative stock is allowed) rejects it.
+    """
+    if allow_negative is None:
+        allow_negative = config.STOCK_ALLOW_NEGATIVE
+    stmt = (
+        update(models.Item)
+        .where(models.Item.id == item_id)
+        .values(quantity=models.Item.quantity + delta, updated_at=func.now())
+        .returning(models.Item)
+        .execution_options(synchronize_session=False)
+    )
+    if not allow_negative:
+        stmt = stmt.where(models.Item.quantity + delta >= 0)
+
+    item = db.execute(stmt).scalar_one_or_none()
+    if item is None:
+        db.rollback()
+        if db.get(models.Item, item_id) is None:
+            return None
+        raise ValueError("Insufficient stock for this adjustment")
+
+    db.add(models.Transaction(item_id=item_id, qty_change=delta, note=note, performed_by=user_id))
+    cat_total = _bump_category_totals(db, item.category_id, delta, 0)
+    # keep the RETURNING snapshot: detached, it is not expired by the commit,
+    # so callers see exactly this adjust's result without a re-SELECT
+    db.expunge(item)
+    if notify:
+        notify(item)
     db.commit()
-    db.refresh(item)
-    return item
+    # a quantity change: moves the ETag without a shared row in this transaction
+    catalog.stock_changed(db)
+    return item, cat_total
+
+def adjust_items_batch(
+    db: Session,
+    lines: list[schemas.AdjustLine],
+    atomic: bool = True,
+    allow_negative: bool | None = None,
+    user_id: int | None = None,
+    notify: Callable[[list[dict], list[dict]], None] | None = None,
+) -> tuple[list[dict], list[dict], list[dict]]:
+    """
+    Set-based version of adjust_item_quantity for many lines at once:
+      - lines are netted per item and applied with ONE
+        UPDATE items SET quantity = quantity + CASE id ... END ... RETURNING
+      - ledger rows go in with one executemany INSERT
+      - category totals move with ONE CASE-based UPDATE ... RETURNING
+    all in a single transaction. notify, if given, gets (items, categories)
+    as returned below, before the commit.
+
+    An item whose net change fails the non-negative guard, or that does not
+    exist, rejects all of its lines. With atomic=True any rejection rolls the
+    whole batch back (nothing is applied).
+
+    Returns (results, items, categories):
+      results    - one dict per input line (index, item_id, change, ok, quantity, error)
+      items      - applied items: id, code, name, category_id, old_qty, new_qty
+      categories - affected categories: id, code, name, buffer, old_total, new_total, delta
+    """
+    if allow_negative is None:
+        allow_negative = config.STOCK_ALLOW_NEGATIVE
+
+    errors: dict[int, str] = {}
+    net: dict[int, int] = {}
+    for i, ln in enumerate(lines):
+        if ln.change == 0:
+            errors[i] = "change must be non-zero"
+            continue
+        net[ln.item_id] = net.get(ln.item_id, 0) + ln.change
+
+    moved: dict[int, dict] = {}
+    todo = {iid: d for iid, d in net.items() if d != 0}
+    if todo:
+        delta = case(todo, value=models.Item.id, else_=0)
+        stmt = (
+            update(models.Item)
+            .where(models.Item.id.in_(list(todo)))
+            .values(quantity=models.Item.quantity + delta, updated_at=func.now())
+            .returning(models.Item.id, models.Item.code, models.Item.name,
+                       models.Item.category_id, models.Item.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        if not allow_negative:
+            stmt = stmt.where(models.Item.quantity + delta >= 0)
+        for iid, code, name, cid, qty in db.execute(stmt).all():
+            moved[iid] = {"id": iid, "code": code, "name": name, "category_id": cid,
+                          "old_qty": qty - todo[iid], "new_qty": qty}
+
+    # items netting to 0 still need to exist to be accepted
+    unresolved = [iid for iid in net if iid not in moved]
+    existing: dict[int, tuple] = {}
+    if unresolved:
+        existing = {
+            r.id: r
+            for r in db.execute(
+                select(models.Item.id, models.Item.code, models.Item.name,
+                       models.Item.category_id, models.Item.quantity)
+                .where(models.Item.id.in_(unresolved))
+            ).all()
+        }
+    for iid in unresolved:
+        r = existing.get(iid)
+        if r is not None and net[iid] == 0:
+            moved[iid] = {"id": iid, "code": r.code, "name": r.name, "category_id": r.category_id,
+                          "old_qty": r.quantity, "new_qty": r.quantity}
+
+    for i, ln in enumerate(lines):
+        if i in errors or ln.item_id in moved:
+            continue
+        errors[i] = "Item not found" if ln.item_id not in existing else "Insufficient stock for this adjustment"
+
+    results = [
+        {
+            "index": i,
+            "item_id": ln.item_id,
+            "change": ln.change,
+            "ok": i not in errors,
+            "quantity": moved[ln.item_id]["new_qty"] if i not in errors else None,
+            "error": errors.get(i),
+        }
+        for i, ln in enumerate(lines)
+    ]
+
+    if atomic and errors:
+        db.rollback()
+        for r in results:
+            r["ok"], r["quantity"] = False, None
+            r["error"] = r["error"] or "Batch rejected"
+        return results, [], []
+
+    ledger = [
+        {"item_id": ln.item_id, "qty_change": ln.change, "note": ln.note, "performed_by": user_id}
+        for i, ln in enumerate(lines)
+        if i not in errors
+    ]
+    if ledger:
+        db.execute(insert(models.Transaction), ledger)
+
+    per_cat: dict[int, int] = {}
+    for m in moved.values():
+        if m["category_id"] is not None and m["new_qty"] != m["old_qty"]:
+            per_cat[m["category_id"]] = per_cat.get(m["category_id"], 0) + m["new_qty"] - m["old_qty"]
+    categories: list[dict] = []
+    if per_cat:
+        cdelta = case(per_cat, value=models.Category.id, else_=0)
+        for cid, code, name, buffer, total in db.execute(
+            update(models.Category)
+            .where(models.Category.id.in_(list(per_cat)))
+            .values(total_quantity=models.Category.total_quantity + cdelta)
+            .returning(models.Category.id, models.Category.code, models.Category.name,
+                       models.Category.buffer, models.Category.total_quantity)
+            .execution_options(synchronize_session=False)
+        ).all():
+            categories.append({"id": cid, "code": code, "name": name, "buffer": buffer or 0,
+                               "old_total": total - per_cat[cid], "new_total": total, "delta": per_cat[cid]})
+
+    changed = [m for m in moved.values() if m["new_qty"] != m["old_qty"]]
+    if notify:
+        notify(changed, categories)
+    db.commit()
+    if changed:
+        catalog.stock_changed(db)
+    return results, changed, categories
 
 # ---- Category helpers ----
+def _bump_category_totals(db: Session, category_id: int | None, qty_delta: int, count_delta: int) -> int | None:
+    """
+    Apply a delta to the category's maintained total_quantity/item_count in
+    the caller's transaction (committed together with the item write).
+    Returns the new total_quantity (None if there was nothing to do).
+    """
+    if category_id is None or (qty_delta == 0 and count_delta == 0):
+        return None
+    return db.execute(
+        update(models.Category)
+        .where(models.Category.id == category_id)
+        .values(
+            total_quantity=models.Category.total_quantity + qty_delta,
+            item_count=models.Category.item_count + count_delta,
+        )
+        .returning(models.Category.total_quantity)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
 def get_category_totals(db: Session, category_id: int) -> tuple[int, int, models.Category | None]:
     cat = db.get(models.Category, category_id)
     if not cat:
         return 0, 0, None
-    total_qty = db.execute(
-        select(func.coalesce(func.sum(models.Item.quantity), 0)).where(models.Item.category_id == category_id)
-    ).scalar_one()
-    return total_qty, cat.buffer, cat
+    return int(cat.total_quantity or 0), cat.buffer, cat
+
+def reconcile_category_totals(db: Session, apply: bool = True) -> list[dict]:
+    """
+    Recompute every category's total_quantity/item_count from items with one
+    GROUP BY and report the categories whose stored values drifted.
+    With apply=True the drifted rows are corrected and committed.
+    """
+    actual = {
+        cid: (int(total), int(count))
+        for cid, total, count in db.execute(
+            select(
+                models.Item.category_id,
+                func.coalesce(func.sum(models.Item.quantity), 0),
+                func.count(models.Item.id),
+            ).group_by(models.Item.category_id)
+        ).all()
+    }
+    drift = []
+    for cat in db.execute(select(models.Category).order_by(models.Category.id)).scalars().all():
+        total, count = actual.get(cat.id, (0, 0))
+        if (cat.total_quantity or 0) != total or (cat.item_count or 0) != count:
+            drift.append({
+                "category_id": cat.id,
+                "code": cat.code,
+                "stored_total": cat.total_quantity or 0,
+                "actual_total": total,
+                "stored_count": cat.item_count or 0,
+                "actual_count": count,
+            })
+            if apply:
+                cat.total_quantity = total
+                cat.item_count = count
+    if apply and drift:
+        catalog.bump(db)
+        db.commit()
+    return drift
@@ -1,15 +1,92 @@
 # backend/app/database.py
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from app.config import DATABASE_URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app import config
+from app.config import DATABASE_URL, DATABASE_ASYNC_URL, DATABASE_READ_URL, DATABASE_READ_ASYNC_URL
+from app.utils import pool_metrics
+from app.utils.read_routing import client_key, read_router
+
+def _engine_options(url, poolclass, metrics: pool_metrics.PoolMetrics) -> dict:
+    """Pool settings from config.DB_*; in-memory SQLite keeps SQLAlchemy's own single-connection pool."""
+    u = make_url(url)
+    opts = {"pool_pre_ping": True}
+    if u.get_backend_name() == "sqlite" and u.database in (None, "", ":memory:"):
+        return opts
+    opts.update(
+        poolclass=pool_metrics.timed_pool(poolclass, metrics),
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+    )
+    if u.get_backend_name() == "postgresql" and config.DB_STATEMENT_TIMEOUT_MS > 0:
+        ms = config.DB_STATEMENT_TIMEOUT_MS
+        if u.get_driver_name() == "asyncpg":
+            opts["connect_args"] = {"server_settings": {"statement_timeout": str(ms)}}
+        else:
+            opts["connect_args"] = {"options": f"-c statement_timeout={ms}"}
+    return opts
 
 try:
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+    engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, QueuePool, pool_metrics.sync_pool))
 except Exception as e:
     # This prints the *real* root cause (e.g., bad URL or missing driver)
     raise RuntimeError(f"Failed to create engine. Check DATABASE_URL/driver. Details: {e}")
 
+# async driver for the same database, used by the async read endpoints (get_async_db)
+_ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+def _async_url(url: str):
+    u = make_url(url)
+    return u.set(drivername=_ASYNC_DRIVERS.get(u.get_backend_name(), u.drivername))
+
+try:
+    _url = DATABASE_ASYNC_URL or _async_url(DATABASE_URL)
+    async_engine = create_async_engine(_url, **_engine_options(_url, AsyncAdaptedQueuePool, pool_metrics.async_pool))
+except Exception as e:
+    raise RuntimeError(f"Failed to create async engine. Check DATABASE_ASYNC_URL/asyncpg/aiosqlite. Details: {e}")
+
+pool_metrics.sync_pool.attach(engine)
+pool_metrics.async_pool.attach(async_engine.sync_engine)
+
+# optional read replica (DATABASE_READ_URL) behind get_read_db / get_async_read_db
+read_engine = async_read_engine = None
+if DATABASE_READ_URL:
+    try:
+        read_engine = create_engine(
+            DATABASE_READ_URL, **_engine_options(DATABASE_READ_URL, QueuePool, pool_metrics.read_pool)
+        )
+        _read_url = DATABASE_READ_ASYNC_URL or _async_url(DATABASE_READ_URL)
+        async_read_engine = create_async_engine(
+            _read_url, **_engine_options(_read_url, AsyncAdaptedQueuePool, pool_metrics.async_read_pool)
+        )
+    except Exception as e:
+        raise RuntimeError(f"Failed to create read replica engines. Check DATABASE_READ_URL. Details: {e}")
+    pool_metrics.read_pool.attach(read_engine)
+    pool_metrics.async_read_pool.attach(async_read_engine.sync_engine)
+
+def _sqlite_fk_on(dbapi_conn, _record):
+    # SQLite leaves FK enforcement (and ON DELETE CASCADE) off unless asked per connection
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA foreign_keys=ON")
+    cur.close()
+
+for _e in (engine, async_engine.sync_engine, *([read_engine, async_read_engine.sync_engine] if read_engine else [])):
+    if _e.dialect.name == "sqlite":
+        event.listen(_e, "connect", _sqlite_fk_on)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes must never lazy-load (that would need IO outside an await)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine or engine)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine or async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
 # FastAPI dependency
@@ -19,3 +96,43 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# FastAPI dependency for `async def` endpoints: no threadpool thread is held while waiting on the DB
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# FastAPI dependencies for read-only endpoints: the replica when configured and safe to use
+# (see app.utils.read_routing), else the primary. Never write through these sessions.
+def _use_replica(request: Request) -> bool:
+    return read_engine is not None and read_router.use_replica(client_key(request.headers, request.client))
+
+def get_read_db(request: Request):
+    replica = _use_replica(request)
+    db = ReadSessionLocal() if replica else SessionLocal()
+    if replica:
+        try:
+            db.connection()  # check out now, so an unreachable replica falls back here
+        except (DBAPIError, OSError):
+            db.close()
+            read_router.replica_failed()
+            db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    replica = _use_replica(request)
+    db = AsyncReadSessionLocal() if replica else AsyncSessionLocal()
+    if replica:
+        try:
+            await db.connection()
+        except (DBAPIError, OSError):
+            await db.close()
+            read_router.replica_failed()
+            db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -1,19 +1,19 @@
 # app/deps.py
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models
+from app.database import get_async_db, get_db
+from app import config
 from app.security import decode_token
+from app.utils.user_cache import Principal, user_cache
 import time
 from typing import Annotated
 
 bearer = HTTPBearer(auto_error=True)
 
-def get_current_user(
-    creds: HTTPAuthorizationCredentials = Depends(bearer),
-    db: Session = Depends(get_db)
-) -> models.User:
+def _claims(creds: HTTPAuthorizationCredentials) -> tuple[str, int, dict]:
+    """(sub, token version, payload) of a valid bearer token, else 401."""
     token = creds.credentials
     try:
         payload = decode_token(token)
@@ -23,13 +23,50 @@ def get_current_user(
             raise HTTPException(status_code=401, detail="Token expired")
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
+    return username, int(payload.get("ver") or 0), payload
+
+def get_current_user(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    db: Session = Depends(get_db)
+) -> Principal:
+    username, version, payload = _claims(creds)
+    if config.AUTH_TRUST_TOKEN_CLAIMS and "uid" in payload and "adm" in payload:
+        # signed by us at login: no DB round-trip, but no revocation before expiry either
+        return Principal(
+            id=payload["uid"], username=username, is_admin=bool(payload["adm"]),
+            token_version=version, from_claims=True,
+        )
 
-    user = db.query(models.User).filter(models.User.username == username).first()
+    # cached by (sub, ver); a token whose ver is behind users.token_version is revoked
+    user = user_cache.get(db, username, version)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+def get_current_profile(
+    user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """get_current_user with name/email/role filled in, also in trusted-claims mode (/me)."""
+    if not user.from_claims:
+        return user
+    full = user_cache.get(db, user.username, user.token_version)
+    if not full:
+        raise HTTPException(status_code=401, detail="User not found")
+    return full
+
+async def get_current_profile_async(
+    creds: HTTPAuthorizationCredentials = Depends(bearer),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """get_current_profile for async endpoints (same cache, AsyncSession on a miss)."""
+    username, version, _ = _claims(creds)
+    user = await user_cache.get_async(db, username, version)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
 
-def require_admin(user: models.User = Depends(get_current_user)) -> models.User:
+def require_admin(user: Principal = Depends(get_current_user)) -> Principal:
     if not user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -40,6 +77,6 @@ def require_admin(user: models.User = Depends(get_current_user)) -> models.User:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
     return user
 
-CurrentUser = Annotated[models.User, Depends(get_current_user)]
-AdminUser = Annotated[models.User, Depends(require_admin)]
+CurrentUser = Annotated[Principal, Depends(get_current_user)]
+AdminUser = Annotated[Principal, Depends(require_admin)]
 
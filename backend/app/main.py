@@ -1,18 +1,47 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.database import engine, Base
+from app.database import engine, async_engine, read_engine, async_read_engine, Base, SessionLocal
 from app.routers import categories,items, users, test_email
-from app import models
+from app import models, crud
+from app.utils.schema import ensure_columns, ensure_indexes
+from app.utils.search import detect_search_indexes, ensure_search_indexes
+from app.utils import catalog, category_cache, recipient_cache
+from app.utils.read_routing import StickyWritesMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import auth, users
 from app.routers import admin_users
 from app.routers import admin_recipients
+from app.routers import dashboard, inventory
+from app.routers import transactions
+from app.routers import admin_metrics
 
 
 
 # Creates Table
 Base.metadata.create_all(bind=engine)
+if ensure_columns(engine, models.Category):
+    # totals columns were just added to an existing DB: backfill them
+    with SessionLocal() as _db:
+        crud.reconcile_category_totals(_db)
+ensure_columns(engine, models.User)
+ensure_indexes(engine, models.Transaction)
+ensure_search_indexes(engine)
+if read_engine is not None:
+    detect_search_indexes(read_engine)
+with SessionLocal() as _db:
+    catalog.ensure(_db)
+    catalog.ensure(_db, category_cache.VERSION_NAME)
+    catalog.ensure(_db, recipient_cache.VERSION_NAME)
 
-app = FastAPI(title="MIS Inventory System")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    # close the async pool's connections (aiosqlite ones each own a thread)
+    await async_engine.dispose()
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
+
+app = FastAPI(title="MIS Inventory System", lifespan=lifespan)
 
 
 app.add_middleware(
@@ -21,7 +50,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+# read-your-writes for the replica routing (no-op without DATABASE_READ_URL)
+app.add_middleware(StickyWritesMiddleware)
 
 
 # routes
@@ -32,6 +64,10 @@ app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(admin_users.router)
 app.include_router(admin_recipients.router)
+app.include_router(dashboard.router)
+app.include_router(inventory.router)
+app.include_router(transactions.router)
+app.include_router(admin_metrics.router)
 
 
 @app.get("/")
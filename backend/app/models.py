@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func, Text, Index, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, func, Text, Index, Boolean, Sequence
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -9,6 +9,10 @@ class Category(Base):
     name = Column(String(120), nullable=False, unique=True)
     code = Column(String(64), nullable=True, unique=True)
     buffer = Column(Integer, nullable=False, default=0)  # buffer now here
+    # running totals over this category's items, maintained by every item write
+    # (see crud._bump_category_totals); reconcile with app.scripts.reconcile_category_totals
+    total_quantity = Column(Integer, nullable=False, default=0, server_default="0")
+    item_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     items = relationship("Item", back_populates="category", cascade="all, delete-orphan")
 
@@ -26,7 +30,21 @@ class Item(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
-    transactions = relationship("Transaction", back_populates="item", cascade="all, delete-orphan")
+    # passive_deletes: let the FK's ON DELETE CASCADE remove history instead of loading it
+    transactions = relationship("Transaction", back_populates="item", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class ItemCodeCounter(Base):
+    """Last number handed out per code prefix (MIS + 3-char category code)."""
+    __tablename__ = "item_code_counters"
+    prefix = Column(String(3), primary_key=True)
+    last_n = Column(Integer, nullable=False, default=0)
+
+class ItemCodeFree(Base):
+    """Numbers released by deleted items, reused first when gap filling is on."""
+    __tablename__ = "item_code_free"
+    prefix = Column(String(3), primary_key=True)
+    n = Column(Integer, primary_key=True)
 
 
 # ... (Category, Item, Transaction unchanged) ...
@@ -42,6 +60,8 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=True)     # optional now
     role = Column(String(32), nullable=False, default="staff")
     is_admin = Column(Boolean, nullable=False, default=False)               # NEW
+    # embedded in access tokens as "ver"; bumped to revoke the tokens issued before
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
@@ -64,6 +84,13 @@ class Transaction(Base):
     item = relationship("Item", back_populates="transactions")
     user = relationship("User", back_populates="transactions")
 
+    # ledger reads are "newest first within a time range", per item, per user or overall
+    __table_args__ = (
+        Index("ix_transactions_item_created", "item_id", "created_at"),
+        Index("ix_transactions_user_created", "performed_by", "created_at"),
+        Index("ix_transactions_created_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<Transaction id={self.id} item_id={self.item_id} delta={self.qty_change}>"
 
@@ -73,3 +100,154 @@ class EmailRecipient(Base):
     email = Column(String(255), unique=True, nullable=False, index=True)
     active = Column(Boolean, nullable=False, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class EmailOutbox(Base):
+    """One queued email (app.utils.outbox); recipients are resolved when it is queued."""
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)                        # template, e.g. stock_change
+    subject = Column(Text, nullable=False)
+    html_body = Column(Text, nullable=False)
+    recipients = Column(Text, nullable=False)                        # comma-separated, de-duplicated
+    status = Column(String(16), nullable=False, default="pending")   # pending | sending | sent | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False)
+    locked_until = Column(DateTime(timezone=True), nullable=True)    # lease of the worker sending it
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # the worker's claim: due rows by status and time
+        Index("ix_email_outbox_status_due", "status", "next_attempt_at"),
+    )
+
+
+class EmailDigestEntry(Base):
+    """One line of a pending notification digest (app.utils.digest), per recipient set."""
+    __tablename__ = "email_digest_entries"
+    recipients_key = Column(String(40), primary_key=True)   # sha1 of recipients
+    kind = Column(String(16), primary_key=True)             # stock | low_stock
+    code = Column(String(64), primary_key=True)             # item code / category code
+    recipients = Column(Text, nullable=False)
+    name = Column(String(255), nullable=False)
+    old_qty = Column(Integer, nullable=False)   # stock: before the first event; low_stock: first total
+    new_qty = Column(Integer, nullable=False)   # stock: old_qty + net delta; low_stock: latest total
+    buffer = Column(Integer, nullable=True)     # low_stock only
+    events = Column(Integer, nullable=False, default=1)
+    note = Column(Text, nullable=True)          # latest non-empty note
+    window_ends_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class EmailDigestCounter(Base):
+    """Running totals of the digest path (app.utils.digest.COUNTERS), added to at each flush."""
+    __tablename__ = "email_digest_counters"
+    name = Column(String(32), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class CategoryStockAlert(Base):
+    """Low-stock alert state of a category (app.utils.low_stock); no row means OK."""
+    __tablename__ = "category_stock_alerts"
+    # no FK: routers/categories.py deletes the row with its category
+    category_id = Column(Integer, primary_key=True)
+    state = Column(String(16), nullable=False)                  # OK | LOW | CRITICAL
+    total_quantity = Column(Integer, nullable=False)            # category total when the state changed
+    buffer = Column(Integer, nullable=False)
+    changed_at = Column(DateTime(timezone=True), nullable=False)
+    last_notified_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# ---- Stock movement rollups (maintained by app.utils.rollups) ----
+# No FKs on purpose: a day's movement stays in the trend after its item is deleted.
+
+class DailyItemMovement(Base):
+    __tablename__ = "daily_item_movement"
+    item_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, nullable=False, index=True)
+    qty_in = Column(Integer, nullable=False, default=0)    # sum of positive qty_change
+    qty_out = Column(Integer, nullable=False, default=0)   # sum of -qty_change over negative ones
+    net = Column(Integer, nullable=False, default=0)
+    tx_count = Column(Integer, nullable=False, default=0)
+
+class DailyCategoryMovement(Base):
+    __tablename__ = "daily_category_movement"
+    category_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    qty_in = Column(Integer, nullable=False, default=0)
+    qty_out = Column(Integer, nullable=False, default=0)
+    net = Column(Integer, nullable=False, default=0)
+    tx_count = Column(Integer, nullable=False, default=0)
+
+class RollupWatermark(Base):
+    """Highest transactions.id already folded into the rollups."""
+    __tablename__ = "rollup_watermarks"
+    name = Column(String(64), primary_key=True)
+    last_tx_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+# ---- Stock snapshots (app.utils.snapshots) ----
+
+class StockSnapshot(Base):
+    """Quantity of every item at one ledger position (all transactions with id <= last_tx_id applied)."""
+    __tablename__ = "stock_snapshots"
+    id = Column(Integer, primary_key=True)
+    taken_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    last_tx_id = Column(Integer, nullable=False, default=0)
+    kind = Column(String(16), nullable=False, default="periodic")   # periodic | closing
+    item_count = Column(Integer, nullable=False, default=0)
+    rows = relationship("StockSnapshotRow", cascade="all, delete-orphan", passive_deletes=True)
+
+class StockSnapshotRow(Base):
+    __tablename__ = "stock_snapshot_rows"
+    snapshot_id = Column(Integer, ForeignKey("stock_snapshots.id", ondelete="CASCADE"), primary_key=True)
+    item_id = Column(Integer, primary_key=True)   # no FK: the row outlives a deleted item
+    code = Column(String(64), nullable=False)
+    category_id = Column(Integer, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+
+class ItemDeletion(Base):
+    """A deleted item (crud.delete_items), so point-in-time reads know when it stopped existing."""
+    __tablename__ = "item_deletions"
+    id = Column(Integer, primary_key=True)
+    item_id = Column(Integer, nullable=False, index=True)   # no FK: the item is gone
+    code = Column(String(64), nullable=False)
+    item_created_at = Column(DateTime(timezone=True), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class LedgerArchive(Base):
+    """One archive part file: transactions min_tx_id..max_tx_id of one month, moved out of the table."""
+    __tablename__ = "ledger_archives"
+    id = Column(Integer, primary_key=True)
+    month = Column(String(7), nullable=False, index=True)       # YYYY-MM of created_at
+    path = Column(String(512), nullable=False, unique=True)     # relative to LEDGER_ARCHIVE_DIR
+    min_tx_id = Column(Integer, nullable=False)
+    max_tx_id = Column(Integer, nullable=False)
+    min_created_at = Column(DateTime(timezone=True), nullable=False)
+    max_created_at = Column(DateTime(timezone=True), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class LedgerArchiveKey(Base):
+    """Items and users an archive part has rows for, so filtered ledger reads skip the other parts."""
+    __tablename__ = "ledger_archive_keys"
+    kind = Column(String(8), primary_key=True)      # item | user
+    key = Column(Integer, primary_key=True)         # item_id / performed_by
+    archive_id = Column(Integer, ForeignKey("ledger_archives.id", ondelete="CASCADE"), primary_key=True)
+
+
+class CatalogVersion(Base):
+    """Counters bumped in the same transaction as the writes they track (app.utils.catalog)."""
+    __tablename__ = "catalog_versions"
+    name = Column(String(32), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# stock part of the catalog ETag on PostgreSQL (app.utils.catalog.stock_changed): nextval takes
+# no lock, so quantity writes do not queue behind each other on a shared counter row
+catalog_stock_seq = Sequence("catalog_stock_seq", metadata=Base.metadata)
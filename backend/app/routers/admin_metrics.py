@@ -0,0 +1,55 @@
+# app/routers/admin_metrics.py
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.deps import require_admin as admin_required
+from app.utils import digest, outbox, pool_metrics
+from app.utils.category_cache import category_cache
+from app.utils.password_pool import password_pool
+from app.utils.read_routing import read_router
+from app.utils.recipient_cache import recipient_cache
+from app.utils.user_cache import user_cache
+
+router = APIRouter(prefix="/admin/metrics", tags=["Admin: Metrics"])
+
+
+@router.get("/caches")
+def cache_stats(_=Depends(admin_required)):
+    """Hit/miss counters of this worker's in-process caches."""
+    return {"categories": category_cache.stats(), "users": user_cache.stats(), "recipients": recipient_cache.stats()}
+
+
+@router.get("/password-pool")
+def password_pool_stats(_=Depends(admin_required)):
+    """Load of this worker's bcrypt pool (see app.utils.password_pool)."""
+    return password_pool.stats()
+
+
+@router.get("/pool")
+def pool_stats(_=Depends(admin_required)):
+    """
+    This worker's DB connection pools (sync and async engine, and the replica's
+    when DATABASE_READ_URL is set): live size,
+    checked-out/idle/overflow connections, plus checkout wait histogram,
+    timeouts and pre-ping failures since start.
+    """
+    return pool_metrics.report()
+
+
+@router.get("/read-routing")
+def read_routing_stats(_=Depends(admin_required)):
+    """Where this worker's read endpoints went: replica, or primary (sticky after a write / replica down)."""
+    return read_router.stats()
+
+
+@router.get("/outbox")
+def outbox_stats(db: Session = Depends(get_db), _=Depends(admin_required)):
+    """Email outbox rows by status and the age of the oldest undelivered one (shared, not per worker)."""
+    return outbox.stats(db)
+
+
+@router.get("/notifications")
+def notification_stats(db: Session = Depends(get_db), _=Depends(admin_required)):
+    """Digest mode per kind, pending digest lines and the coalescing counters (shared, not per worker)."""
+    return digest.stats(db)
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.deps import require_admin as admin_required 
 from app import models, schemas
+from app.utils.recipient_cache import bump_version, recipient_cache
 
 router = APIRouter(prefix="/admin/recipients", tags=["Admin: Recipients"])
 
@@ -16,7 +17,8 @@ def create_recipient(payload: schemas.RecipientCreate, db: Session = Depends(get
     if db.query(models.EmailRecipient).filter_by(email=payload.email).first():
         raise HTTPException(409, "Email already exists")
     rec = models.EmailRecipient(email=payload.email, active=True)
-    db.add(rec); db.commit(); db.refresh(rec)
+    db.add(rec); bump_version(db); db.commit(); db.refresh(rec)
+    recipient_cache.invalidate()
     return rec
 
 @router.patch("/{recipient_id}", response_model=schemas.RecipientResponse)
@@ -25,11 +27,13 @@ def update_recipient(recipient_id: int, payload: schemas.RecipientUpdate, db: Se
     if not rec: raise HTTPException(404, "Not found")
     if payload.active is not None:
         rec.active = payload.active
-    db.commit(); db.refresh(rec)
+    bump_version(db); db.commit(); db.refresh(rec)
+    recipient_cache.invalidate()
     return rec
 
 @router.delete("/{recipient_id}", status_code=204)
 def delete_recipient(recipient_id: int, db: Session = Depends(get_db), _=Depends(admin_required)):
     rec = db.get(models.EmailRecipient, recipient_id)
     if not rec: raise HTTPException(404, "Not found")
-    db.delete(rec); db.commit()
+    db.delete(rec); bump_version(db); db.commit()
+    recipient_cache.invalidate()
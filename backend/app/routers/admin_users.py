@@ -1,10 +1,12 @@
 # app/routers/admin_users.py
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database import get_db                 # ✅ import get_db
 from app.deps import require_admin as admin_required            # ✅ admin gate
 from app import models, schemas
-from app.security import hash_password
+from app.utils.password_pool import hash_or_503
+from app.utils.user_cache import revoke_tokens, user_cache
 
 # You can keep "/users", but using an /admin prefix avoids collisions.
 router = APIRouter(prefix="/admin/users", tags=["Admin: Users"])
@@ -13,8 +15,15 @@ router = APIRouter(prefix="/admin/users", tags=["Admin: Users"])
 def list_users(db: Session = Depends(get_db), _=Depends(admin_required)):
     return db.query(models.User).order_by(models.User.id).all()
 
+# create/update are async so that bcrypt runs in the bounded password pool (as login does),
+# not in the threadpool shared by every sync endpoint; their DB work still goes through it
+
 @router.post("/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(payload: schemas.AdminUserCreate, db: Session = Depends(get_db), _=Depends(admin_required)):
+async def create_user(payload: schemas.AdminUserCreate, db: Session = Depends(get_db), _=Depends(admin_required)):
+    password_hash = await hash_or_503(payload.password)
+    return await run_in_threadpool(_create_user, db, payload, password_hash)
+
+def _create_user(db: Session, payload: schemas.AdminUserCreate, password_hash: str):
     if db.query(models.User).filter(models.User.username == payload.username).first():
         raise HTTPException(status_code=409, detail="Username already exists")
     if payload.email and db.query(models.User).filter(models.User.email == payload.email).first():
@@ -22,7 +31,7 @@ def create_user(payload: schemas.AdminUserCreate, db: Session = Depends(get_db),
 
     user = models.User(
         username=payload.username,
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
         name=payload.name,
         email=payload.email,
         role=payload.role or "staff",
@@ -34,12 +43,16 @@ def create_user(payload: schemas.AdminUserCreate, db: Session = Depends(get_db),
     return user
 
 @router.patch("/{user_id}", response_model=schemas.UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     payload: schemas.AdminUserUpdate,
     db: Session = Depends(get_db),
-    admin: models.User = Depends(admin_required),
+    admin=Depends(admin_required),
 ):
+    password_hash = await hash_or_503(payload.password) if payload.password else None
+    return await run_in_threadpool(_update_user, db, user_id, payload, admin, password_hash)
+
+def _update_user(db: Session, user_id: int, payload: schemas.AdminUserUpdate, admin, password_hash: str | None):
     user = db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -47,6 +60,7 @@ def update_user(
     # prevent removing your own admin flag
     if user.id == admin.id and payload.is_admin is False:
         raise HTTPException(status_code=400, detail="You cannot remove your own admin rights")
+    old_username = user.username
 
     # --- NEW: username change + uniqueness check ---
     if payload.username is not None and payload.username != user.username:
@@ -75,15 +89,19 @@ def update_user(
     if payload.role is not None:
         user.role = payload.role
 
-    # admin flag
+    # admin flag (a change revokes the tokens carrying the old one)
     if payload.is_admin is not None:
+        if payload.is_admin != user.is_admin:
+            revoke_tokens(user)
         user.is_admin = payload.is_admin
 
-    # password
-    if payload.password:
-        user.password_hash = hash_password(payload.password)
+    # password (logs the user out everywhere)
+    if password_hash:
+        user.password_hash = password_hash
+        revoke_tokens(user)
 
     db.commit()
+    user_cache.invalidate(old_username, user.username)
     db.refresh(user)
     return user
 
@@ -100,6 +118,8 @@ def delete_user(
     if user.id == admin.id:
         raise HTTPException(status_code=400, detail="You cannot delete your own account")
 
+    username = user.username
     db.delete(user)
     db.commit()
+    user_cache.invalidate(username)
     return None
@@ -1,23 +1,62 @@
 # app/routers/auth.py
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
-from app.security import verify_password, create_access_token
-from app.deps import get_current_user
+from app.security import create_access_token
+from app.deps import get_current_profile_async
+from app.utils.password_pool import PasswordPoolBusy, password_pool
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+def _find_login(db: Session, username: str):
+    U = models.User
+    row = db.execute(
+        select(U.id, U.username, U.is_admin, U.token_version, U.password_hash).where(U.username == username)
+    ).first()
+    # hand the connection back to the pool instead of holding it while bcrypt runs
+    db.close()
+    return row
+
+def _store_rehash(db: Session, user_id: int, old_hash: str, new_hash: str) -> None:
+    # only if nobody changed the password meanwhile
+    db.execute(
+        update(models.User)
+        .where(models.User.id == user_id, models.User.password_hash == old_hash)
+        .values(password_hash=new_hash)
+    )
+    db.commit()
+
 @router.post("/login", response_model=schemas.Token)
-def login(payload: schemas.LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == payload.username).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: schemas.LoginRequest, db: Session = Depends(get_db)):
+    # async so that bcrypt runs in its own bounded pool, not in the threadpool shared by
+    # every sync endpoint; the (short) DB work still goes through that threadpool
+    try:
+        password_pool.check()  # shed before touching the DB
+        user = await run_in_threadpool(_find_login, db, payload.username)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+        ok, new_hash = await password_pool.verify_and_update(payload.password, user.password_hash)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
+    if not ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    token = create_access_token(sub=user.username)
+    if new_hash:
+        # stored with another bcrypt cost than BCRYPT_ROUNDS: upgrade it transparently
+        await run_in_threadpool(_store_rehash, db, user.id, user.password_hash, new_hash)
+    token = create_access_token(
+        sub=user.username, user_id=user.id, is_admin=user.is_admin, version=user.token_version or 0
+    )
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/me", response_model=schemas.UserResponse)
-def me(current=Depends(get_current_user)):
+async def me(current=Depends(get_current_profile_async)):
     return current
 
 # Logout: with stateless JWT you typically just delete token on client.
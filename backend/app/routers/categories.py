@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_async_read_db, get_db, get_read_db
 from app import schemas, models
-from sqlalchemy import select, func
-from fastapi import BackgroundTasks
+from sqlalchemy import select, update
+from app.deps import require_admin as admin_required
+from app.utils import catalog, low_stock
+from app.utils.catalog import conditional_get, conditional_get_async
+from app.utils.category_cache import category_cache, bump_version as bump_category_version
 
 router = APIRouter()
 
@@ -11,16 +15,28 @@ router = APIRouter()
 def create_category(payload: schemas.CategoryCreate, db: Session = Depends(get_db)):
     cat = models.Category(**payload.model_dump())
     db.add(cat)
+    catalog.bump(db)
+    bump_category_version(db)
     db.commit()
     db.refresh(cat)
     return cat
 
-@router.get("/", response_model=list[schemas.CategoryResponse])
-def list_categories(db: Session = Depends(get_db)):
-    return db.execute(select(models.Category).order_by(models.Category.name)).scalars().all()
+@router.get("/", response_model=list[schemas.CategoryResponse], dependencies=[Depends(conditional_get_async)])
+async def list_categories(db: AsyncSession = Depends(get_async_read_db)):
+    return (await db.execute(select(models.Category).order_by(models.Category.name))).scalars().all()
 
-@router.get("/{category_id}", response_model=schemas.CategoryResponse)
-def get_category(category_id: int, db: Session = Depends(get_db)):
+@router.get("/low-stock", response_model=list[schemas.CategoryStockAlertResponse])
+def list_low_stock(db: Session = Depends(get_read_db)):
+    """Categories currently LOW or CRITICAL, worst first."""
+    return low_stock.states(db)
+
+@router.post("/low-stock/evaluate", response_model=schemas.LowStockEvaluation)
+def evaluate_low_stock(db: Session = Depends(get_db), _=Depends(admin_required)):
+    """Re-evaluate every category now (the email worker also does it every LOW_STOCK_EVAL_SECONDS)."""
+    return low_stock.evaluate(db)
+
+@router.get("/{category_id}", response_model=schemas.CategoryResponse, dependencies=[Depends(conditional_get)])
+def get_category(category_id: int, db: Session = Depends(get_read_db)):
     cat = db.get(models.Category, category_id)
     if not cat:
         raise HTTPException(404, "Category not found")
@@ -30,43 +46,33 @@ def get_category(category_id: int, db: Session = Depends(get_db)):
 def update_category(
     category_id: int,
     payload: schemas.CategoryUpdate,
-    background: BackgroundTasks,                  # ← inject BackgroundTasks
     db: Session = Depends(get_db),
 ):
-    cat = db.get(models.Category, category_id)
-    if not cat:
+    # existence check from the category cache (no SELECT on a warm cache)
+    if not category_cache.get(db, category_id):
         raise HTTPException(404, "Category not found")
 
-    # pre-change snapshot
-    old_buffer = int(cat.buffer or 0)
-    old_total = (
-        db.query(func.coalesce(func.sum(models.Item.quantity), 0))
-          .filter(models.Item.category_id == category_id)
-          .scalar()
-    )
-
-    # apply updates
-    for k, v in payload.model_dump(exclude_unset=True).items():
-        setattr(cat, k, v)
+    # apply updates with one UPDATE ... RETURNING
+    changes = payload.model_dump(exclude_unset=True)
+    if not changes:
+        return db.get(models.Category, category_id)
+    cat = db.execute(
+        update(models.Category)
+        .where(models.Category.id == category_id)
+        .values(**changes)
+        .returning(models.Category)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if cat is None:
+        db.rollback()
+        raise HTTPException(404, "Category not found")
+    catalog.bump(db)
+    bump_category_version(db)
+    db.expunge(cat)  # keep the RETURNING values; no re-SELECT after commit
     db.commit()
-    db.refresh(cat)
-
-    # post-change state
-    new_buffer = int(cat.buffer or 0)
-    new_total = old_total  # items didn’t change here
-
-    # trigger only when we cross from OK → LOW due to buffer change
-    was_ok = old_total >= old_buffer
-    now_low = new_total < new_buffer
-    if was_ok and now_low:
-        background.add_task(
-            email_utils.send_category_low_stock,
-            category_code=cat.code,
-            category_name=cat.name,
-            total_qty=new_total,
-            buffer=new_buffer,
-            db=db,
-        )
+    category_cache.invalidate(category_id)
+    # a buffer change can move the category in or out of low stock
+    low_stock.evaluate(db, [category_id])
 
     return cat
 
@@ -77,4 +83,8 @@ def delete_category(category_id: int, db: Session = Depends(get_db)):
     if not cat:
         raise HTTPException(404, "Category not found")
     db.delete(cat)
+    low_stock.forget(db, category_id)
+    catalog.bump(db)
+    bump_category_version(db)
     db.commit()
+    category_cache.invalidate(category_id)
@@ -0,0 +1,153 @@
+# app/routers/dashboard.py
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app import config, models, schemas
+from app.database import get_db, get_read_db
+from app.utils import rollups
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+_cache_lock = threading.Lock()
+_cache: tuple[float, schemas.DashboardSummary] | None = None
+
+
+def category_severity(total: int, buffer: int) -> str:
+    """
+    Same buckets the frontend used to compute (Dashboard.jsx getCatSeverity);
+    "critical" uses the low-stock alerts' threshold so the two always agree.
+    """
+    b = int(buffer or 0)
+    if b <= 0:
+        return "ok"
+    ratio = total / b
+    if ratio < config.LOW_STOCK_CRITICAL_RATIO:
+        return "critical"
+    if ratio < 1:
+        return "low"
+    if ratio < 1.25:
+        return "warn"
+    return "ok"
+
+
+def build_summary(db: Session) -> schemas.DashboardSummary:
+    # one GROUP BY over categories ⟕ items; empty categories come back as 0/0
+    rows = db.execute(
+        select(
+            models.Category.id,
+            models.Category.name,
+            models.Category.code,
+            models.Category.buffer,
+            func.count(models.Item.id),
+            func.coalesce(func.sum(models.Item.quantity), 0),
+        )
+        .outerjoin(models.Item, models.Item.category_id == models.Category.id)
+        .group_by(models.Category.id, models.Category.name, models.Category.code, models.Category.buffer)
+        .order_by(models.Category.name)
+    ).all()
+
+    cats = [
+        schemas.CategorySummary(
+            id=cid,
+            name=name,
+            code=code,
+            buffer=int(buffer or 0),
+            item_count=int(count),
+            total_quantity=int(total),
+            severity=category_severity(int(total), buffer),
+        )
+        for cid, name, code, buffer, count, total in rows
+    ]
+    return schemas.DashboardSummary(
+        total_items=sum(c.item_count for c in cats),
+        total_quantity=sum(c.total_quantity for c in cats),
+        categories=cats,
+        generated_at=datetime.now(timezone.utc),
+    )
+
+
+@router.get("/summary", response_model=schemas.DashboardSummary)
+def get_summary(
+    fresh: bool = Query(False, description="Bypass the short-TTL server cache"),
+    db: Session = Depends(get_read_db),
+):
+    global _cache
+    ttl = config.DASHBOARD_CACHE_TTL
+    now = time.monotonic()
+    if not fresh and ttl > 0:
+        with _cache_lock:
+            if _cache and now - _cache[0] < ttl:
+                return _cache[1]
+
+    summary = build_summary(db)
+    if ttl > 0:
+        with _cache_lock:
+            _cache = (now, summary)
+    return summary
+
+
+# ---------- Movement trends (served from the daily rollups) ----------
+MAX_RANGE_DAYS = 3660
+
+
+def _movement(
+    db: Session, scope: str, scope_id: Optional[int],
+    date_from: Optional[date], date_to: Optional[date], granularity: str,
+) -> schemas.MovementSeries:
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+    if (date_to - date_from).days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range is limited to {MAX_RANGE_DAYS} days")
+
+    # fold in whatever the ledger gained since the last refresh (bounded)
+    rollups.refresh(db, max_rows=config.ROLLUP_MAX_CATCHUP)
+    points = rollups.series(
+        db, date_from, date_to,
+        item_id=scope_id if scope == "item" else None,
+        category_id=scope_id if scope == "category" else None,
+        granularity=granularity,
+    )
+    return schemas.MovementSeries(
+        scope=scope, scope_id=scope_id, granularity=granularity,
+        date_from=date_from, date_to=date_to, points=points,
+    )
+
+
+@router.get("/movement", response_model=schemas.MovementSeries)
+def movement_all(
+    date_from: Optional[date] = Query(None, description="Default: 29 days before date_to"),
+    date_to: Optional[date] = Query(None, description="Inclusive; default: today (UTC)"),
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    db: Session = Depends(get_db),
+):
+    return _movement(db, "all", None, date_from, date_to, granularity)
+
+
+@router.get("/movement/categories/{category_id}", response_model=schemas.MovementSeries)
+def movement_category(
+    category_id: int,
+    date_from: Optional[date] = Query(None, description="Default: 29 days before date_to"),
+    date_to: Optional[date] = Query(None, description="Inclusive; default: today (UTC)"),
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    db: Session = Depends(get_db),
+):
+    return _movement(db, "category", category_id, date_from, date_to, granularity)
+
+
+@router.get("/movement/items/{item_id}", response_model=schemas.MovementSeries)
+def movement_item(
+    item_id: int,
+    date_from: Optional[date] = Query(None, description="Default: 29 days before date_to"),
+    date_to: Optional[date] = Query(None, description="Inclusive; default: today (UTC)"),
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    db: Session = Depends(get_db),
+):
+    return _movement(db, "item", item_id, date_from, date_to, granularity)
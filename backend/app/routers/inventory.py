@@ -0,0 +1,68 @@
+# app/routers/inventory.py
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.database import get_db, get_read_db
+from app.deps import require_admin as admin_required
+from app.utils import archive, snapshots
+from app.utils.export import export_response, rows_response
+
+router = APIRouter(prefix="/inventory", tags=["Inventory"])
+
+COLUMNS = ("item_id", "code", "category_id", "quantity")
+
+
+@router.get("/as-of", response_model=schemas.StockAsOfRow | schemas.StockAsOfResponse)
+def stock_as_of(
+    ts: datetime = Query(..., description="Point in time; naive values are taken as UTC"),
+    item_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    format: Optional[str] = Query(
+        None, pattern="^(json|csv|ndjson)$",
+        description="Default json for an item/category, ndjson (streamed) for the whole catalog",
+    ),
+    gzip: bool = Query(False, description="gzip-compress a csv/ndjson stream"),
+    db: Session = Depends(get_db),
+):
+    ts = ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+    scoped = item_id is not None or category_id is not None
+    format = format or ("json" if scoped else "ndjson")
+    if format == "json" and not scoped:
+        raise HTTPException(status_code=400, detail="Use format=csv or ndjson for the whole catalog")
+
+    basename = f"inventory-as-of-{ts:%Y%m%dT%H%M%S}"
+    closing = archive.closing_after(db, ts)
+    if closing is not None:
+        # ts lies in archived history: work back from the closing snapshot
+        snap = closing
+        values = archive.as_of_archived(db, ts, closing, item_id=item_id, category_id=category_id)
+        if format != "json":
+            return rows_response(list(COLUMNS), [values], basename, format, gzip)
+        rows = [schemas.StockAsOfRow(**dict(zip(COLUMNS, v))) for v in values]
+    else:
+        stmt, snap = snapshots.as_of_stmt(db, ts, item_id=item_id, category_id=category_id)
+        if format != "json":
+            return export_response(stmt, basename, format, gzip)
+        rows = [schemas.StockAsOfRow(**r._asdict()) for r in db.execute(stmt).all()]
+
+    if item_id is not None:
+        if not rows:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item did not exist at that time")
+        return rows[0]
+    return schemas.StockAsOfResponse(ts=ts, snapshot_id=snap.id if snap else None, items=rows)
+
+
+@router.get("/snapshots", response_model=list[schemas.StockSnapshotResponse])
+def list_snapshots(limit: int = Query(50, ge=1, le=500), db: Session = Depends(get_read_db)):
+    S = models.StockSnapshot
+    return db.execute(select(S).order_by(S.taken_at.desc(), S.id.desc()).limit(limit)).scalars().all()
+
+
+@router.post("/snapshots", response_model=schemas.StockSnapshotResponse, status_code=status.HTTP_201_CREATED)
+def create_snapshot(db: Session = Depends(get_db), _=Depends(admin_required)):
+    return snapshots.take_snapshot(db)
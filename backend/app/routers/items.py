@@ -1,15 +1,26 @@
 # app/routers/items.py
+from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import select, func
 from fastapi import Body
 from app.schemas import ItemsBulkDeleteRequest
-from app.database import get_db
-from app import models, schemas, crud
+from app.database import get_async_read_db, get_db, get_read_db
+from app import config, models, schemas, crud
 from app.utils import email as email_utils
 from sqlalchemy.exc import IntegrityError
-from app.utils.codes import next_item_code_for_category, normalize_cat3, MIS_PREFIX
+from app.utils.codes import (
+    next_item_code_for_category, allocate_item_code, claim_item_code,
+    resync_counter, normalize_cat3, MIS_PREFIX,
+)
+from app.utils.catalog import conditional_get_async
+from app.utils.category_cache import category_cache
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.utils import importer, low_stock
+from app.utils.export import export_response
+from app.routers.transactions import ledger_page
 
 
 
@@ -21,84 +32,159 @@ router = APIRouter()
 def create_item(
     payload: schemas.ItemCreate,
     db: Session = Depends(get_db),
-    background: BackgroundTasks = None,
 ):
     if not payload.category_id:
         raise HTTPException(status_code=400, detail="category_id is required for auto item code")
 
+    cat = category_cache.get(db, payload.category_id)
+    if not cat or not cat.code:
+        raise HTTPException(400, "Category must have a code")
+
     # normalize/validate incoming code (if any)
     incoming = (payload.code or "").strip() or None
     # enforce prefix if user typed a custom code
     if incoming:
-        cat = db.get(models.Category, payload.category_id)
-        if not cat or not cat.code:
-            raise HTTPException(400, "Category must have a code")
         expected_prefix = f"{MIS_PREFIX}{normalize_cat3(cat.code)}"
         if not incoming.upper().startswith(expected_prefix):
             # override to keep the scheme consistent
             incoming = None
-
-    # Try a few times (handles race on UNIQUE(code))
-    for _ in range(5):
-        code = incoming or next_item_code_for_category(db, payload.category_id, fill_gaps=True)
-        payload.code = code
-
-        # Optional friendly check (not strictly needed if UNIQUE constraint exists)
-        exists = db.execute(
-            select(models.Item).where(models.Item.code == payload.code)
-        ).scalar_one_or_none()
-        if exists:
-            incoming = None
-            continue
+    if incoming and db.execute(select(models.Item.id).where(models.Item.code == incoming)).first():
+        incoming = None
+
+    # Codes come from the per-prefix counter (atomic UPDATE ... RETURNING), so a
+    # collision only happens if codes were written behind the allocator's back;
+    # then resync the counter from the table and try once more.
+    for _ in range(2):
+        if incoming:
+            claim_item_code(db, incoming)
+            payload.code = incoming
+        else:
+            payload.code = allocate_item_code(db, cat.id)
+
+        def notify(item: models.Item) -> None:
+            # queued in the item's transaction: no email for an insert that does not commit
+            email_utils.send_item_created(
+                code=item.code,
+                name=item.name,
+                quantity=item.quantity,
+                category_name=cat.name,
+                db=db,
+            )
+            low_stock.evaluate(db, [item.category_id], commit=False)
 
         try:
-            item = crud.create_item(db, payload)
+            item = crud.create_item(db, payload, notify=notify)
         except IntegrityError:
             db.rollback()
             incoming = None
+            resync_counter(db, normalize_cat3(cat.code))
+            db.commit()
             continue
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
-
-        # notify (unchanged)
-        cat = db.get(models.Category, item.category_id) if item.category_id else None
-        if background is not None:
-            background.add_task(
-                email_utils.send_item_created,
-                code=item.code,
-                name=item.name,
-                quantity=item.quantity,
-                category_name=(cat.name if cat else None),
-                db=db,
-            )
         return item
 
     raise HTTPException(status_code=409, detail="Could not allocate a unique item code. Please retry.")
 
 
+# ---------- Bulk import (CSV / NDJSON) ----------
+@router.post("/import", response_model=schemas.ImportReport)
+def import_items(
+    file: UploadFile = File(..., description="CSV with header code,name,quantity,category_id, or NDJSON"),
+    format: Optional[str] = Query(None, description="csv | ndjson (default: from the file name)"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+):
+    fmt = (format or "").lower()
+    if not fmt:
+        name = (file.filename or "").lower()
+        fmt = "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
+    if fmt not in importer.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {importer.FORMATS}")
+
+    # file.file is the spooled upload; rows are read from it line by line
+    return importer.import_items(db, importer.iter_rows(file.file, fmt), chunk_size=chunk_size)
+
+
 @router.get("/next-code", response_model=schemas.NextCodeResponse)
 def get_next_code(
     category_id: int = Query(..., description="Category ID to base the code on"),
     db: Session = Depends(get_db),
 ):
-    code = next_item_code_for_category(db, category_id, fill_gaps=True)
+    try:
+        code = next_item_code_for_category(db, category_id, fill_gaps=config.ITEM_CODE_FILL_GAPS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()  # persists the counter if this was the prefix's first use
     return schemas.NextCodeResponse(code=code)
 
 # ---------- Read (list with search/pagination) ----------
-@router.get("/", response_model=list[schemas.ItemResponse])
-def list_items(
+# hot read paths are async (database.get_async_read_db): waiting on the DB holds no threadpool thread
+@router.get("/", response_model=list[schemas.ItemResponse] | schemas.ItemPage, dependencies=[Depends(conditional_get_async)])
+async def list_items(
     q: Optional[str] = Query(None, description="Search by code or name (case-insensitive)"),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(
+        None,
+        description="Keyset pagination: send an empty value for the first page, then next_cursor. "
+                    "When present the response is {items, next_cursor} and offset is ignored.",
+    ),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    if cursor is None:
+        # legacy offset paging (plain list) for old clients
+        return await crud.list_items_async(db, q=q, limit=limit, offset=offset)
+
+    # key is (id,) for plain listing, (score, id) for ranked search
+    after = None
+    if cursor:
+        try:
+            after = tuple(int(v) for v in decode_cursor(cursor, 2 if q and q.strip() else 1))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    items, last = await crud.list_items_after_async(db, q=q, limit=limit, after=after)
+    return schemas.ItemPage(
+        items=items,
+        next_cursor=encode_cursor(*last) if last is not None else None,
+    )
+
+
+# ---------- Export (streamed) ----------
+@router.get("/export")
+def export_items(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="gzip-compress the stream (.gz download)"),
+    category_id: Optional[int] = Query(None),
+    updated_since: Optional[datetime] = Query(None, description="Only items updated at/after this time"),
 ):
-    return crud.list_items(db, q=q, limit=limit, offset=offset)
+    stmt = (
+        select(
+            models.Item.id,
+            models.Item.code,
+            models.Item.name,
+            models.Item.quantity,
+            models.Item.category_id,
+            models.Category.code.label("category_code"),
+            models.Category.name.label("category_name"),
+            models.Item.created_at,
+            models.Item.updated_at,
+        )
+        .join(models.Category, models.Category.id == models.Item.category_id)
+        .order_by(models.Item.id)
+    )
+    if category_id is not None:
+        stmt = stmt.where(models.Item.category_id == category_id)
+    if updated_since is not None:
+        stmt = stmt.where(models.Item.updated_at >= updated_since)
+    return export_response(stmt, "items", format, gzip)
 
 
 # ---------- Read (by id) ----------
-@router.get("/{item_id}", response_model=schemas.ItemResponse)
-def get_item(item_id: int, db: Session = Depends(get_db)):
-    item = crud.get_item(db, item_id)
+@router.get("/{item_id}", response_model=schemas.ItemResponse, dependencies=[Depends(conditional_get_async)])
+async def get_item(item_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    item = await crud.get_item_async(db, item_id)
     if not item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
     return item
@@ -107,12 +193,38 @@ def get_item(item_id: int, db: Session = Depends(get_db)):
 # ---------- Update (partial: body fields) ----------
 @router.patch("/{item_id}", response_model=schemas.ItemResponse)
 def update_item(item_id: int, payload: schemas.ItemUpdate, db: Session = Depends(get_db)):
-    updated = crud.update_item(db, item_id, payload)
+    updated = crud.update_item(
+        db, item_id, payload,
+        notify=lambda item, old_category_id: low_stock.evaluate(
+            db, [old_category_id, item.category_id], commit=False
+        ),
+    )
     if not updated:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
     return updated
 
 
+# ---------- Ledger ----------
+@router.get("/{item_id}/transactions", response_model=schemas.TransactionPage)
+def list_item_transactions(
+    item_id: int,
+    performed_by: Optional[int] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="created_at >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="created_at < date_to"),
+    direction: Optional[str] = Query(None, pattern="^(in|out)$", description="in: qty_change > 0, out: < 0"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db),
+):
+    if db.get(models.Item, item_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    return ledger_page(
+        db, cursor, limit,
+        item_id=item_id, performed_by=performed_by,
+        date_from=date_from, date_to=date_to, direction=direction,
+    )
+
+
 # ---------- Stock adjust (delta via query) ----------
 @router.patch("/{item_id}/adjust", response_model=schemas.ItemResponse)
 def adjust_stock(
@@ -120,130 +232,98 @@ def adjust_stock(
     change: int = Query(..., description="Use +N to add, -N to remove", ne=0),
     note: str = Query("", description="Optional note"),
     db: Session = Depends(get_db),
-    background: BackgroundTasks = None,
 ):
-    # 1) Load item + its category (buffer now lives on the category)
-    item = db.get(models.Item, item_id)
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-
-    category = db.get(models.Category, item.category_id) if item.category_id else None
-    old_qty = item.quantity or 0
-
-    # 2) Category total BEFORE the change
-    old_total = None
-    cat_buffer = None
-    if category:
-        old_total = (
-            db.query(func.coalesce(func.sum(models.Item.quantity), 0))
-              .filter(models.Item.category_id == category.id)
-              .scalar()
-        )
-        cat_buffer = category.buffer or 0
-
-    # 3) Apply the change (CRUD commits + logs transaction)
-    updated = crud.adjust_item_quantity(db, item_id, change, note)
-    if updated is None:
-        raise HTTPException(status_code=400, detail="Invalid adjustment")
-
-    # 4) Per-item stock change email
-    if background is not None:
-        background.add_task(
-            email_utils.send_stock_change,
+    def notify(updated: models.Item) -> None:
+        # 2) Per-item stock change email (queued in the outbox, or folded into a digest)
+        email_utils.send_stock_change(
             code=updated.code,
             name=updated.name,
-            old_qty=old_qty,
+            old_qty=updated.quantity - change,
             new_qty=updated.quantity,
             note=note,
             db=db,
         )
+        # 3) Category low-stock state (alerts only when it gets worse)
+        low_stock.evaluate(db, [updated.category_id], commit=False)
+
+    # 1) Apply the change atomically (single UPDATE ... RETURNING + ledger row; 2 and 3 are
+    #    queued in the same transaction, one commit)
+    try:
+        result = crud.adjust_item_quantity(db, item_id, change, note, notify=notify)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    updated, _ = result
+    return updated
 
-    # 5) Category-level low stock detection
-    if category:
-        new_total = (
-            db.query(func.coalesce(func.sum(models.Item.quantity), 0))
-              .filter(models.Item.category_id == category.id)
-              .scalar()
-        )
-        cat_buffer = category.buffer or 0
-
-        # "Crossing" logic: alert if we moved from OK to LOW,
-        # or if already low and we made a further decrement.
-        was_ok = (old_total is not None) and (old_total >= cat_buffer)
-        now_low = new_total < cat_buffer
-        is_decrement = change < 0
-
-        if (was_ok and now_low) or (now_low and is_decrement and new_total != old_total):
-            if background is not None:
-                background.add_task(
-                    email_utils.send_category_low_stock,
-                    category_code=category.code,
-                    category_name=category.name,
-                    total_qty=new_total,
-                    buffer=category.buffer,
-                    affected_item_code=updated.code,
-                    affected_item_name=updated.name,
-                    db=db,
-                )
 
-    return updated
+# ---------- Stock adjust (batch) ----------
+@router.post("/adjust/batch", response_model=schemas.BatchAdjustResponse)
+def adjust_stock_batch(
+    payload: schemas.BatchAdjustRequest,
+    db: Session = Depends(get_db),
+):
+    def notify(moved: list[dict], categories: list[dict]) -> None:
+        if moved:
+            # one consolidated email for the whole batch instead of one per line
+            email_utils.send_batch_stock_change(
+                items=moved,
+                note=payload.note,
+                db=db,
+            )
+        # low-stock state of every touched category, in one query
+        low_stock.evaluate(db, [cat["id"] for cat in categories], commit=False)
+
+    results, _, _ = crud.adjust_items_batch(
+        db, payload.lines, atomic=payload.atomic, allow_negative=payload.allow_negative, notify=notify
+    )
+    rejected = sum(1 for r in results if not r["ok"])
+    body = schemas.BatchAdjustResponse(applied=len(results) - rejected, rejected=rejected, results=results)
+    if payload.atomic and rejected:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=body.model_dump())
+    return body
 
 
 # ---------- Delete ----------
 
-@router.delete("/bulk", status_code=204)
+@router.delete("/bulk", response_model=schemas.ItemsBulkDeleteResponse)
 def bulk_delete_items(
     payload: ItemsBulkDeleteRequest = Body(...),
-    background: BackgroundTasks = BackgroundTasks(),
     db: Session = Depends(get_db),
 ):
-    # fetch items first (to include in email), then delete
-    ids = list({int(i) for i in payload.ids})
-    if not ids:
-        return None
-
-    items = db.execute(select(models.Item).where(models.Item.id.in_(ids))).scalars().all()
-    if not items:
-        return None
-
-    # prepare for email summary before deleting
-    summary = [{"code": it.code, "name": it.name} for it in items]
-
-    # delete in one transaction
-    for it in items:
-        db.delete(it)
-    db.commit()
-
-    # one email for the batch
-    background.add_task(
-        email_utils.send_bulk_item_deletion,
-        items=summary,
-        note=payload.note or None,
-    )
-    return None
-
-@router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_item(item_id: int, db: Session = Depends(get_db), background: BackgroundTasks = None):
-    item = db.get(models.Item, item_id)
-    if not item:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
-
-    # cache for email after delete
-    code, name, last_qty = item.code, item.name, item.quantity
+    def notify(deleted: list[dict]) -> None:
+        # one email for the batch
+        email_utils.send_bulk_item_deletion(
+            items=[{"code": d["code"], "name": d["name"]} for d in deleted],
+            note=payload.note or None,
+            db=db,
+        )
+        low_stock.evaluate(db, [d["category_id"] for d in deleted], commit=False)
 
-    ok = crud.delete_item(db, item_id)
-    if not ok:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    # one set-based DELETE ... RETURNING per chunk; the rows it returns feed the email
+    deleted, tx_count = crud.delete_items(db, payload.ids, notify=notify)
+    if not deleted:
+        return schemas.ItemsBulkDeleteResponse(deleted_items=0, deleted_transactions=0)
+    return schemas.ItemsBulkDeleteResponse(deleted_items=len(deleted), deleted_transactions=tx_count)
 
-    # notify (fire-and-forget)
-    if background is not None:
-        background.add_task(
-            email_utils.send_item_deleted,
-            code=code,
-            name=name,
-            last_known_qty=last_qty,
+@router.delete("/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_item(item_id: int, db: Session = Depends(get_db)):
+    def notify(deleted: list[dict]) -> None:
+        # queued in the outbox, in the delete's transaction
+        gone = deleted[0]
+        email_utils.send_item_deleted(
+            code=gone["code"],
+            name=gone["name"],
+            last_known_qty=gone["quantity"],
             db=db,
         )
+        low_stock.evaluate(db, [gone["category_id"]], commit=False)
+
+    # DELETE ... RETURNING gives us what the email needs, no pre-read
+    deleted, _ = crud.delete_items(db, [item_id], notify=notify)
+    if not deleted:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
     return None
 
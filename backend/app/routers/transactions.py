@@ -0,0 +1,108 @@
+# app/routers/transactions.py
+from datetime import datetime
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.crud import _ts_param
+from app.database import SessionLocal, get_read_db
+from app.utils import archive
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.utils.export import BATCH_ROWS, rows_response
+
+router = APIRouter(prefix="/transactions", tags=["Transactions"])
+
+
+def ledger_page(db: Session, cursor: Optional[str], limit: int, **filters) -> schemas.TransactionPage:
+    """Shared by GET /transactions and GET /items/{id}/transactions."""
+    after = None
+    if cursor:
+        try:
+            ts, tx_id = decode_cursor(cursor, 2)
+            after = (datetime.fromisoformat(ts), int(tx_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows, last = crud.list_transactions_after(db, limit=limit, after=after, **filters)
+    # older history may live in the ledger archive; fold it in transparently
+    rows, last = archive.merge_page(db, rows, last, limit, after, **filters)
+    return schemas.TransactionPage(
+        transactions=rows,
+        next_cursor=encode_cursor(last[0].isoformat(), last[1]) if last is not None else None,
+    )
+
+
+@router.get("", response_model=schemas.TransactionPage)
+def list_transactions(
+    item_id: Optional[int] = Query(None),
+    performed_by: Optional[int] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="created_at >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="created_at < date_to"),
+    direction: Optional[str] = Query(None, pattern="^(in|out)$", description="in: qty_change > 0, out: < 0"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_read_db),
+):
+    return ledger_page(
+        db, cursor, limit,
+        item_id=item_id, performed_by=performed_by,
+        date_from=date_from, date_to=date_to, direction=direction,
+    )
+
+
+@router.get("/export")
+def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="gzip-compress the stream (.gz download)"),
+    item_id: Optional[int] = Query(None),
+    category_id: Optional[int] = Query(None),
+    performed_by: Optional[int] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="created_at >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="created_at < date_to"),
+    db: Session = Depends(get_read_db),
+):
+    stmt = (
+        select(
+            models.Transaction.id,
+            models.Transaction.item_id,
+            models.Item.code.label("item_code"),
+            models.Item.category_id,
+            models.Transaction.qty_change,
+            models.Transaction.note,
+            models.Transaction.performed_by,
+            models.Transaction.created_at,
+        )
+        .join(models.Item, models.Item.id == models.Transaction.item_id)
+        .order_by(models.Transaction.id)
+    )
+    if item_id is not None:
+        stmt = stmt.where(models.Transaction.item_id == item_id)
+    if category_id is not None:
+        stmt = stmt.where(models.Item.category_id == category_id)
+    if performed_by is not None:
+        stmt = stmt.where(models.Transaction.performed_by == performed_by)
+    if date_from is not None:
+        stmt = stmt.where(models.Transaction.created_at >= _ts_param(db, date_from))
+    if date_to is not None:
+        stmt = stmt.where(models.Transaction.created_at < _ts_param(db, date_to))
+    # rows still awaiting the purge of an interrupted archive run come from the archive
+    stmt = stmt.where(models.Transaction.id > archive.archived_upto(db))
+    filters = dict(item_id=item_id, category_id=category_id, performed_by=performed_by,
+                   date_from=date_from, date_to=date_to)
+    return rows_response(list(archive.EXPORT_COLUMNS), _export_rows(stmt, filters), "transactions", format, gzip)
+
+
+def _export_rows(stmt, filters: dict) -> Iterator[list]:
+    """
+    Archived rows, then the live ones, in id order (like the list endpoints, the
+    export spans the archive). Own session: the body streams after get_db closes.
+    """
+    db = SessionLocal()
+    try:
+        yield from archive.iter_export(db, **filters, batch_rows=BATCH_ROWS)
+        yield from db.execute(stmt.execution_options(yield_per=BATCH_ROWS)).partitions()
+    finally:
+        db.close()
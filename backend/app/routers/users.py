@@ -1,16 +1,25 @@
 # app/routers/users.py
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
-from app.security import hash_password
-from app.deps import require_admin as admin_required, get_current_user, CurrentUser, AdminUser
+from app.deps import require_admin as admin_required, get_current_profile, CurrentUser, AdminUser
+from app.utils.password_pool import hash_or_503
+from app.utils.user_cache import revoke_tokens, user_cache
 
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
+# create/update are async so that bcrypt runs in the bounded password pool (as login does),
+# not in the threadpool shared by every sync endpoint; their DB work still goes through it
+
 @router.post("/", response_model=schemas.UserResponse, status_code=201)
-def create_user(payload: schemas.UserCreate, db: Session = Depends(get_db), admin=Depends(admin_required)):
+async def create_user(payload: schemas.UserCreate, db: Session = Depends(get_db), admin=Depends(admin_required)):
+    password_hash = await hash_or_503(payload.password)
+    return await run_in_threadpool(_create_user, db, payload, password_hash)
+
+def _create_user(db: Session, payload: schemas.UserCreate, password_hash: str):
     if db.query(models.User).filter(models.User.username == payload.username).first():
         raise HTTPException(status_code=409, detail="Username already exists")
     if payload.email and db.query(models.User).filter(models.User.email == payload.email).first():
@@ -18,7 +27,7 @@ def create_user(payload: schemas.UserCreate, db: Session = Depends(get_db), admi
 
     user = models.User(
         username=payload.username,
-        password_hash=hash_password(payload.password),
+        password_hash=password_hash,
         name=payload.name,
         email=payload.email,
         role=payload.role,
@@ -34,7 +43,11 @@ def list_users(db: Session = Depends(get_db), admin=Depends(admin_required)):
     return db.query(models.User).order_by(models.User.id.desc()).all()
 
 @router.patch("/{user_id}", response_model=schemas.UserResponse)
-def update_user(user_id: int, payload: schemas.UserUpdate, db: Session = Depends(get_db), admin=Depends(admin_required)):
+async def update_user(user_id: int, payload: schemas.UserUpdate, db: Session = Depends(get_db), admin=Depends(admin_required)):
+    password_hash = await hash_or_503(payload.password) if payload.password else None
+    return await run_in_threadpool(_update_user, db, user_id, payload, password_hash)
+
+def _update_user(db: Session, user_id: int, payload: schemas.UserUpdate, password_hash: str | None):
     user = db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -45,10 +58,14 @@ def update_user(user_id: int, payload: schemas.UserUpdate, db: Session = Depends
     if payload.role is not None:
         user.role = payload.role
     if payload.is_admin is not None:
+        if payload.is_admin != user.is_admin:
+            revoke_tokens(user)
         user.is_admin = payload.is_admin
-    if payload.password:
-        user.password_hash = hash_password(payload.password)
+    if password_hash:
+        user.password_hash = password_hash
+        revoke_tokens(user)
     db.commit()
+    user_cache.invalidate(user.username)
     db.refresh(user)
     return user
 
@@ -57,12 +74,14 @@ def delete_user(user_id: int, db: Session = Depends(get_db), admin=Depends(admin
     user = db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    username = user.username
     db.delete(user)
     db.commit()
+    user_cache.invalidate(username)
     return None
 
-@router.get("/me")
-def me(user: CurrentUser):
+@router.get("/me", response_model=schemas.UserResponse)
+def me(user=Depends(get_current_profile)):
     return user
 
 @router.get("/users", response_model=list[schemas.UserResponse])
@@ -1,7 +1,7 @@
 # app/schemas.py (Pydantic v2)
 from typing import Optional
 from pydantic import BaseModel, ConfigDict, Field, EmailStr
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, Annotated
 from app.deps import get_current_user, require_admin as require_admin
 
@@ -23,9 +23,36 @@ class CategoryUpdate(BaseModel):
 
 class CategoryResponse(CategoryBase):
     id: int
+    total_quantity: int = 0
+    item_count: int = 0
     created_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
+class CategoryStockAlertResponse(BaseModel):
+    category_id: int
+    code: Optional[str] = None
+    name: str
+    state: str                # LOW | CRITICAL
+    total_quantity: int       # when the state changed
+    buffer: int
+    changed_at: datetime
+    last_notified_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class LowStockChange(BaseModel):
+    category_id: int
+    code: Optional[str] = None
+    name: str
+    from_state: str
+    to_state: str
+    total_quantity: int
+    buffer: int
+    notified: bool
+
+class LowStockEvaluation(BaseModel):
+    evaluated: int
+    changes: list[LowStockChange]
+
 
 # ---------- Item ----------
 class ItemBase(BaseModel):
@@ -51,6 +78,10 @@ class ItemResponse(ItemBase):
     updated_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
+class ItemPage(BaseModel):
+    items: list[ItemResponse]
+    next_cursor: Optional[str] = None
+
 # ----- Auth -----
 class Token(BaseModel):
     access_token: str
@@ -108,6 +139,10 @@ class TransactionResponse(TransactionBase):
     created_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
+class TransactionPage(BaseModel):
+    transactions: list[TransactionResponse]
+    next_cursor: Optional[str] = None
+
 class AdminUserCreate(BaseModel):
     username: str
     password: str
@@ -146,6 +181,95 @@ class ItemsBulkDeleteRequest(BaseModel):
     ids: list[int] = Field(min_length=1)
     note: str | None = None
 
+class ItemsBulkDeleteResponse(BaseModel):
+    deleted_items: int
+    deleted_transactions: int
+
 class NextCodeResponse(BaseModel):
     code: str
 
+class AdjustLine(BaseModel):
+    item_id: int
+    change: int  # +N / -N; 0 is rejected per line
+    note: str = ""
+
+class BatchAdjustRequest(BaseModel):
+    lines: list[AdjustLine] = Field(min_length=1, max_length=2000)
+    # True: any rejected line rolls back the whole batch (409); False: apply the good lines
+    atomic: bool = True
+    allow_negative: Optional[bool] = None  # None -> config.STOCK_ALLOW_NEGATIVE
+    note: Optional[str] = None  # shown in the consolidated email
+
+class AdjustLineResult(BaseModel):
+    index: int
+    item_id: int
+    change: int
+    ok: bool
+    quantity: Optional[int] = None  # item quantity after the whole batch
+    error: Optional[str] = None
+
+class BatchAdjustResponse(BaseModel):
+    applied: int
+    rejected: int
+    results: list[AdjustLineResult]
+
+# ---------- Dashboard ----------
+class CategorySummary(BaseModel):
+    id: int
+    name: str
+    code: Optional[str] = None
+    buffer: int
+    item_count: int
+    total_quantity: int
+    severity: str  # ok | warn | low | critical
+
+class DashboardSummary(BaseModel):
+    total_items: int
+    total_quantity: int
+    categories: list[CategorySummary]
+    generated_at: datetime
+
+class MovementPoint(BaseModel):
+    day: date                 # the day, or the Monday of the week
+    qty_in: int
+    qty_out: int
+    net: int
+    tx_count: int
+
+class MovementSeries(BaseModel):
+    scope: str                # "item" | "category" | "all"
+    scope_id: Optional[int] = None
+    granularity: str
+    date_from: date
+    date_to: date
+    points: list[MovementPoint]
+
+class StockSnapshotResponse(BaseModel):
+    id: int
+    taken_at: datetime
+    last_tx_id: int
+    kind: str
+    item_count: int
+    model_config = ConfigDict(from_attributes=True)
+
+class StockAsOfRow(BaseModel):
+    item_id: int
+    code: str
+    category_id: int
+    quantity: int
+
+class StockAsOfResponse(BaseModel):
+    ts: datetime
+    snapshot_id: Optional[int] = None   # snapshot the figures were rolled forward from
+    items: list[StockAsOfRow]
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: list[ImportRowError]
+    errors_truncated: bool = False
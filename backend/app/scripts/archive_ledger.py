@@ -0,0 +1,38 @@
+# app/scripts/archive_ledger.py
+"""
+Move ledger rows older than the horizon into gzip NDJSON files (one folder per month).
+
+    python -m app.scripts.archive_ledger                # horizon: LEDGER_ARCHIVE_AFTER_MONTHS
+    python -m app.scripts.archive_ledger --months 6 --dry-run
+
+Safe to re-run after an interruption; see app/utils/archive.py for the steps.
+"""
+import argparse
+
+from app import config
+from app.database import SessionLocal
+from app.utils.archive import archive_ledger
+
+
+def run(months: int | None = None, dry_run: bool = False) -> dict:
+    db = SessionLocal()
+    try:
+        report = archive_ledger(db, months=months, dry_run=dry_run)
+    finally:
+        db.close()
+    print(f"[archive] horizon {report['horizon']}, ledger ids {report['from_tx_id']}..{report['to_tx_id']}")
+    if dry_run:
+        print(f"[archive] would archive {report['archived']} rows (dry run, nothing written)")
+        return report
+    for p in report["parts"]:
+        print(f"[archive] wrote {config.LEDGER_ARCHIVE_DIR}/{p}")
+    print(f"[archive] {report['archived']} rows archived, {report['deleted']} deleted from transactions")
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--months", type=int, default=None, help="archive whole months older than this many")
+    ap.add_argument("--dry-run", action="store_true", help="only report what would be archived")
+    args = ap.parse_args()
+    run(months=args.months, dry_run=args.dry_run)
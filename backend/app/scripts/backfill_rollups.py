@@ -0,0 +1,43 @@
+# app/scripts/backfill_rollups.py
+"""
+Fold the transactions ledger into daily_item_movement / daily_category_movement.
+
+    python -m app.scripts.backfill_rollups             # catch up from the watermark
+    python -m app.scripts.backfill_rollups --rebuild   # wipe the rollups and redo all history
+
+Works through the ledger in id windows of --batch rows, one commit each, so it
+can be interrupted and re-run; the endpoints keep serving meanwhile.
+"""
+import argparse
+import time
+
+from app.database import SessionLocal
+from app.utils import rollups
+
+
+def run(rebuild: bool = False, batch: int = rollups.BATCH) -> int:
+    db = SessionLocal()
+    total = 0
+    t0 = time.perf_counter()
+    try:
+        if rebuild:
+            rollups.rebuild(db)
+            print("[rollups] cleared, rebuilding from the start of the ledger")
+        while True:
+            n = rollups.refresh(db, max_rows=batch, batch=batch)
+            if not n:
+                break
+            total += n
+            print(f"[rollups] {total} ledger rows folded ({time.perf_counter() - t0:.1f}s)")
+    finally:
+        db.close()
+    print(f"[rollups] up to date, {total} rows folded in this run")
+    return total
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rebuild", action="store_true", help="empty the rollup tables and backfill all history")
+    ap.add_argument("--batch", type=int, default=rollups.BATCH, help="ledger rows per commit")
+    args = ap.parse_args()
+    run(rebuild=args.rebuild, batch=args.batch)
@@ -0,0 +1,85 @@
+# app/scripts/bench_etag.py
+"""
+Cost of a catalog GET with and without a matching If-None-Match.
+
+Seeds a throwaway database, then times GET /items?limit=N and GET /categories/
+through the ASGI app: a full 200 (query + ORM load + serialization) versus
+the 304 path (one version lookup, no body).
+
+    python -m app.scripts.bench_etag --items 20000 --limit 200
+    python -m app.scripts.bench_etag --url postgresql+psycopg2://...   # scratch DB only
+
+Defaults to a temporary SQLite file so it never touches the real DB.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def _time(fn, repeat: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def run(url: str, items: int, limit: int, repeat: int) -> None:
+    # the app binds its engine at import, so point it at the scratch DB first
+    from app import config
+    config.DATABASE_URL = url
+    config.DATABASE_ASYNC_URL = ""
+    config.DATABASE_READ_URL = ""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+
+    from app import models
+    from app.database import SessionLocal
+    from app.main import app
+
+    with SessionLocal() as db:
+        cats = [models.Category(name=f"Bench {n}", code=f"B{n:02d}", buffer=0) for n in range(20)]
+        db.add_all(cats)
+        db.commit()
+        for lo in range(0, items, 10_000):
+            db.execute(insert(models.Item), [
+                {"code": f"BENCH{n:09d}", "name": f"Bench item {n}", "quantity": n % 97,
+                 "category_id": cats[n % len(cats)].id}
+                for n in range(lo, min(lo + 10_000, items))
+            ])
+        db.commit()
+
+    c = TestClient(app)
+    print(f"{'endpoint':<28} {'200 p50 ms':>11} {'200 p95':>8} {'304 p50 ms':>11} {'304 p95':>8} {'body KB':>8}")
+    for path, params in (("/items/", {"limit": limit}), ("/categories/", {})):
+        first = c.get(path, params=params)
+        tag = first.headers["etag"]
+        full = _time(lambda: c.get(path, params=params), repeat)
+        cond = _time(lambda: c.get(path, params=params, headers={"If-None-Match": tag}), repeat)
+        assert c.get(path, params=params, headers={"If-None-Match": tag}).status_code == 304
+        label = path + (f"?limit={limit}" if params else "")
+        print(f"{label:<28} {full[0]:>11.2f} {full[1]:>8.2f} {cond[0]:>11.2f} {cond[1]:>8.2f} "
+              f"{len(first.content) / 1024:>8.1f}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="SQLAlchemy URL of a scratch database")
+    ap.add_argument("--items", type=int, default=20_000)
+    ap.add_argument("--limit", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    if args.url:
+        run(args.url, args.items, args.limit, args.repeat)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", args.items, args.limit, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
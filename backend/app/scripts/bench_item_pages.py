@@ -0,0 +1,102 @@
+# app/scripts/bench_item_pages.py
+"""
+Deep-page latency of GET /items: OFFSET vs keyset cursor.
+
+Grows an items table in steps and, at each size, times fetching the page
+that sits ~90% of the way through the catalog both ways. OFFSET latency
+grows with the table; cursor latency should stay flat.
+
+    python -m app.scripts.bench_item_pages --sizes 10000,100000,500000
+    python -m app.scripts.bench_item_pages --url postgresql+psycopg2://...
+
+Defaults to a throwaway SQLite file so it never touches the real DB.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import models, crud
+
+PAGE = 50
+
+
+def _grow(db, category_id: int, start: int, stop: int) -> None:
+    chunk = 10_000
+    for lo in range(start, stop, chunk):
+        hi = min(lo + chunk, stop)
+        db.execute(
+            insert(models.Item),
+            [
+                {"code": f"BENCH{n:09d}", "name": f"Bench item {n}", "quantity": n % 97, "category_id": category_id}
+                for n in range(lo, hi)
+            ],
+        )
+    db.commit()
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def run(url: str, sizes: list[int], repeat: int) -> None:
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    db = Session()
+    try:
+        cat = models.Category(name="Bench", code="BEN", buffer=0)
+        db.add(cat)
+        db.commit()
+
+        have = 0
+        print(f"{'rows':>10} {'offset':>10} {'offset ms':>10} {'cursor ms':>10}")
+        for size in sizes:
+            _grow(db, cat.id, have, size)
+            have = size
+
+            offset = int(size * 0.9) // PAGE * PAGE
+            # the cursor a client would hold after paging to that offset
+            after_id = db.execute(
+                select(models.Item.id).order_by(models.Item.id.desc()).offset(offset - 1).limit(1)
+            ).scalar_one()
+
+            off_ms = _time(lambda: crud.list_items(db, limit=PAGE, offset=offset), repeat)
+            cur_ms = _time(lambda: crud.list_items_after(db, limit=PAGE, after=(after_id,)), repeat)
+            print(f"{size:>10} {offset:>10} {off_ms:>10.2f} {cur_ms:>10.2f}")
+
+        total = db.execute(select(func.count(models.Item.id))).scalar_one()
+        print(f"done ({total} rows)")
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="SQLAlchemy URL of a scratch database")
+    ap.add_argument("--sizes", default="10000,50000,100000,250000,500000")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(",") if s.strip())
+    if args.url:
+        run(args.url, sizes, args.repeat)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
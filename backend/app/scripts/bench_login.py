@@ -0,0 +1,141 @@
+# app/scripts/bench_login.py
+"""
+Login storm benchmark: N simultaneous POST /auth/login against the ASGI app,
+while a reader keeps calling GET /items/ and records its latency.
+
+Reports login throughput, how many were shed with 503, and item read latency
+before and during the storm (reads should stay flat: bcrypt runs in its own
+bounded pool, not in the threadpool the item endpoints use).
+
+    python -m app.scripts.bench_login --users 300 --rounds 12
+    python -m app.scripts.bench_login --workers 2 --max-queue 20      # see shedding
+    python -m app.scripts.bench_login --seed-rounds 10 --rounds 12    # see rehash-on-login
+
+Defaults to a temporary SQLite file so it never touches the real DB.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+PASSWORD = "storm-password"
+
+
+def _pct(samples: list[float]) -> str:
+    if not samples:
+        return "-"
+    samples = sorted(samples)
+    return f"p50 {statistics.median(samples):.1f} ms, p95 {samples[max(int(len(samples) * 0.95) - 1, 0)]:.1f} ms"
+
+
+async def _storm(app, users: int, read_limit: int) -> None:
+    import httpx
+
+    from app.utils.password_pool import password_pool
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as c:
+        async def read_once() -> float:
+            t0 = time.perf_counter()
+            r = await c.get("/items/", params={"limit": read_limit})
+            assert r.status_code == 200, r.text
+            return (time.perf_counter() - t0) * 1000
+
+        baseline = [await read_once() for _ in range(50)]
+
+        done = asyncio.Event()
+        during: list[float] = []
+
+        async def reader() -> None:
+            while not done.is_set():
+                during.append(await read_once())
+                await asyncio.sleep(0.01)
+
+        async def login(n: int) -> int:
+            r = await c.post("/auth/login", json={"username": f"storm{n:05d}", "password": PASSWORD})
+            return r.status_code
+
+        reading = asyncio.create_task(reader())
+        t0 = time.perf_counter()
+        codes = await asyncio.gather(*(login(n) for n in range(users)))
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await reading
+
+    ok = codes.count(200)
+    print(f"logins: {users} at once, {ok} ok, {codes.count(503)} shed (503), "
+          f"{len(codes) - ok - codes.count(503)} other; {elapsed:.2f}s, {ok / elapsed:.1f} logins/s")
+    print(f"pool:   {password_pool.stats()}")
+    print(f"GET /items/?limit={read_limit} before storm: {_pct(baseline)}")
+    print(f"GET /items/?limit={read_limit} during storm: {_pct(during)} ({len(during)} reads)")
+
+
+def run(url: str, users: int, rounds: int, seed_rounds: int | None, workers: int | None,
+        max_queue: int | None, items: int, read_limit: int) -> None:
+    # the app reads these at import, so set them before importing it
+    from app import config
+    config.DATABASE_URL = url
+    config.DATABASE_ASYNC_URL = ""
+    config.DATABASE_READ_URL = ""
+    config.BCRYPT_ROUNDS = rounds
+    if workers is not None:
+        config.PASSWORD_HASH_WORKERS = workers
+    if max_queue is not None:
+        config.PASSWORD_HASH_MAX_QUEUE = max_queue
+    from passlib.context import CryptContext
+    from sqlalchemy import func, insert, select
+
+    from app import models
+    from app.database import SessionLocal
+    from app.main import app
+
+    # one hash shared by all seeded users keeps seeding fast
+    hashed = CryptContext(schemes=["bcrypt"], bcrypt__rounds=seed_rounds or rounds).hash(PASSWORD)
+    with SessionLocal() as db:
+        db.execute(insert(models.User), [
+            {"username": f"storm{n:05d}", "password_hash": hashed, "name": f"Storm {n}"} for n in range(users)
+        ])
+        cat = models.Category(name="Bench", code="BN", buffer=0)
+        db.add(cat)
+        db.flush()
+        db.execute(insert(models.Item), [
+            {"code": f"BENCH{n:09d}", "name": f"Bench item {n}", "quantity": n % 97, "category_id": cat.id}
+            for n in range(items)
+        ])
+        db.commit()
+
+    asyncio.run(_storm(app, users, read_limit))
+
+    if seed_rounds and seed_rounds != rounds:
+        with SessionLocal() as db:
+            upgraded = db.execute(
+                select(func.count()).where(models.User.password_hash.like(f"$2b${rounds:02d}$%"))
+            ).scalar_one()
+        print(f"rehash: {upgraded}/{users} stored hashes now at cost {rounds} (seeded at {seed_rounds})")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="SQLAlchemy URL of a scratch database")
+    ap.add_argument("--users", type=int, default=300, help="simultaneous logins")
+    ap.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS for the run")
+    ap.add_argument("--seed-rounds", type=int, default=None, help="bcrypt cost of the seeded hashes")
+    ap.add_argument("--workers", type=int, default=None, help="PASSWORD_HASH_WORKERS")
+    ap.add_argument("--max-queue", type=int, default=None, help="PASSWORD_HASH_MAX_QUEUE")
+    ap.add_argument("--items", type=int, default=2000)
+    ap.add_argument("--read-limit", type=int, default=50)
+    args = ap.parse_args()
+
+    opts = dict(users=args.users, rounds=args.rounds, seed_rounds=args.seed_rounds, workers=args.workers,
+                max_queue=args.max_queue, items=args.items, read_limit=args.read_limit)
+    if args.url:
+        run(args.url, **opts)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        run(f"sqlite:///{os.path.join(tmp, 'bench.db')}", **opts)
+
+
+if __name__ == "__main__":
+    main()
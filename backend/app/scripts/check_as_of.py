@@ -0,0 +1,86 @@
+# app/scripts/check_as_of.py
+"""
+Check point-in-time stock (app.utils.snapshots.as_of_stmt) across adjustments,
+a PATCH /items/{id} quantity edit and an item delete, on a temporary SQLite
+database, both from a snapshot ("snapshot + ledger delta") and without one
+("live minus later deltas").
+
+    python -m app.scripts.check_as_of
+
+Steps are a second apart (SQLite timestamps have one-second resolution), so
+this takes a few seconds. Exits non-zero on the first surprise.
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+def _expect(what: str, got, want) -> None:
+    print(f"{'ok  ' if got == want else 'FAIL'} {what}: {got}")
+    if got != want:
+        raise SystemExit(1)
+
+
+def _tick() -> datetime:
+    """A moment strictly between the writes before and after it."""
+    time.sleep(1.1)
+    ts = datetime.now(timezone.utc)
+    time.sleep(1.1)
+    return ts
+
+
+def run() -> None:
+    tmp = tempfile.mkdtemp()
+    from app import config
+    config.DATABASE_URL = f"sqlite:///{os.path.join(tmp, 'as_of.db')}"
+    config.DATABASE_ASYNC_URL = ""
+    config.DATABASE_READ_URL = ""
+
+    from app import crud, models, schemas
+    from app.database import Base, SessionLocal, engine
+    from app.utils import snapshots
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        cat = models.Category(name="As-of check", code="AOC", buffer=0)
+        db.add(cat)
+        db.commit()
+        item = crud.create_item(db, schemas.ItemCreate(code="MISAOC0001", name="Checked", quantity=100,
+                                                       category_id=cat.id))
+        item_id = item.id
+        gone = crud.create_item(db, schemas.ItemCreate(code="MISAOC0002", name="Deleted later", quantity=7,
+                                                       category_id=cat.id))
+        gone_id = gone.id
+
+        t_created = _tick()
+        crud.adjust_item_quantity(db, item_id, -10, "count")
+        snapshots.take_snapshot(db)
+        t_adjusted = _tick()
+        crud.update_item(db, item_id, schemas.ItemUpdate(quantity=40))
+        t_edited = _tick()
+        crud.adjust_item_quantity(db, item_id, 5, "count")
+        t_before_delete = _tick()
+        crud.delete_items(db, [gone_id])
+        t_now = _tick()
+
+        _expect("edit recorded in the ledger",
+                db.query(models.Transaction.qty_change).filter_by(item_id=item_id, note="edit").scalar(), -50)
+        for label, ts, want in (
+            ("before the snapshot (live minus later deltas)", t_created, 100),
+            ("at the snapshot", t_adjusted, 90),
+            ("after the PATCH (snapshot + delta)", t_edited, 40),
+            ("now", t_now, 45),
+        ):
+            stmt, _ = snapshots.as_of_stmt(db, ts, item_id=item_id)
+            _expect(f"as of {label}", db.execute(stmt).one().quantity, want)
+        for label, ts, want in (
+            ("before its delete", t_before_delete, [7]),
+            ("after its delete", t_now, []),
+        ):
+            stmt, _ = snapshots.as_of_stmt(db, ts, item_id=gone_id)
+            _expect(f"deleted item as of {label}", [r.quantity for r in db.execute(stmt)], want)
+
+
+if __name__ == "__main__":
+    run()
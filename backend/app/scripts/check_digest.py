@@ -0,0 +1,100 @@
+# app/scripts/check_digest.py
+"""
+Exercise notification digests (app.utils.digest) on a temporary SQLite
+database: a cycle count of --events stock changes over --items items is
+folded into one summary email per recipient set, with net deltas, and the
+coalescing counters add up. No SMTP relay needed; the check stops at the
+outbox.
+
+    python -m app.scripts.check_digest --events 2000 --items 500
+
+Exits non-zero on the first surprise.
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def _expect(what: str, got, want) -> None:
+    print(f"{'ok  ' if got == want else 'FAIL'} {what}: {got}")
+    if got != want:
+        raise SystemExit(1)
+
+
+def run(events: int, items: int) -> None:
+    tmp = tempfile.mkdtemp()
+    from app import config
+    config.DATABASE_URL = f"sqlite:///{os.path.join(tmp, 'digest.db')}"
+    config.DATABASE_ASYNC_URL = ""
+    config.DATABASE_READ_URL = ""
+    config.EMAIL_TO_DEFAULT = ["ops@example.com"]
+    config.NOTIFY_STOCK_CHANGES = "digest"
+    config.NOTIFY_LOW_STOCK = "immediate"
+    config.NOTIFY_DIGEST_SECONDS = 3600
+
+    from sqlalchemy import select, update
+
+    from app import models
+    from app.database import Base, SessionLocal, engine
+    from app.utils import digest, email, outbox
+
+    Base.metadata.create_all(bind=engine)
+    qty = {n: 100 for n in range(items)}
+    with SessionLocal() as db:
+        t0 = time.perf_counter()
+        for i in range(events):
+            n = i % items
+            # the last item goes -1 then +1 alternately: it nets to zero when events / items is even
+            change = (-1 if i // items % 2 == 0 else 1) if n == items - 1 else -1 - i % 3
+            email.send_stock_change(code=f"MIS-{n:05d}", name=f"Item {n}", old_qty=qty[n],
+                                    new_qty=qty[n] + change, note=f"count {i}", db=db)
+            qty[n] += change
+        email.send_batch_stock_change(items=[{"code": "MIS-00000", "name": "Item 0",
+                                              "old_qty": qty[0], "new_qty": qty[0] + 5}], db=db)
+        qty[0] += 5
+        events += 1
+        db.commit()
+        elapsed = time.perf_counter() - t0
+        print(f"folded {events} events in {elapsed * 1000:.0f} ms ({elapsed / events * 1000:.2f} ms each)")
+
+        _expect("nothing queued while the window is open", outbox.stats(db)["pending"], 0)
+        _expect("flush before the window closes", email.flush_digests(db), 0)
+        email.send_category_low_stock("CAT-1", "Cat", 3, 10, db=db)  # immediate: its own email
+        db.commit()
+        _expect("low stock stays immediate", outbox.stats(db)["pending"], 1)
+
+        # let the window run out
+        D = models.EmailDigestEntry
+        db.execute(update(D).values(window_ends_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+        db.commit()
+        _expect("digest emails queued", email.flush_digests(db), 1)
+        _expect("flush again", email.flush_digests(db), 0)
+
+        O = models.EmailOutbox
+        body = db.execute(select(O.html_body).where(O.kind == "stock_digest")).scalar_one()
+        netted = (events - 1) // items % 2 == 0
+        changed = items - 1 if netted else items
+        _expect("lines in the digest", body.count("<tr><td"), changed)
+        _expect("net quantity of MIS-00000", f"100 → <b>{qty[0]}</b>" in body, True)
+
+        s = digest.stats(db)
+        _expect("pending lines", s["pending_lines"], 0)
+        _expect("digest_events", s["digest_events"], events)
+        _expect("digest_merged", s["digest_merged"], events - items)
+        _expect("digest_dropped", s["digest_dropped"], 0 if not netted else events // items)
+        _expect("digest_emails", s["digest_emails"], 1)
+    print(f"     {events} stock changes -> 1 email instead of {events}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--events", type=int, default=2000)
+    ap.add_argument("--items", type=int, default=500)
+    args = ap.parse_args()
+    run(args.events, args.items)
+
+
+if __name__ == "__main__":
+    main()
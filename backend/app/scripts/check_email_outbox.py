@@ -0,0 +1,166 @@
+# app/scripts/check_email_outbox.py
+"""
+Exercise the email outbox and worker against a local aiosmtpd stand-in
+(pip install aiosmtpd), on a temporary SQLite database.
+
+    python -m app.scripts.check_email_outbox --messages 500
+
+Checks, in order: queued messages are all delivered over a handful of SMTP
+sessions, not one per message; a 451 answer is retried after backoff; a
+message whose only recipient is refused with 550 is parked as dead; while
+the relay is down nothing is lost and the worker does not retry per
+message; everything goes out once it is back. Also times the same batch
+with a fresh connection per message, which is how it was sent before the
+outbox. Exits non-zero on the first surprise.
+"""
+import argparse
+import os
+import socket
+import tempfile
+import time
+
+BOUNCE = "bounce@example.com"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _Relay:
+    """aiosmtpd handler: records deliveries and SMTP sessions, fails on demand."""
+
+    def __init__(self):
+        self.messages = 0
+        self.sessions: set = set()
+        self.tempfail = 0  # answer the next N DATA commands with 451
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == BOUNCE:
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(session.peer)
+        if self.tempfail:
+            self.tempfail -= 1
+            return "451 4.3.0 Try again later"
+        self.messages += 1
+        return "250 Message accepted for delivery"
+
+
+def _expect(what: str, got, want) -> None:
+    print(f"{'ok  ' if got == want else 'FAIL'} {what}: {got}")
+    if got != want:
+        raise SystemExit(1)
+
+
+def _drain(email_worker) -> dict:
+    """Run the worker until nothing is pending (retries come due after the short test backoff)."""
+    from app.database import SessionLocal
+    from app.utils import outbox
+
+    totals = {"sent": 0, "retry": 0, "dead": 0}
+    for _ in range(20):
+        for k, v in email_worker.run(once=True).items():
+            if k in totals:
+                totals[k] += v
+        with SessionLocal() as db:
+            if not outbox.stats(db)["pending"]:
+                return totals
+        time.sleep(0.25)
+    return totals
+
+
+def run(messages: int) -> None:
+    from aiosmtpd.controller import Controller
+
+    port = _free_port()
+    tmp = tempfile.mkdtemp()
+    from app import config
+    config.DATABASE_URL = f"sqlite:///{os.path.join(tmp, 'outbox.db')}"
+    config.DATABASE_ASYNC_URL = ""
+    config.DATABASE_READ_URL = ""
+    config.SMTP_HOST, config.SMTP_PORT = "127.0.0.1", port
+    config.SMTP_STARTTLS, config.SMTP_USER = False, ""
+    config.EMAIL_TO_DEFAULT = ["ops@example.com"]
+    config.EMAIL_OUTBOX_BACKOFF_SECONDS = 0.2
+    config.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = 0.2
+
+    from app.database import Base, SessionLocal, engine
+    from app.scripts import email_worker
+    from app.utils import email, outbox
+
+    Base.metadata.create_all(bind=engine)
+    relay = _Relay()
+    controller = Controller(relay, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            for n in range(messages):
+                email.send_stock_change(code=f"MIS-{n:05d}", name=f"Item {n}", old_qty=10, new_qty=9, db=db,
+                                        immediate=True)
+            queued = time.perf_counter() - t0
+            outbox.enqueue(db, "check", "Refused everywhere", "<p>x</p>", [BOUNCE])
+            db.commit()
+        print(f"queued {messages} messages in {queued * 1000:.0f} ms ({queued / messages * 1000:.2f} ms each)")
+
+        relay.tempfail = 3
+        t0 = time.perf_counter()
+        totals = _drain(email_worker)
+        elapsed = time.perf_counter() - t0
+        _expect("retried after 451", totals["retry"], 3)
+        _expect("parked as dead after 550", totals["dead"], 1)
+        _expect("delivered", relay.messages, messages)
+        print(f"     over {len(relay.sessions)} SMTP sessions in {elapsed:.2f}s")
+        _expect("SMTP sessions at most messages / SMTP_MAX_MESSAGES_PER_CONNECTION + 2",
+                len(relay.sessions) <= messages // config.SMTP_MAX_MESSAGES_PER_CONNECTION + 2, True)
+        with SessionLocal() as db:
+            _expect("outbox", {k: v for k, v in outbox.stats(db).items() if k != "oldest_unsent_age_seconds"},
+                    {"pending": 0, "sending": 0, "sent": messages, "dead": 1})
+
+        # relay down: nothing sent, nothing lost, one connection attempt for the whole batch
+        controller.stop()
+        with SessionLocal() as db:
+            for n in range(5):
+                email.send_low_stock(code=f"LOW-{n}", name="Low", qty=1, buffer=5, db=db, immediate=True)
+            db.commit()
+        totals = email_worker.run(once=True)
+        _expect("relay down: rescheduled", (totals["sent"], totals["retry"]), (0, 5))
+        controller = Controller(relay, hostname="127.0.0.1", port=port)
+        controller.start()
+        _drain(email_worker)
+        _expect("relay back: delivered", relay.messages, messages + 5)
+
+        # the pre-outbox way: connect (+ STARTTLS + login on a real relay) for every message
+        conn = email.SMTPConnection(max_messages=1)
+        msg = email.build_message("Timing", "<p>x</p>", ["ops@example.com"])
+        t0 = time.perf_counter()
+        for _ in range(messages):
+            conn.send(msg, ["ops@example.com"])
+        per_message = time.perf_counter() - t0
+        conn.close()
+        pooled = email.SMTPConnection()
+        t0 = time.perf_counter()
+        for _ in range(messages):
+            pooled.send(msg, ["ops@example.com"])
+        reused = time.perf_counter() - t0
+        pooled.close()
+        print(f"send {messages}: new connection each {per_message:.2f}s ({conn.connects} sessions), "
+              f"reused {reused:.2f}s ({pooled.connects} sessions), plain TCP to localhost, no TLS")
+    finally:
+        controller.stop()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=300)
+    args = ap.parse_args()
+    run(args.messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# app/scripts/check_read_replica.py
+"""
+Walk through the read-replica routing (app.utils.read_routing) locally, with
+two SQLite files standing in for a primary and its replica. "Replication" is
+an explicit copy (sqlite3 backup), so the replica is stale until we say so.
+
+    python -m app.scripts.check_read_replica
+
+Checks, in order: a writer reads its own write (sticky, primary) while
+another client still gets the replica's stale answer; both see it after
+replication; the writer goes back to the replica once READ_STICKY_SECONDS
+pass; an unreachable replica falls back to the primary and is retried after
+READ_REPLICA_RETRY_SECONDS. Exits non-zero on the first surprise.
+"""
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+
+STICKY = 1.0
+RETRY = 1.0
+
+
+def _replicate(primary: str, replica: str) -> None:
+    with sqlite3.connect(primary) as src, sqlite3.connect(replica) as dst:
+        src.backup(dst)
+
+
+def _expect(what: str, got, want) -> None:
+    print(f"{'ok  ' if got == want else 'FAIL'} {what}: {got}")
+    if got != want:
+        raise SystemExit(1)
+
+
+async def _walk(app, primary: str, replica: str, tokens: dict) -> None:
+    import httpx
+
+    from app.database import async_read_engine, read_engine
+    from app.utils.read_routing import read_router
+
+    transport = httpx.ASGITransport(app=app)
+    writer = httpx.AsyncClient(transport=transport, base_url="http://check",
+                               headers={"Authorization": f"Bearer {tokens['writer']}"})
+    reader = httpx.AsyncClient(transport=transport, base_url="http://check",
+                               headers={"Authorization": f"Bearer {tokens['reader']}"})
+    async with writer, reader:
+        r = await writer.post("/categories/", json={"name": "Replica check", "code": "RC", "buffer": 0})
+        path = f"/categories/{r.json()['id']}"
+
+        _expect("writer reads its own write (primary)", (await writer.get(path)).status_code, 200)
+        _expect("reader before replication (stale replica)", (await reader.get(path)).status_code, 404)
+
+        _replicate(primary, replica)
+        _expect("reader after replication", (await reader.get(path)).status_code, 200)
+
+        await asyncio.sleep(STICKY + 0.1)
+        before = read_router.stats()["replica_reads"]
+        await writer.get(path)
+        _expect("writer back on the replica after the sticky window",
+                read_router.stats()["replica_reads"] - before, 1)
+
+        # take the replica away: close pooled connections, put something unopenable in its place
+        read_engine.dispose()
+        await async_read_engine.dispose()
+        os.replace(replica, replica + ".off")
+        os.mkdir(replica)
+        _expect("replica down: sync read served by the primary", (await reader.get(path)).status_code, 200)
+        await asyncio.sleep(RETRY + 0.1)
+        _expect("replica down: async read served by the primary", (await reader.get("/categories/")).status_code, 200)
+        _expect("replica failures (one per retry window)", read_router.stats()["replica_failures"], 2)
+
+        os.rmdir(replica)
+        os.replace(replica + ".off", replica)
+        await asyncio.sleep(RETRY + 0.1)
+        before = read_router.stats()["replica_reads"]
+        _expect("replica retried after the retry window", (await reader.get(path)).status_code, 200)
+        _expect("  ...and used", read_router.stats()["replica_reads"] - before, 1)
+
+    print(read_router.stats())
+    from app.database import async_engine
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
+
+def main() -> None:
+    tmp = tempfile.mkdtemp()
+    primary, replica = os.path.join(tmp, "primary.db"), os.path.join(tmp, "replica.db")
+    try:
+        # the app binds its engines at import, so configure first
+        from app import config
+        config.DATABASE_URL = f"sqlite:///{primary}"
+        config.DATABASE_ASYNC_URL = ""
+        config.DATABASE_READ_URL = f"sqlite:///{replica}"
+        config.DATABASE_READ_ASYNC_URL = ""
+        config.READ_STICKY_SECONDS = STICKY
+        config.READ_REPLICA_RETRY_SECONDS = RETRY
+
+        from app.database import SessionLocal
+        from app import models
+        from app.security import create_access_token
+
+        from app.main import app  # creates the schema on the primary
+
+        with SessionLocal() as db:
+            for name in ("writer", "reader"):
+                db.add(models.User(username=name, password_hash="-", name=name))
+            db.commit()
+        _replicate(primary, replica)  # the replica starts as a copy of the primary
+
+        tokens = {name: create_access_token(sub=name) for name in ("writer", "reader")}
+        asyncio.run(_walk(app, primary, replica, tokens))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
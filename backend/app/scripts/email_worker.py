@@ -0,0 +1,149 @@
+# app/scripts/email_worker.py
+"""
+Email worker: delivers the email outbox (app.utils.outbox) over one reused
+SMTP connection.
+
+    python -m app.scripts.email_worker            # run until SIGINT/SIGTERM
+    python -m app.scripts.email_worker --once     # deliver what is due, exit when nothing is
+
+Run it next to the API; several can run at once (claims use SKIP LOCKED).
+Each round claims up to EMAIL_OUTBOX_BATCH due rows and sends them over the
+same SMTP session (reconnecting every SMTP_MAX_MESSAGES_PER_CONNECTION
+messages). A permanent (5xx) refusal parks the message as dead. Any other
+failure schedules a retry with backoff, and if the relay itself is unreachable
+the rest of the batch is rescheduled too, instead of each message trying to
+connect in turn. The session is closed whenever the queue runs empty.
+
+Each round first turns notification digests whose window has closed
+(app.utils.digest) into outbox rows, so the worker is also what sends them.
+Every LOW_STOCK_EVAL_SECONDS it also re-evaluates the low-stock state of all
+categories (app.utils.low_stock), which queues alerts for changes made
+outside the API.
+"""
+import argparse
+import logging
+import signal
+import smtplib
+import threading
+import time
+
+from app import config
+from app.database import SessionLocal
+from app.utils import email, low_stock, outbox
+
+log = logging.getLogger("email_worker")
+
+# how often sent rows older than EMAIL_OUTBOX_KEEP_DAYS are deleted
+PRUNE_EVERY_SECONDS = 3600
+
+
+def _permanent(e: Exception) -> bool:
+    """True when retrying the same message cannot help (the server refused it for good)."""
+    if isinstance(e, (smtplib.SMTPAuthenticationError, smtplib.SMTPConnectError, smtplib.SMTPHeloError)):
+        return False  # the relay or our credentials, not the message: retry once they are fixed
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code >= 500
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in e.recipients.values())
+    return False
+
+
+def _connection_lost(e: Exception) -> bool:
+    """True when the relay, not this message, failed (the session is unusable)."""
+    if isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                      smtplib.SMTPHeloError, smtplib.SMTPAuthenticationError)):
+        return True
+    # SMTPException derives from OSError: anything else SMTP-level was an answer about this message
+    return not isinstance(e, smtplib.SMTPException)
+
+
+def deliver_batch(conn: email.SMTPConnection, rows: list) -> dict:
+    """Send claimed rows; every row ends up sent, rescheduled or dead. Returns counters."""
+    counts = {"sent": 0, "retry": 0, "dead": 0}
+    with SessionLocal() as db:
+        for n, row in enumerate(rows):
+            rcpts = [r.strip() for r in row.recipients.split(",") if r.strip()]
+            try:
+                conn.send(email.build_message(row.subject, row.html_body, rcpts), rcpts)
+            except (smtplib.SMTPException, OSError) as e:
+                error = f"{type(e).__name__}: {e}"
+                dead = outbox.mark_failed(db, row.id, row.attempts, error, permanent=_permanent(e))
+                counts["dead" if dead else "retry"] += 1
+                log.warning("outbox #%s (%s) attempt %s failed%s: %s",
+                            row.id, row.kind, row.attempts, ", parked as dead" if dead else "", error)
+                if _connection_lost(e):
+                    conn.close()
+                    # the relay is gone: reschedule the rest of the batch with the same error
+                    for rest in rows[n + 1:]:
+                        dead = outbox.mark_failed(db, rest.id, rest.attempts, error)
+                        counts["dead" if dead else "retry"] += 1
+                    break
+            else:
+                outbox.mark_sent(db, row.id)
+                counts["sent"] += 1
+    return counts
+
+
+def run(once: bool = False, batch: int | None = None, poll: float | None = None) -> dict:
+    batch = batch or config.EMAIL_OUTBOX_BATCH
+    poll = config.EMAIL_OUTBOX_POLL_SECONDS if poll is None else poll
+    stop = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())  # finish the current message, then exit
+
+    conn = email.SMTPConnection()
+    totals = {"sent": 0, "retry": 0, "dead": 0, "batches": 0}
+    pruned_at = evaluated_at = 0.0
+    try:
+        while not stop.is_set():
+            if config.LOW_STOCK_EVAL_SECONDS and time.monotonic() - evaluated_at > config.LOW_STOCK_EVAL_SECONDS:
+                with SessionLocal() as db:
+                    changes = low_stock.evaluate(db)["changes"]
+                for c in changes:
+                    log.info("category %s: %s -> %s", c["code"] or c["category_id"], c["from_state"], c["to_state"])
+                evaluated_at = time.monotonic()
+
+            if time.monotonic() - pruned_at > PRUNE_EVERY_SECONDS:
+                with SessionLocal() as db:
+                    n = outbox.prune(db, config.EMAIL_OUTBOX_KEEP_DAYS)
+                if n:
+                    log.info("pruned %s sent outbox rows", n)
+                pruned_at = time.monotonic()
+
+            with SessionLocal() as db:
+                digests = email.flush_digests(db)  # closed digest windows become outbox rows
+                rows = outbox.claim(db, batch, config.EMAIL_OUTBOX_LEASE_SECONDS)
+            if not rows:
+                conn.close()  # idle: do not hold the relay's session open
+                if once:
+                    break
+                stop.wait(poll)
+                continue
+
+            counts = deliver_batch(conn, rows)
+            totals["batches"] += 1
+            for k, v in counts.items():
+                totals[k] += v
+            log.info("batch of %s: %s", len(rows), counts)
+            if digests:
+                log.info("queued %s digest email(s)", digests)
+    finally:
+        conn.close()
+    totals["smtp_connections"] = conn.connects
+    return totals
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--once", action="store_true", help="exit once nothing is due")
+    ap.add_argument("--batch", type=int, default=None, help="rows per claim (EMAIL_OUTBOX_BATCH)")
+    ap.add_argument("--poll", type=float, default=None, help="seconds between polls (EMAIL_OUTBOX_POLL_SECONDS)")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    totals = run(once=args.once, batch=args.batch, poll=args.poll)
+    log.info("stopped: %s", totals)
+
+
+if __name__ == "__main__":
+    main()
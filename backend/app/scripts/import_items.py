@@ -0,0 +1,33 @@
+# app/scripts/import_items.py
+import argparse
+import json
+
+from app.database import SessionLocal
+from app.utils import importer
+
+
+def run(path: str, fmt: str | None = None, chunk_size: int = 1000) -> dict:
+    if not fmt:
+        fmt = "ndjson" if path.lower().endswith((".ndjson", ".jsonl")) else "csv"
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as fh:
+            report = importer.import_items(db, importer.iter_rows(fh, fmt), chunk_size=chunk_size)
+    finally:
+        db.close()
+    return report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bulk-import items from a CSV (code,name,quantity,category_id) or NDJSON file.")
+    ap.add_argument("path")
+    ap.add_argument("--format", choices=importer.FORMATS, default=None)
+    ap.add_argument("--chunk-size", type=int, default=1000)
+    args = ap.parse_args()
+
+    report = run(args.path, args.format, args.chunk_size)
+    print(f"[import] received={report['received']} inserted={report['inserted']} failed={report['failed']}")
+    for err in report["errors"]:
+        print(json.dumps(err))
+    if report["errors_truncated"]:
+        print("[import] (more errors not shown)")
@@ -0,0 +1,177 @@
+# app/scripts/load_async.py
+"""
+Load test: the async read endpoints (database.get_async_read_db) against sync
+twins of the same handlers on database.get_read_db, at high concurrency.
+
+The sync twins are mounted under /_sync for the run only; both sides execute
+the same statements, so the difference is the threadpool hop (and its cap of
+--threads tokens) versus awaiting the driver on the event loop.
+
+    python -m app.scripts.load_async --concurrency 200 --seconds 20
+    python -m app.scripts.load_async --url postgresql+psycopg2://...   # scratch DB only
+
+Defaults to a temporary SQLite file so it never touches the real DB. SQLite
+has no network round-trip to overlap, so run it against PostgreSQL for
+numbers that mean something. Past ~threads + pool size concurrent requests
+the sync path can stall: threads blocked waiting for a pooled connection
+hold the threadpool tokens that requests owning a connection need to finish,
+until pool_timeout (30 s) fails the waiters; those show up as errors, and
+requests still unanswered POOL_GRACE seconds after the run as "stalled".
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# how long past the deadline in-flight requests may take (> the default pool_timeout of 30 s)
+POOL_GRACE = 35
+
+
+def _summary(samples: list[float], errors: int, stalled: int, elapsed: float) -> str:
+    if not samples:
+        return f"{0:>8} {'-':>8} {'-':>8} {errors:>7} {stalled:>8}"
+    samples = sorted(samples)
+    p99 = samples[max(int(len(samples) * 0.99) - 1, 0)]
+    return (f"{len(samples) / elapsed:>8.0f} {statistics.median(samples):>8.1f} {p99:>8.1f} "
+            f"{errors:>7} {stalled:>8}")
+
+
+def _sync_twins(app):
+    """Sync versions of the ported endpoints, on get_read_db, under /_sync."""
+    from fastapi import APIRouter, Depends
+    from sqlalchemy import select
+    from sqlalchemy.orm import Session
+
+    from app import crud, models, schemas
+    from app.database import get_read_db
+    from app.deps import get_current_profile
+    from app.utils.catalog import conditional_get
+
+    router = APIRouter(prefix="/_sync")
+
+    @router.get("/items/", response_model=list[schemas.ItemResponse], dependencies=[Depends(conditional_get)])
+    def list_items(limit: int = 50, db: Session = Depends(get_read_db)):
+        return crud.list_items(db, limit=limit)
+
+    @router.get("/items/{item_id}", response_model=schemas.ItemResponse, dependencies=[Depends(conditional_get)])
+    def get_item(item_id: int, db: Session = Depends(get_read_db)):
+        return crud.get_item(db, item_id)
+
+    @router.get("/categories/", response_model=list[schemas.CategoryResponse], dependencies=[Depends(conditional_get)])
+    def list_categories(db: Session = Depends(get_read_db)):
+        return db.execute(select(models.Category).order_by(models.Category.name)).scalars().all()
+
+    @router.get("/auth/me", response_model=schemas.UserResponse)
+    def me(current=Depends(get_current_profile)):
+        return current
+
+    app.include_router(router)
+
+
+async def _drive(app, prefix: str, paths: list[str], headers: dict, seconds: float, concurrency: int):
+    """
+    `concurrency` clients loop over `paths` for `seconds`. Returns (latencies
+    in ms, non-200 answers, requests still unanswered POOL_GRACE seconds after
+    the deadline, elapsed seconds).
+    """
+    import httpx
+
+    samples: list[float] = []
+    errors = 0
+    # a failing request (e.g. QueuePool timeout) becomes a 500 instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load", headers=headers, timeout=None) as c:
+        t0 = time.perf_counter()
+        deadline = t0 + seconds
+
+        async def worker(w: int) -> None:
+            nonlocal errors
+            n = w
+            while time.perf_counter() < deadline:
+                t = time.perf_counter()
+                r = await c.get(prefix + paths[n % len(paths)])
+                samples.append((time.perf_counter() - t) * 1000)
+                errors += r.status_code != 200
+                n += concurrency
+
+        tasks = [asyncio.create_task(worker(w)) for w in range(concurrency)]
+        _, pending = await asyncio.wait(tasks, timeout=seconds + POOL_GRACE)
+        for t in pending:
+            t.cancel()
+        elapsed = min(time.perf_counter() - t0, seconds + POOL_GRACE)
+        return samples, errors, len(pending), elapsed
+
+
+async def _compare(app, headers: dict, seconds: float, concurrency: int, threads: int, item_ids: list[int]) -> None:
+    import anyio.to_thread
+
+    # the threadpool the sync endpoints (and sync dependencies) run in
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+
+    paths = ["/items/?limit=50", "/categories/", "/auth/me"] + [f"/items/{i}" for i in item_ids]
+    print(f"{concurrency} concurrent clients for {seconds:.0f}s per path, {threads} threadpool tokens, "
+          f"mix of {len(paths)} paths")
+    for prefix in ("", "/_sync"):
+        await _drive(app, prefix, paths, headers, 2, 10)  # warm-up
+    print(f"{'path':<8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'stalled':>8}")
+    # async first: a stalled sync run leaves threads behind that would skew whatever runs next
+    for label, prefix in (("async", ""), ("sync", "/_sync")):
+        samples, errors, stalled, elapsed = await _drive(app, prefix, paths, headers, seconds, concurrency)
+        print(f"{label:<8} {_summary(samples, errors, stalled, elapsed)}", flush=True)
+
+    from app.database import async_engine
+    await async_engine.dispose()  # ASGITransport sends no lifespan events
+
+
+def run(url: str, seconds: float, concurrency: int, threads: int, items: int) -> None:
+    # the app binds its engines at import, so point them at the scratch DB first
+    from app import config
+    config.DATABASE_URL = url
+    config.DATABASE_ASYNC_URL = ""
+    config.DATABASE_READ_URL = ""
+    from sqlalchemy import insert
+
+    from app import models
+    from app.database import SessionLocal
+    from app.main import app
+    from app.security import create_access_token, hash_password
+
+    with SessionLocal() as db:
+        user = models.User(username="loadtest", password_hash=hash_password("loadtest"), name="Load test")
+        db.add(user)
+        cats = [models.Category(name=f"Load {n}", code=f"L{n:02d}", buffer=0) for n in range(20)]
+        db.add_all(cats)
+        db.commit()
+        db.execute(insert(models.Item), [
+            {"code": f"LOAD{n:09d}", "name": f"Load item {n}", "quantity": n % 97, "category_id": cats[n % 20].id}
+            for n in range(items)
+        ])
+        db.commit()
+        token = create_access_token(sub=user.username, user_id=user.id, is_admin=False)
+
+    headers = {"Authorization": f"Bearer {token}"}
+    _sync_twins(app)
+    asyncio.run(_compare(app, headers, seconds, concurrency, threads, list(range(1, min(items, 50) + 1))))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="SQLAlchemy URL (sync driver) of a scratch database")
+    ap.add_argument("--seconds", type=float, default=20, help="duration of each measured run")
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--threads", type=int, default=40, help="anyio threadpool size (40 is the default)")
+    ap.add_argument("--items", type=int, default=5000)
+    args = ap.parse_args()
+
+    opts = dict(seconds=args.seconds, concurrency=args.concurrency, threads=args.threads, items=args.items)
+    if args.url:
+        run(args.url, **opts)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        run(f"sqlite:///{os.path.join(tmp, 'load.db')}", **opts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+# app/scripts/migrate_search.py
+from app.database import engine, Base
+from app import models  # noqa: F401  (register tables)
+from app.utils.search import ensure_search_indexes, search_backend
+
+
+def run() -> None:
+    Base.metadata.create_all(bind=engine)
+    ensure_search_indexes(engine)
+    backend = search_backend(engine)
+    if backend == "pg_trgm":
+        print("[search] pg_trgm GIN indexes on items(lower(code)), items(lower(name)) are in place")
+    elif backend == "fts5":
+        print("[search] items_fts (FTS5 trigram) shadow table and sync triggers are in place")
+    else:
+        print(f"[search] no search index for dialect '{engine.dialect.name}'; q falls back to LIKE")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,32 @@
+# app/scripts/reconcile_category_totals.py
+import argparse
+
+from app.database import SessionLocal
+from app import crud
+
+
+def run(apply: bool = True) -> int:
+    db = SessionLocal()
+    try:
+        drift = crud.reconcile_category_totals(db, apply=apply)
+    finally:
+        db.close()
+
+    if not drift:
+        print("[reconcile] category totals are consistent")
+        return 0
+    for d in drift:
+        print(
+            f"[reconcile] category {d['category_id']} ({d['code']}): "
+            f"total {d['stored_total']} -> {d['actual_total']}, "
+            f"items {d['stored_count']} -> {d['actual_count']}"
+        )
+    print(f"[reconcile] {len(drift)} categories drifted" + ("" if apply else " (dry run, nothing written)"))
+    return len(drift)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Recompute Category.total_quantity/item_count from items and report drift.")
+    ap.add_argument("--dry-run", action="store_true", help="only report, do not write corrected totals")
+    args = ap.parse_args()
+    run(apply=not args.dry_run)
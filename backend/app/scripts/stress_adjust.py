@@ -0,0 +1,99 @@
+# app/scripts/stress_adjust.py
+"""
+Concurrency stress check for crud.adjust_item_quantity.
+
+Fires N adjusts from a thread pool at a single item and then asserts that
+    final quantity == starting quantity + SUM(transactions.qty_change)
+and that the category's maintained total moved by the same amount, i.e.
+no update was lost.
+
+    python -m app.scripts.stress_adjust --adjusts 5000 --workers 32
+    python -m app.scripts.stress_adjust --url postgresql+psycopg2://...
+
+Defaults to a throwaway SQLite file. Exits non-zero on a mismatch.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import crud, models
+
+
+def run(url: str, adjusts: int, workers: int) -> bool:
+    connect_args = {"timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, pool_size=workers, max_overflow=0, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        cat = models.Category(name=f"Stress {time.time_ns()}", code="STR", buffer=0)
+        db.add(cat)
+        db.flush()
+        item = models.Item(code=f"STRESS{time.time_ns()}", name="Stress item", quantity=1000, category_id=cat.id)
+        db.add(item)
+        db.flush()
+        cat.total_quantity, cat.item_count = item.quantity, 1
+        db.commit()
+        item_id, cat_id, start_qty = item.id, cat.id, item.quantity
+
+    deltas = [random.choice((-3, -2, -1, 1, 2, 3)) for _ in range(adjusts)]
+
+    def one(delta: int) -> None:
+        for attempt in range(20):
+            with Session() as db:
+                try:
+                    crud.adjust_item_quantity(db, item_id, delta, note="stress", allow_negative=True)
+                    return
+                except OperationalError:
+                    # SQLite only: writer lock timeout, nothing was applied
+                    time.sleep(0.01 * (attempt + 1))
+        raise RuntimeError("adjust kept failing")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, deltas))
+    elapsed = time.perf_counter() - t0
+
+    with Session() as db:
+        final = db.execute(select(models.Item.quantity).where(models.Item.id == item_id)).scalar_one()
+        ledger = db.execute(
+            select(func.coalesce(func.sum(models.Transaction.qty_change), 0), func.count(models.Transaction.id))
+            .where(models.Transaction.item_id == item_id)
+        ).one()
+        cat_total = db.execute(select(models.Category.total_quantity).where(models.Category.id == cat_id)).scalar_one()
+
+    ok = final == start_qty + ledger[0] == start_qty + sum(deltas) == cat_total and ledger[1] == adjusts
+    print(f"{adjusts} adjusts / {workers} workers in {elapsed:.2f}s ({adjusts / elapsed:.0f}/s)")
+    print(f"start={start_qty} final={final} ledger_sum={ledger[0]} ledger_rows={ledger[1]} "
+          f"expected={start_qty + sum(deltas)} category_total={cat_total}")
+    print("OK" if ok else "MISMATCH: lost or duplicated updates")
+    engine.dispose()
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="SQLAlchemy URL of a scratch database")
+    ap.add_argument("--adjusts", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=16)
+    args = ap.parse_args()
+
+    if args.url:
+        ok = run(args.url, args.adjusts, args.workers)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            ok = run(f"sqlite:///{os.path.join(tmp, 'stress.db')}", args.adjusts, args.workers)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
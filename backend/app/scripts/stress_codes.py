@@ -0,0 +1,116 @@
+# app/scripts/stress_codes.py
+"""
+Concurrency check for the item code allocator.
+
+Phase 1 creates N items in parallel in one category. Phase 2 deletes half of
+them in parallel with N more creates, so gap filling races the free-list.
+Every create goes through allocate_item_code + crud.create_item, the same
+path as POST /items/. The check fails if any create hits the UNIQUE(code)
+constraint or if two items end up with the same code.
+
+    python -m app.scripts.stress_codes --creates 1000 --workers 16
+    python -m app.scripts.stress_codes --url postgresql+psycopg2://...
+
+Defaults to a throwaway SQLite file. Exits non-zero on failure.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import crud, models, schemas
+from app.utils.codes import allocate_item_code
+
+
+def run(url: str, creates: int, workers: int) -> bool:
+    connect_args = {"timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, pool_size=workers, max_overflow=0, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        cat = models.Category(name=f"Codes {time.time_ns()}", code="Q" + os.urandom(2).hex().upper(), buffer=0)
+        db.add(cat)
+        db.commit()
+        cat_id = cat.id
+
+    collisions = 0
+
+    def create(i: int) -> None:
+        nonlocal collisions
+        for attempt in range(50):
+            with Session() as db:
+                try:
+                    code = allocate_item_code(db, cat_id, fill_gaps=True)
+                    crud.create_item(db, schemas.ItemCreate(code=code, name=f"Stress {i}", quantity=1, category_id=cat_id))
+                    return
+                except IntegrityError:
+                    collisions += 1
+                    return
+                except OperationalError:
+                    # SQLite only: writer lock timeout, nothing was applied
+                    time.sleep(0.01 * (attempt + 1))
+        raise RuntimeError("create kept failing")
+
+    def remove(item_id: int) -> None:
+        for attempt in range(50):
+            with Session() as db:
+                try:
+                    crud.delete_item(db, item_id)
+                    return
+                except OperationalError:
+                    time.sleep(0.01 * (attempt + 1))
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(create, range(creates)))
+    with Session() as db:
+        ids = db.execute(select(models.Item.id).where(models.Item.category_id == cat_id)).scalars().all()
+    doomed = random.sample(ids, len(ids) // 2)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(remove, i) for i in doomed]
+        futures += [pool.submit(create, creates + i) for i in range(creates)]
+        for f in futures:
+            f.result()
+    elapsed = time.perf_counter() - t0
+
+    with Session() as db:
+        total, distinct = db.execute(
+            select(func.count(models.Item.id), func.count(func.distinct(models.Item.code)))
+            .where(models.Item.category_id == cat_id)
+        ).one()
+
+    expected = 2 * creates - len(doomed)
+    ok = collisions == 0 and total == distinct == expected
+    print(f"{2 * creates} creates + {len(doomed)} deletes / {workers} workers in {elapsed:.2f}s")
+    print(f"items={total} distinct_codes={distinct} expected={expected} unique_violations={collisions}")
+    print("OK" if ok else "FAILED: duplicate codes allocated")
+    engine.dispose()
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="SQLAlchemy URL of a scratch database")
+    ap.add_argument("--creates", type=int, default=500)
+    ap.add_argument("--workers", type=int, default=16)
+    args = ap.parse_args()
+
+    if args.url:
+        ok = run(args.url, args.creates, args.workers)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            ok = run(f"sqlite:///{os.path.join(tmp, 'codes.db')}", args.creates, args.workers)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# app/scripts/stress_edit.py
+"""
+Concurrency stress check for crud.update_item (PATCH /items/{id}) racing
+crud.adjust_item_quantity on the same items.
+
+Threads mix absolute quantity edits, category moves and relative adjusts
+over a few items in two categories, then assert that for every item
+    quantity == starting quantity + SUM(transactions.qty_change)
+and that each category's maintained total_quantity / item_count equal
+SUM(items.quantity) / COUNT(items), i.e. no delta was taken from a stale read.
+
+    python -m app.scripts.stress_edit --ops 2000 --workers 16
+    python -m app.scripts.stress_edit --url postgresql+psycopg2://...
+
+Defaults to a throwaway SQLite file. Exits non-zero on a mismatch.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app import crud, models, schemas
+
+ITEMS = 4
+START_QTY = 1000
+
+
+def run(url: str, ops: int, workers: int) -> bool:
+    connect_args = {"timeout": 60} if url.startswith("sqlite") else {}
+    engine = create_engine(url, pool_size=workers, max_overflow=0, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    stamp = time.time_ns()
+    with Session() as db:
+        cats = [models.Category(name=f"Stress edit {stamp} {n}", code=f"SE{n}", buffer=0) for n in range(2)]
+        db.add_all(cats)
+        db.flush()
+        items = [
+            models.Item(code=f"STE{stamp}{n}", name=f"Stress item {n}", quantity=START_QTY, category_id=cats[0].id)
+            for n in range(ITEMS)
+        ]
+        db.add_all(items)
+        db.flush()
+        cats[0].total_quantity, cats[0].item_count = START_QTY * ITEMS, ITEMS
+        cats[1].total_quantity, cats[1].item_count = 0, 0
+        db.commit()
+        item_ids, cat_ids = [i.id for i in items], [c.id for c in cats]
+
+    def one(n: int) -> None:
+        rnd = random.Random(n)
+        item_id = rnd.choice(item_ids)
+        for attempt in range(50):
+            with Session() as db:
+                try:
+                    kind = n % 3
+                    if kind == 0:
+                        crud.adjust_item_quantity(db, item_id, rnd.choice((-3, -1, 2, 4)), note="stress",
+                                                  allow_negative=True)
+                    elif kind == 1:
+                        crud.update_item(db, item_id, schemas.ItemUpdate(quantity=rnd.randint(0, 2000)))
+                    else:
+                        crud.update_item(db, item_id, schemas.ItemUpdate(
+                            quantity=rnd.randint(0, 2000), category_id=rnd.choice(cat_ids)))
+                    return
+                except OperationalError:
+                    # SQLite only: writer lock timeout or stale read snapshot, nothing was applied
+                    db.rollback()
+                    time.sleep(0.01 * (attempt + 1))
+        raise RuntimeError("write kept failing")
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, range(ops)))
+    elapsed = time.perf_counter() - t0
+
+    ok = True
+    with Session() as db:
+        I, T, C = models.Item, models.Transaction, models.Category
+        for item_id, qty in db.execute(select(I.id, I.quantity).where(I.id.in_(item_ids))).all():
+            ledger = db.execute(select(func.coalesce(func.sum(T.qty_change), 0)).where(T.item_id == item_id)).scalar()
+            match = qty == START_QTY + ledger
+            ok &= match
+            print(f"item {item_id}: quantity={qty} start+ledger={START_QTY + ledger}{'' if match else '  MISMATCH'}")
+        actual = dict(
+            (cid, (total, count))
+            for cid, total, count in db.execute(
+                select(I.category_id, func.sum(I.quantity), func.count(I.id))
+                .where(I.id.in_(item_ids)).group_by(I.category_id)
+            ).all()
+        )
+        for cid, total, count in db.execute(
+            select(C.id, C.total_quantity, C.item_count).where(C.id.in_(cat_ids))
+        ).all():
+            want = actual.get(cid, (0, 0))
+            match = (total, count) == want
+            ok &= match
+            print(f"category {cid}: maintained={total}/{count} actual={want[0]}/{want[1]}"
+                  f"{'' if match else '  MISMATCH'}")
+
+    print(f"{ops} edits/moves/adjusts / {workers} workers in {elapsed:.2f}s ({ops / elapsed:.0f}/s)")
+    print("OK" if ok else "MISMATCH: deltas taken from a stale read")
+    engine.dispose()
+    return ok
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="SQLAlchemy URL of a scratch database")
+    ap.add_argument("--ops", type=int, default=1500)
+    ap.add_argument("--workers", type=int, default=16)
+    args = ap.parse_args()
+
+    if args.url:
+        ok = run(args.url, args.ops, args.workers)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            ok = run(f"sqlite:///{os.path.join(tmp, 'stress.db')}", args.ops, args.workers)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# app/scripts/take_snapshot.py
+"""
+Take a stock snapshot (for cron; GET /inventory/as-of rolls forward from the latest one).
+
+    python -m app.scripts.take_snapshot
+    python -m app.scripts.take_snapshot --if-older-than 24 --keep 90
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app import models
+from app.database import SessionLocal
+from app.utils import snapshots
+
+
+def run(if_older_than: float | None = None, keep: int | None = None) -> None:
+    db = SessionLocal()
+    try:
+        S = models.StockSnapshot
+        last = db.execute(select(S).order_by(S.taken_at.desc(), S.id.desc()).limit(1)).scalars().first()
+        due = True
+        if last is not None and if_older_than is not None:
+            taken = last.taken_at if last.taken_at.tzinfo else last.taken_at.replace(tzinfo=timezone.utc)
+            due = datetime.now(timezone.utc) - taken >= timedelta(hours=if_older_than)
+        if due:
+            snap = snapshots.take_snapshot(db)
+            print(f"[snapshot] #{snap.id} at {snap.taken_at}: {snap.item_count} items, ledger up to tx {snap.last_tx_id}")
+        else:
+            print(f"[snapshot] latest (#{last.id}, {last.taken_at}) is recent enough, nothing to do")
+        if keep is not None:
+            n = snapshots.prune_snapshots(db, keep)
+            if n:
+                print(f"[snapshot] pruned {n} old periodic snapshots")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--if-older-than", type=float, default=None, metavar="HOURS",
+                    help="only snapshot if the latest one is at least this old")
+    ap.add_argument("--keep", type=int, default=None, help="keep only the N newest periodic snapshots")
+    args = ap.parse_args()
+    run(if_older_than=args.if_older_than, keep=args.keep)
@@ -3,8 +3,10 @@ import os
 from datetime import datetime, timedelta, timezone
 from passlib.context import CryptContext
 import jwt
+from app import config
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# any stored hash whose cost differs from BCRYPT_ROUNDS "needs update" (see auth.login)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
@@ -16,10 +18,22 @@ def hash_password(plain: str) -> str:
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
-def create_access_token(sub: str) -> str:
+def verify_and_update_password(plain: str, hashed: str) -> tuple[bool, str | None]:
+    """(matches, new hash if the stored one should be replaced)."""
+    return pwd_context.verify_and_update(plain, hashed)
+
+def create_access_token(sub: str, *, user_id: int | None = None, is_admin: bool | None = None, version: int = 0) -> str:
+    """
+    "ver" is the user's token_version; "uid"/"adm" are only read when
+    AUTH_TRUST_TOKEN_CLAIMS is on (see deps.get_current_user).
+    """
     now = datetime.now(timezone.utc)
     exp = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    payload = {"sub": sub, "iat": int(now.timestamp()), "exp": int(exp.timestamp())}
+    payload = {"sub": sub, "ver": version, "iat": int(now.timestamp()), "exp": int(exp.timestamp())}
+    if user_id is not None:
+        payload["uid"] = user_id
+    if is_admin is not None:
+        payload["adm"] = bool(is_admin)
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
 def decode_token(token: str) -> dict:
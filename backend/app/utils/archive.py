@@ -0,0 +1,445 @@
+# app/utils/archive.py
+"""
+Ledger archival: moves old `transactions` rows out of the table into gzip
+NDJSON part files under config.LEDGER_ARCHIVE_DIR, one folder per month:
+
+    <dir>/2025-03/tx-0000120001-0000185000.ndjson.gz
+
+Each run (python -m app.scripts.archive_ledger) archives the id range
+(last archived id, B], where B is the newest ledger row older than the horizon
+(whole months, config.LEDGER_ARCHIVE_AFTER_MONTHS) that the daily rollups have
+already folded in. Order of work, so an interrupted run is simply re-run:
+
+1. write the part files (tmp + rename; names are fixed by the id range),
+2. in one commit: a "closing" stock snapshot at ledger position B (taken_at =
+   horizon) and the ledger_archives manifest rows,
+3. delete the rows in id chunks (a re-run first finishes any leftovers).
+
+Reads stay transparent: merge_page() folds archived rows into GET /transactions
+pages, iter_export() streams them ahead of the live rows in GET
+/transactions/export, and as_of_archived() answers /inventory/as-of for times before a closing
+snapshot by subtracting archived movement from it. Neither scans the archive:
+each part has its time and id bounds in the manifest and the items and users
+it holds in ledger_archive_keys, so only the parts that can hold matching rows
+are opened (and none when the query's range misses the archive).
+"""
+import gzip
+import heapq
+import json
+import os
+from datetime import datetime, timezone
+from typing import Iterator
+
+from sqlalchemy import delete, exists, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app import config, models, schemas
+from app.crud import _ts_param
+from app.utils import rollups
+
+PURGE_CHUNK = 10_000
+
+
+def _utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def horizon(months: int, now: datetime | None = None) -> datetime:
+    """Start of the month `months` months before the current one (UTC)."""
+    now = _utc(now or datetime.now(timezone.utc))
+    y, m = divmod(now.year * 12 + now.month - 1 - months, 12)
+    return datetime(y, m + 1, 1, tzinfo=timezone.utc)
+
+
+def _path(rel: str) -> str:
+    return os.path.join(config.LEDGER_ARCHIVE_DIR, rel)
+
+
+def archived_upto(db: Session) -> int:
+    """Highest archived ledger id (0 if none): live rows above it are not in the archive."""
+    return db.execute(select(func.coalesce(func.max(models.LedgerArchive.max_tx_id), 0))).scalar_one()
+
+
+def _purge(db: Session, upto: int) -> int:
+    """Delete ledger rows with id <= upto, PURGE_CHUNK ids per commit."""
+    T = models.Transaction
+    total = 0
+    lo = db.execute(select(func.min(T.id)).where(T.id <= upto)).scalar()
+    while lo is not None and lo <= upto:
+        hi = min(lo + PURGE_CHUNK - 1, upto)
+        total += db.execute(
+            delete(T).where(T.id >= lo, T.id <= hi).execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        lo = hi + 1
+    return total
+
+
+def _insert_keys(db: Session, keys: dict[int, tuple[set, set]]) -> None:
+    """ledger_archive_keys rows for {archive id: (item ids, user ids)}."""
+    rows = [
+        {"kind": kind, "key": key, "archive_id": aid}
+        for aid, (items, users) in keys.items()
+        for kind, ids in (("item", items), ("user", users))
+        for key in ids
+        if key is not None
+    ]
+    if rows:
+        db.execute(insert(models.LedgerArchiveKey), rows)
+
+
+def _write_parts(db: Session, lo: int, hi: int) -> tuple[list[dict], dict[str, tuple[set, set]]]:
+    """Write the part files; returns their manifest rows and {path: (item ids, user ids)}."""
+    T = models.Transaction
+    stmt = (
+        select(T.id, T.item_id, T.qty_change, T.note, T.performed_by, T.created_at)
+        .where(T.id > lo, T.id <= hi)
+        .order_by(T.id)
+        .execution_options(yield_per=5000)
+    )
+    parts: dict[str, dict] = {}
+    keys: dict[str, tuple[set, set]] = {}
+    files = {}
+    try:
+        for chunk in db.execute(stmt).partitions():
+            for r in chunk:
+                ts = _utc(r.created_at)
+                month = f"{ts:%Y-%m}"
+                meta = parts.get(month)
+                if meta is None:
+                    rel = f"{month}/tx-{lo + 1:010d}-{hi:010d}.ndjson.gz"
+                    os.makedirs(os.path.dirname(_path(rel)), exist_ok=True)
+                    files[month] = gzip.open(_path(rel) + ".tmp", "wt", encoding="utf-8")
+                    meta = parts[month] = {
+                        "month": month, "path": rel, "min_tx_id": r.id, "max_tx_id": r.id,
+                        "min_created_at": ts, "max_created_at": ts, "row_count": 0,
+                    }
+                    keys[rel] = (set(), set())
+                files[month].write(json.dumps({
+                    "id": r.id, "item_id": r.item_id, "qty_change": r.qty_change, "note": r.note,
+                    "performed_by": r.performed_by, "created_at": ts.isoformat(),
+                }, ensure_ascii=False) + "\n")
+                meta["max_tx_id"] = r.id
+                meta["min_created_at"] = min(meta["min_created_at"], ts)
+                meta["max_created_at"] = max(meta["max_created_at"], ts)
+                meta["row_count"] += 1
+                keys[meta["path"]][0].add(r.item_id)
+                keys[meta["path"]][1].add(r.performed_by)
+    finally:
+        for f in files.values():
+            f.close()
+    for meta in parts.values():
+        os.replace(_path(meta["path"]) + ".tmp", _path(meta["path"]))
+    return list(parts.values()), keys
+
+
+def _closing_snapshot(db: Session, upto: int, at: datetime) -> models.StockSnapshot:
+    """Quantities at ledger position `upto`, for the items that existed before `at`."""
+    T, I, R = models.Transaction, models.Item, models.StockSnapshotRow
+    later = select(T.item_id, func.sum(T.qty_change).label("d")).where(T.id > upto).group_by(T.item_id).subquery()
+    snap = models.StockSnapshot(kind="closing", last_tx_id=upto, taken_at=_ts_param(db, at))
+    db.add(snap)
+    db.flush()
+    snap.item_count = db.execute(
+        insert(R).from_select(
+            ["snapshot_id", "item_id", "code", "category_id", "quantity"],
+            select(literal(snap.id), I.id, I.code, I.category_id, I.quantity - func.coalesce(later.c.d, 0))
+            .outerjoin(later, later.c.item_id == I.id)
+            .where(I.created_at < _ts_param(db, at)),
+        )
+    ).rowcount
+    return snap
+
+
+def archive_ledger(db: Session, months: int | None = None, dry_run: bool = False) -> dict:
+    months = config.LEDGER_ARCHIVE_AFTER_MONTHS if months is None else months
+    cutoff = horizon(months)
+    T = models.Transaction
+
+    # the rollups have to see every row before it leaves the table
+    rollups.refresh(db)
+    wm = rollups.watermark(db)
+    lo = archived_upto(db)
+    leftovers = 0 if dry_run else _purge(db, lo)
+
+    hi = db.execute(
+        select(func.max(T.id)).where(T.id > lo, T.id <= wm, T.created_at < _ts_param(db, cutoff))
+    ).scalar()
+    report = {"horizon": cutoff.isoformat(), "from_tx_id": lo, "to_tx_id": hi or lo,
+              "archived": 0, "deleted": leftovers, "parts": []}
+    if hi is None:
+        return report
+    if dry_run:
+        report["archived"] = db.execute(select(func.count(T.id)).where(T.id > lo, T.id <= hi)).scalar_one()
+        return report
+
+    parts, keys = _write_parts(db, lo, hi)
+    snap = _closing_snapshot(db, hi, cutoff)
+    A = models.LedgerArchive
+    ids = dict(db.execute(insert(A).returning(A.path, A.id), parts).all())
+    _insert_keys(db, {ids[path]: k for path, k in keys.items()})
+    db.commit()
+    report.update(
+        archived=sum(p["row_count"] for p in parts),
+        deleted=leftovers + _purge(db, hi),
+        parts=[p["path"] for p in parts],
+        closing_snapshot_id=snap.id,
+    )
+    return report
+
+
+# ---------- Reads ----------
+
+def read_part(rel: str) -> Iterator[dict]:
+    with gzip.open(_path(rel), "rt", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+            yield row
+
+
+def _candidates(
+    db: Session,
+    stmt,
+    *,
+    item_id: int | None = None,
+    performed_by: int | None = None,
+    lower: datetime | None = None,
+    upper: datetime | None = None,
+    max_tx_id: int | None = None,
+):
+    """
+    Restrict a select over ledger_archives to the parts that can hold rows
+    matching the filters: their time bounds overlap [lower, upper], and for an
+    item / user filter the key index lists it. Reads only the manifest.
+    """
+    A, K = models.LedgerArchive, models.LedgerArchiveKey
+    if lower is not None:
+        stmt = stmt.where(A.max_created_at >= _ts_param(db, lower))
+    if upper is not None:
+        stmt = stmt.where(A.min_created_at <= _ts_param(db, upper))
+    if max_tx_id is not None:
+        stmt = stmt.where(A.min_tx_id <= max_tx_id)
+    for kind, key in (("item", item_id), ("user", performed_by)):
+        if key is not None:
+            stmt = stmt.where(exists().where(K.kind == kind, K.key == key, K.archive_id == A.id))
+    return stmt
+
+
+def _parts(db: Session, **filters) -> list:
+    """
+    Candidate parts (see _candidates) newest first, as rows of (path,
+    min_created_at, max_created_at), times in UTC.
+    """
+    A = models.LedgerArchive
+    stmt = select(A.path, A.min_created_at, A.max_created_at).order_by(A.max_created_at.desc(), A.max_tx_id.desc())
+    return [(path, _utc(lo), _utc(hi)) for path, lo, hi in db.execute(_candidates(db, stmt, **filters)).all()]
+
+
+def _upper(date_to: datetime | None, after: tuple | None) -> datetime | None:
+    bounds = [_utc(b) for b in (date_to, after[0] if after else None) if b is not None]
+    return min(bounds) if bounds else None
+
+
+def archived_page(
+    db: Session,
+    *,
+    item_id: int | None = None,
+    performed_by: int | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    direction: str | None = None,
+    limit: int = 50,
+    after: tuple | None = None,
+    parts: list | None = None,
+) -> list[dict]:
+    """
+    Up to limit archived rows matching the ledger filters, newest first by
+    (created_at, id), continuing after `after`. Only candidate parts (see
+    _parts; pass them in if already looked up) are opened, newest first, and
+    reading stops at the first part entirely older than a full page.
+    """
+    lo = _utc(date_from) if date_from else None
+    hi = _utc(date_to) if date_to else None
+    key = (_utc(after[0]), after[1]) if after else None
+    if parts is None:
+        parts = _parts(db, item_id=item_id, performed_by=performed_by, lower=lo, upper=_upper(hi, after))
+
+    def keep(r: dict) -> bool:
+        ts = _utc(r["created_at"])
+        return (
+            (item_id is None or r["item_id"] == item_id)
+            and (performed_by is None or r["performed_by"] == performed_by)
+            and (lo is None or ts >= lo)
+            and (hi is None or ts < hi)
+            and (direction != "in" or r["qty_change"] > 0)
+            and (direction != "out" or r["qty_change"] < 0)
+            and (key is None or (ts, r["id"]) < key)
+        )
+
+    def newest_first(r: dict):
+        return (_utc(r["created_at"]), r["id"])
+
+    out: list[dict] = []
+    for rel, _, part_newest in parts:
+        if len(out) >= limit and part_newest < _utc(out[-1]["created_at"]):
+            break  # this part and every later one (sorted by their newest row) is older than the page
+        out.extend(r for r in read_part(rel) if keep(r))
+        out.sort(key=newest_first, reverse=True)
+        del out[limit:]
+    return out
+
+
+def has_archive(db: Session) -> bool:
+    return db.execute(select(models.LedgerArchive.id).limit(1)).first() is not None
+
+
+def merge_page(db: Session, rows: list, last: tuple | None, limit: int, after: tuple | None, **filters):
+    """
+    Complete a page from the transactions table with archived rows. Returns
+    (rows, next key) like crud.list_transactions_after; rows may be dicts.
+    """
+    parts = _parts(
+        db, item_id=filters.get("item_id"), performed_by=filters.get("performed_by"),
+        lower=filters.get("date_from"), upper=_upper(filters.get("date_to"), after),
+    )
+    # nothing archived in the query's range (or for its item / user), or the live page is newer
+    if not parts or (last is not None and _utc(rows[-1].created_at) > parts[0][2]):
+        return rows, last
+
+    arch = archived_page(db, limit=limit + 1, after=after, parts=parts, **filters)
+    seen: dict[int, dict] = {}
+    for r in [schemas.TransactionResponse.model_validate(r).model_dump() for r in rows] + arch:
+        seen.setdefault(r["id"], r)
+    merged = sorted(seen.values(), key=lambda r: (_utc(r["created_at"]), r["id"]), reverse=True)
+    page = merged[:limit]
+    more = last is not None or len(merged) > limit
+    return page, ((page[-1]["created_at"], page[-1]["id"]) if more and page else None)
+
+
+EXPORT_COLUMNS = ("id", "item_id", "item_code", "category_id", "qty_change", "note", "performed_by", "created_at")
+
+
+def iter_export(
+    db: Session,
+    *,
+    item_id: int | None = None,
+    category_id: int | None = None,
+    performed_by: int | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    batch_rows: int = 1000,
+) -> Iterator[list[tuple]]:
+    """
+    Archived rows matching the GET /transactions/export filters, in id order,
+    as partitions of EXPORT_COLUMNS tuples. Only candidate parts are opened.
+    The parts of one archive run are split by month and can interleave ids,
+    so overlapping parts are merged. item_code / category_id are the item's
+    current ones (None once the item is gone).
+    """
+    A, I = models.LedgerArchive, models.Item
+    lo = _utc(date_from) if date_from else None
+    hi = _utc(date_to) if date_to else None
+    stmt = select(A.path, A.min_tx_id, A.max_tx_id).order_by(A.min_tx_id, A.id)
+    runs: list[tuple[int, list[str]]] = []
+    for path, first, last in db.execute(
+        _candidates(db, stmt, item_id=item_id, performed_by=performed_by, lower=lo, upper=hi)
+    ).all():
+        if runs and first <= runs[-1][0]:
+            runs[-1] = (max(runs[-1][0], last), runs[-1][1] + [path])
+        else:
+            runs.append((last, [path]))
+
+    def keep(r: dict) -> bool:
+        ts = _utc(r["created_at"])
+        return (
+            (item_id is None or r["item_id"] == item_id)
+            and (performed_by is None or r["performed_by"] == performed_by)
+            and (lo is None or ts >= lo)
+            and (hi is None or ts < hi)
+        )
+
+    def flush(batch: list[dict]) -> list[tuple]:
+        ids = {r["item_id"] for r in batch}
+        items = {i.id: (i.code, i.category_id) for i in db.execute(
+            select(I.id, I.code, I.category_id).where(I.id.in_(ids))
+        ).all()}
+        out = []
+        for r in batch:
+            code, cat = items.get(r["item_id"], (None, None))
+            if category_id is None or cat == category_id:
+                out.append((r["id"], r["item_id"], code, cat, r["qty_change"], r["note"],
+                            r["performed_by"], _utc(r["created_at"])))
+        return out
+
+    batch: list[dict] = []
+    for _, paths in runs:
+        for r in heapq.merge(*(read_part(p) for p in paths), key=lambda r: r["id"]):
+            if not keep(r):
+                continue
+            batch.append(r)
+            if len(batch) >= batch_rows:
+                if rows := flush(batch):
+                    yield rows
+                batch = []
+    if batch and (rows := flush(batch)):
+        yield rows
+
+
+def closing_after(db: Session, ts: datetime) -> models.StockSnapshot | None:
+    """Earliest closing snapshot after ts, i.e. ts lies in an archived stretch of the ledger."""
+    S = models.StockSnapshot
+    return db.execute(
+        select(S).where(S.kind == "closing", S.taken_at > _ts_param(db, ts))
+        .order_by(S.taken_at, S.id).limit(1)
+    ).scalars().first()
+
+
+def as_of_archived(
+    db: Session,
+    ts: datetime,
+    closing: models.StockSnapshot,
+    item_id: int | None = None,
+    category_id: int | None = None,
+) -> list[tuple]:
+    """
+    (item_id, code, category_id, quantity) at ts, for ts before `closing`:
+    the closing quantities minus the movement between ts and the closing
+    position. Everything up to that position is archived (the manifest and
+    the closing snapshot are committed together), so only parts are read.
+    """
+    I, R, D = models.Item, models.StockSnapshotRow, models.ItemDeletion
+    ts = _utc(ts)
+    t = _ts_param(db, ts)
+    stmt = (
+        select(R.item_id, R.code, R.category_id, R.quantity)
+        .outerjoin(I, I.id == R.item_id)
+        .where(R.snapshot_id == closing.id)
+        # items created after ts did not exist yet; for items deleted since the
+        # closing snapshot the creation time comes from their deletion record
+        # (deleted before item_deletions was kept: no creation time, kept)
+        .where(
+            (I.created_at <= t)
+            | (I.id.is_(None) & ~exists().where(D.item_id == R.item_id))
+            | exists().where(
+                D.item_id == R.item_id,
+                D.deleted_at >= _ts_param(db, closing.taken_at),
+                D.item_created_at <= t,
+            )
+        )
+        .order_by(R.item_id)
+    )
+    if item_id is not None:
+        stmt = stmt.where(R.item_id == item_id)
+    if category_id is not None:
+        stmt = stmt.where(R.category_id == category_id)
+    base = db.execute(stmt).all()
+    wanted = {r.item_id for r in base}
+
+    moved: dict[int, int] = {}
+    for rel, _, _ in _parts(db, item_id=item_id, lower=ts, max_tx_id=closing.last_tx_id):
+        for r in read_part(rel):
+            if r["id"] <= closing.last_tx_id and _utc(r["created_at"]) > ts and r["item_id"] in wanted:
+                moved[r["item_id"]] = moved.get(r["item_id"], 0) + r["qty_change"]
+
+    return [(r.item_id, r.code, r.category_id, r.quantity - moved.get(r.item_id, 0)) for r in base]
@@ -0,0 +1,126 @@
+# app/utils/catalog.py
+"""
+Catalog version and conditional GETs for the item/category endpoints.
+
+The ETag has two parts:
+
+- shape: catalog_versions holds one counter per name; bump() runs in the
+  caller's transaction, so a new version becomes visible together with the
+  write it describes. Catalog-shape writes (item create/rename/move/delete,
+  imports, category writes) bump CATALOG.
+- stock: quantity-only writes (adjusts, quantity edits) call stock_changed()
+  right after their commit instead. Bumping a shared row in every adjust's
+  transaction would serialize all stock writes on that row's lock; on
+  PostgreSQL this is a nextval() on catalog_stock_seq, which takes no lock.
+  On SQLite, where writers are serialized anyway, it is the STOCK counter
+  row, bumped in a short transaction of its own. Bumping after the commit
+  keeps the tag from getting ahead of the data; if the process dies between
+  the two, the tag catches up at the next stock write.
+
+conditional_get is a route dependency: it reads both parts (one query, no
+ORM entities), derives a strong ETag from them plus the request path and
+query, and answers a matching If-None-Match with 304 before the endpoint
+runs. The version is read before the endpoint loads its
+data, so a write landing in between can only make the ETag older than the
+body (the next request refetches), never newer. It is read through the
+endpoint's own read session (get_read_db / get_async_read_db, the same
+instance per request), so with a replica configured tag and body come from
+the same database.
+"""
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import config, models
+from app.database import get_async_read_db, get_read_db
+
+CATALOG = "catalog"
+STOCK = "stock"
+
+
+def bump(db: Session, name: str = CATALOG) -> None:
+    V = models.CatalogVersion
+    hit = db.execute(
+        update(V).where(V.name == name).values(version=V.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not hit:
+        # row missing (main.py seeds it at startup; this covers scripts on a fresh DB)
+        db.add(models.CatalogVersion(name=name, version=1))
+
+
+def ensure(db: Session, name: str = CATALOG) -> None:
+    """Create the counter row if it does not exist yet."""
+    if db.get(models.CatalogVersion, name) is not None:
+        return
+    db.add(models.CatalogVersion(name=name, version=0))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # another worker created it first
+
+
+def stock_changed(db: Session) -> None:
+    """Move the stock part of the ETag; call right after committing a quantity change."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(select(models.catalog_stock_seq.next_value()))  # not transactional: no commit
+        return
+    bump(db, STOCK)
+    db.commit()
+
+
+def _tag_stmt(db: Session | AsyncSession):
+    V = models.CatalogVersion
+    shape = select(V.version).where(V.name == CATALOG).scalar_subquery()
+    if db.get_bind().dialect.name == "postgresql":
+        stock = select(text("last_value")).select_from(text(models.catalog_stock_seq.name)).scalar_subquery()
+    else:
+        stock = select(V.version).where(V.name == STOCK).scalar_subquery()
+    return select(shape, stock)
+
+
+def _tag_version(row) -> str:
+    return f"{row[0] or 0}.{row[1] or 0}"
+
+
+def current(db: Session, name: str = CATALOG) -> int:
+    V = models.CatalogVersion
+    return db.execute(select(V.version).where(V.name == name)).scalar() or 0
+
+
+def etag_for(version: int | str, path: str, query: str) -> str:
+    rep = hashlib.sha1(f"{path}?{query}".encode()).hexdigest()[:16]
+    return f'"c{version}-{rep}"'
+
+
+def _matches(header: str | None, tag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # weak comparison, as RFC 9110 prescribes for If-None-Match
+    return tag in {t.strip().removeprefix("W/") for t in header.split(",")}
+
+
+def _conditional(request: Request, response: Response, version: str) -> str:
+    tag = etag_for(version, request.url.path, request.url.query)
+    headers = {"ETag": tag, "Cache-Control": config.CATALOG_CACHE_CONTROL}
+    if _matches(request.headers.get("if-none-match"), tag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return tag
+
+
+def conditional_get(request: Request, response: Response, db: Session = Depends(get_read_db)) -> str:
+    return _conditional(request, response, _tag_version(db.execute(_tag_stmt(db)).one()))
+
+
+async def conditional_get_async(
+    request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)
+) -> str:
+    """conditional_get for async endpoints (shares their AsyncSession)."""
+    return _conditional(request, response, _tag_version((await db.execute(_tag_stmt(db))).one()))
@@ -0,0 +1,136 @@
+# app/utils/category_cache.py
+"""
+In-process cache of the static part of categories (id, name, code, buffer),
+looked up by id or by code.
+
+- bounded: least recently used entries are dropped past CATEGORY_CACHE_SIZE
+- write-through invalidation: routers/categories.py calls invalidate() after
+  each commit, so this worker never serves its own stale data
+- cross-worker coherence: category writes also bump the "categories" counter
+  in catalog_versions; at most every CATEGORY_CACHE_CHECK_SECONDS a lookup
+  reads it (one PK lookup) and clears everything if it moved
+
+The maintained totals (total_quantity, item_count) change with every stock
+movement and are deliberately not cached.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import config, models
+from app.utils import catalog
+
+VERSION_NAME = "categories"
+
+
+@dataclass(frozen=True)
+class CachedCategory:
+    id: int
+    name: str
+    code: str | None
+    buffer: int
+
+
+class CategoryCache:
+    def __init__(self, maxsize: int = 1024, check_seconds: float = 1.0):
+        self.maxsize = maxsize
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._by_id: OrderedDict[int, CachedCategory] = OrderedDict()
+        self._by_code: dict[str, int] = {}
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self, db: Session) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_seconds:
+            return
+        version = catalog.current(db, VERSION_NAME)
+        with self._lock:
+            self._checked_at = now
+            if version != self._version:
+                if self._by_id:
+                    self.invalidations += 1
+                self._by_id.clear()
+                self._by_code.clear()
+                self._version = version
+
+    def _put(self, cat: models.Category) -> CachedCategory:
+        entry = CachedCategory(id=cat.id, name=cat.name, code=cat.code, buffer=int(cat.buffer or 0))
+        with self._lock:
+            old = self._by_id.pop(entry.id, None)
+            if old is not None and old.code:
+                self._by_code.pop(old.code, None)
+            self._by_id[entry.id] = entry
+            if entry.code:
+                self._by_code[entry.code] = entry.id
+            while len(self._by_id) > self.maxsize:
+                _, dropped = self._by_id.popitem(last=False)
+                if dropped.code:
+                    self._by_code.pop(dropped.code, None)
+        return entry
+
+    def get(self, db: Session, category_id: int) -> CachedCategory | None:
+        self._check_version(db)
+        with self._lock:
+            entry = self._by_id.get(category_id)
+            if entry is not None:
+                self._by_id.move_to_end(category_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        cat = db.get(models.Category, category_id)
+        return self._put(cat) if cat is not None else None
+
+    def get_by_code(self, db: Session, code: str) -> CachedCategory | None:
+        self._check_version(db)
+        with self._lock:
+            cid = self._by_code.get(code)
+            entry = self._by_id.get(cid) if cid is not None else None
+            if entry is not None:
+                self._by_id.move_to_end(cid)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        cat = db.execute(select(models.Category).where(models.Category.code == code)).scalars().first()
+        return self._put(cat) if cat is not None else None
+
+    def invalidate(self, category_id: int | None = None) -> None:
+        """Drop one category (or all) after a write in this process."""
+        with self._lock:
+            self.invalidations += 1
+            if category_id is None:
+                self._by_id.clear()
+                self._by_code.clear()
+                return
+            old = self._by_id.pop(category_id, None)
+            if old is not None and old.code:
+                self._by_code.pop(old.code, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._by_id),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+                "version": self._version,
+            }
+
+
+category_cache = CategoryCache(config.CATEGORY_CACHE_SIZE, config.CATEGORY_CACHE_CHECK_SECONDS)
+
+
+def bump_version(db: Session) -> None:
+    """Call in the same transaction as a category write (before commit)."""
+    catalog.bump(db, VERSION_NAME)
@@ -1,8 +1,10 @@
 # app/utils/codes.py
 import re
-from sqlalchemy import select
+from sqlalchemy import select, update, delete, func, case, and_, tuple_
 from sqlalchemy.orm import Session
-from app import models
+from app import config, models
+from app.utils.category_cache import category_cache
+from app.utils.schema import dialect_insert
 
 MIS_PREFIX = "MIS"
 NUM_WIDTH = 4  # -> 0001
@@ -20,16 +22,22 @@ def normalize_cat3(cat_code: str) -> str:
 def format_code(cat3: str, n: int) -> str:
     return f"{MIS_PREFIX}{cat3}{n:0{NUM_WIDTH}d}"
 
-def next_item_code_for_category(db: Session, category_id: int, fill_gaps: bool = True) -> str:
-    """
-    Returns the next free code for this category, e.g. MISCPU0001, MISCPU0002, ...
-    If fill_gaps=True, it uses the smallest available number; else max+1.
-    """
-    cat = db.get(models.Category, category_id)
+def parse_code(code: str) -> tuple[str, int] | None:
+    """'MISCPU0007' -> ('CPU', 7); None for codes outside the scheme."""
+    m = re.match(rf"^{MIS_PREFIX}([A-Z0-9]{{3}})(\d+)$", (code or "").strip(), re.IGNORECASE)
+    if not m:
+        return None
+    return m.group(1).upper(), int(m.group(2))
+
+
+def _category_cat3(db: Session, category_id: int) -> str:
+    cat = category_cache.get(db, category_id)
     if not cat or not cat.code:
         raise ValueError("Category must have a code to generate item codes.")
+    return normalize_cat3(cat.code)
+
 
-    cat3 = normalize_cat3(cat.code)
+def _used_numbers(db: Session, cat3: str) -> set[int]:
     prefix = f"{MIS_PREFIX}{cat3}"  # e.g., 'MISCPU'
     pat = re.compile(rf"^{re.escape(prefix)}(\d+)$", re.IGNORECASE)
 
@@ -39,23 +47,236 @@ def next_item_code_for_category(db: Session, category_id: int, fill_gaps: bool =
     ).scalars().all()
 
     used = set()
-    max_n = 0
     for c in rows:
         if not c:
             continue
         m = pat.match(c.strip())
         if not m:
             continue
-        n = int(m.group(1))
-        used.add(n)
-        if n > max_n:
-            max_n = n
+        used.add(int(m.group(1)))
+    return used
+
+
+def _insert_ignore(db: Session, model, rows: list[dict]) -> None:
+    if not rows:
+        return
+    db.execute(dialect_insert(db, model).on_conflict_do_nothing(), rows)
+
+
+# ---- Counter + free-list allocation ----
+#
+# item_code_counters holds the last number handed out per prefix and is
+# advanced with a single UPDATE ... RETURNING (the row lock serializes
+# concurrent creates). item_code_free holds numbers released by deletes;
+# with gap filling on, the smallest one is taken first with a
+# DELETE ... RETURNING. Both run in the caller's transaction, so a failed
+# insert gives its number back on rollback.
+
+def _ensure_counter(db: Session, cat3: str) -> None:
+    """
+    Seed the counter for a prefix the first time it is used: one scan of
+    existing codes sets last_n = max and records the gaps as free numbers.
+    """
+    exists = db.execute(
+        select(models.ItemCodeCounter.last_n).where(models.ItemCodeCounter.prefix == cat3)
+    ).first()
+    if exists:
+        return
+    used = _used_numbers(db, cat3)
+    max_n = max(used, default=0)
+    _insert_ignore(db, models.ItemCodeCounter, [{"prefix": cat3, "last_n": max_n}])
+    _insert_ignore(db, models.ItemCodeFree, [
+        {"prefix": cat3, "n": n} for n in range(1, max_n) if n not in used
+    ])
+
+
+def resync_counter(db: Session, cat3: str) -> None:
+    """
+    Re-derive counter and free-list from the items table, e.g. after codes
+    were written behind the allocator's back.
+    """
+    db.execute(delete(models.ItemCodeFree).where(models.ItemCodeFree.prefix == cat3))
+    db.execute(delete(models.ItemCodeCounter).where(models.ItemCodeCounter.prefix == cat3))
+    _ensure_counter(db, cat3)
+
+
+def _take_free(db: Session, cat3: str) -> int | None:
+    smallest = (
+        select(func.min(models.ItemCodeFree.n))
+        .where(models.ItemCodeFree.prefix == cat3)
+        .scalar_subquery()
+    )
+    # under concurrency two callers may race for the same row; the loser
+    # deletes nothing and falls back to the counter
+    return db.execute(
+        delete(models.ItemCodeFree)
+        .where(models.ItemCodeFree.prefix == cat3, models.ItemCodeFree.n == smallest)
+        .returning(models.ItemCodeFree.n)
+    ).scalar_one_or_none()
+
+
+def _advance_counter(db: Session, cat3: str, k: int = 1) -> int:
+    """Reserve k numbers; returns the last one (the block is last-k+1 .. last)."""
+    return db.execute(
+        update(models.ItemCodeCounter)
+        .where(models.ItemCodeCounter.prefix == cat3)
+        .values(last_n=models.ItemCodeCounter.last_n + k)
+        .returning(models.ItemCodeCounter.last_n)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+
+def allocate_item_code(db: Session, category_id: int, fill_gaps: bool | None = None) -> str:
+    """
+    Atomically takes the next code for this category, e.g. MISCPU0007.
+    Must be committed together with the item that uses it.
+    """
+    if fill_gaps is None:
+        fill_gaps = config.ITEM_CODE_FILL_GAPS
+    cat3 = _category_cat3(db, category_id)
+    _ensure_counter(db, cat3)
+    n = _take_free(db, cat3) if fill_gaps else None
+    if n is None:
+        n = _advance_counter(db, cat3)
+    return format_code(cat3, n)
 
-    if fill_gaps:
-        n = 1
-        while n in used:
-            n += 1
-    else:
-        n = max_n + 1 if max_n else 1
 
+def next_item_code_for_category(db: Session, category_id: int, fill_gaps: bool = True) -> str:
+    """
+    Preview of the code allocate_item_code would hand out next (does not
+    reserve it). O(1): reads the counter row and the smallest free number.
+    """
+    cat3 = _category_cat3(db, category_id)
+    _ensure_counter(db, cat3)
+    n = None
+    if fill_gaps:
+        n = db.execute(
+            select(func.min(models.ItemCodeFree.n)).where(models.ItemCodeFree.prefix == cat3)
+        ).scalar()
+    if n is None:
+        n = db.execute(
+            select(models.ItemCodeCounter.last_n).where(models.ItemCodeCounter.prefix == cat3)
+        ).scalar_one() + 1
     return format_code(cat3, n)
+
+
+def claim_item_code(db: Session, code: str) -> None:
+    """
+    Record that a caller-supplied code in the MIS scheme is now in use so
+    the allocator never hands it out: drop it from the free-list and move
+    the counter past it.
+    """
+    claim_item_codes(db, [code])
+
+
+def claim_item_codes(db: Session, codes: list[str]) -> None:
+    """claim_item_code for many codes: one DELETE on the free-list and one counter UPDATE."""
+    pairs: list[tuple[str, int]] = []
+    top: dict[str, int] = {}
+    for c in codes:
+        parsed = parse_code(c)
+        if parsed:
+            pairs.append(parsed)
+            top[parsed[0]] = max(top.get(parsed[0], 0), parsed[1])
+    if not pairs:
+        return
+    for cat3 in top:
+        _ensure_counter(db, cat3)
+    F, C = models.ItemCodeFree, models.ItemCodeCounter
+    db.execute(delete(F).where(tuple_(F.prefix, F.n).in_(pairs)))
+    db.execute(
+        update(C)
+        .where(C.prefix.in_(list(top)))
+        .values(last_n=case(*((and_(C.prefix == p, C.last_n < n), n) for p, n in top.items()), else_=C.last_n))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_item_codes(db: Session, codes: list[str]) -> None:
+    """Feed the codes of deleted items into the free-list (in the caller's transaction)."""
+    rows = []
+    for c in codes:
+        parsed = parse_code(c)
+        if parsed:
+            rows.append({"prefix": parsed[0], "n": parsed[1]})
+    _insert_ignore(db, models.ItemCodeFree, rows)
+
+
+class CodeBlockAllocator:
+    """
+    Hands out item codes for many new items at once (bulk import).
+    Numbers are reserved from the counter in blocks (one UPDATE per block)
+    and committed straight away, so a later rollback of an insert chunk can
+    never hand the same numbers out twice; call release_unused() at the end
+    to return what was not used to the free-list.
+
+    Caller-supplied codes are only checked and remembered by claim(); the
+    caller writes them with claim_item_codes() in the transaction that
+    inserts their items, so a rolled-back chunk takes its claims along.
+    """
+
+    def __init__(self, db: Session, block: int = 100):
+        self.db = db
+        self.block = block
+        self._blocks: dict[str, list[int]] = {}  # cat3 -> [next, last]
+        self._claimed: set[str] = set()
+        self._claimed_n: set[tuple[str, int]] = set()
+
+    def allocate(self, cat_code: str) -> str:
+        cat3 = normalize_cat3(cat_code)
+        nxt, last = self._blocks.get(cat3, (1, 0))
+        while True:
+            if nxt > last:
+                _ensure_counter(self.db, cat3)
+                last = _advance_counter(self.db, cat3, self.block)
+                self.db.commit()
+                nxt = last - self.block + 1
+            if (cat3, nxt) not in self._claimed_n:
+                break
+            nxt += 1
+        self._blocks[cat3] = [nxt + 1, last]
+        return format_code(cat3, nxt)
+
+    def claim(self, cat_code: str, code: str) -> bool:
+        """
+        Reserve a caller-supplied code. False if it is already taken
+        (in the DB or earlier in this batch) or does not fit the category scheme.
+        """
+        code = code.strip()
+        if not code.upper().startswith(f"{MIS_PREFIX}{normalize_cat3(cat_code)}"):
+            return False
+        if code in self._claimed:
+            return False
+        taken = self.db.execute(select(models.Item.id).where(models.Item.code == code)).first()
+        if taken:
+            return False
+        self._claimed.add(code)
+        parsed = parse_code(code)
+        if parsed:
+            self._claimed_n.add(parsed)
+        return True
+
+    def release_unused(self) -> None:
+        rows = []
+        for cat3, (nxt, last) in self._blocks.items():
+            if nxt > last:
+                continue
+            # Unused numbers nxt..last: if nobody advanced the counter after our
+            # block, wind it back (never below a code claimed in this import);
+            # whatever cannot be handed back that way goes to the free-list.
+            keep = max([nxt - 1] + [n for c, n in self._claimed_n if c == cat3 and n <= last])
+            wound = self.db.execute(
+                update(models.ItemCodeCounter)
+                .where(models.ItemCodeCounter.prefix == cat3, models.ItemCodeCounter.last_n == last)
+                .values(last_n=keep)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            end = keep if wound else last
+            rows.extend(
+                {"prefix": cat3, "n": n}
+                for n in range(nxt, end + 1)
+                if (cat3, n) not in self._claimed_n
+            )
+        self._blocks.clear()
+        _insert_ignore(self.db, models.ItemCodeFree, rows)
+        self.db.commit()
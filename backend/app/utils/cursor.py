@@ -0,0 +1,27 @@
+# app/utils/cursor.py
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    """
+    Pack the sort key of the last row on a page, e.g. (id,) or (rank, id),
+    into an opaque url-safe token the client sends back as ?cursor=.
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, arity: int) -> tuple:
+    """
+    Reverse of encode_cursor. Raises ValueError on anything malformed
+    (bad base64/JSON or a key with the wrong number of parts).
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != arity:
+        raise ValueError("Invalid cursor")
+    return tuple(values)
@@ -0,0 +1,174 @@
+# app/utils/digest.py
+"""
+Windowed notification digests (NOTIFY_STOCK_CHANGES / NOTIFY_LOW_STOCK = "digest").
+
+Instead of one email per event, the email templates call add() to upsert a
+line into email_digest_entries, keyed by (recipient set, kind, code):
+
+- stock: repeated changes to one item collapse into one line, the quantity
+  before the first event plus the net delta (deltas add up, so concurrent
+  adjustments land in any order)
+- low_stock: one line per category with its latest total and buffer
+
+The first event for a recipient set opens its window (NOTIFY_DIGEST_SECONDS);
+later events join it. The email worker calls email.flush_digests() every
+round: the lines of each recipient set whose window has closed are taken with
+DELETE ... RETURNING and queued as one summary email in the same transaction,
+so two workers never send the same digest.
+
+Counters (email_digest_counters, added to at flush in the same transaction;
+GET /admin/metrics/notifications):
+digest_events (events folded into digests), digest_merged (events that
+collapsed into an existing line), digest_dropped (events on lines that netted
+to no change and were left out), digest_emails (summary emails queued).
+"""
+import hashlib
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.orm import Session
+
+from app import config, models
+from app.utils.schema import dialect_insert
+
+STOCK, LOW_STOCK = "stock", "low_stock"
+COUNTERS = ("digest_events", "digest_merged", "digest_dropped", "digest_emails")
+
+
+@dataclass(frozen=True)
+class DigestEvent:
+    kind: str
+    code: str
+    name: str
+    old_qty: int
+    new_qty: int
+    buffer: int | None = None
+    note: str | None = None
+    events: int = 1
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _key(recipients: list[str]) -> str:
+    return hashlib.sha1(", ".join(sorted(recipients)).encode()).hexdigest()
+
+
+def _merge(events: list[DigestEvent]) -> list[DigestEvent]:
+    """Collapse events for the same line within one call (one upsert row per key)."""
+    lines: dict[tuple[str, str], DigestEvent] = {}
+    for e in events:
+        prev = lines.get((e.kind, e.code))
+        if prev is None:
+            lines[(e.kind, e.code)] = e
+            continue
+        new_qty = prev.new_qty + e.new_qty - e.old_qty if e.kind == STOCK else e.new_qty
+        lines[(e.kind, e.code)] = replace(
+            prev, name=e.name, new_qty=new_qty, buffer=e.buffer,
+            note=e.note or prev.note, events=prev.events + e.events,
+        )
+    return list(lines.values())
+
+
+def add(db: Session, recipients: list[str], events: list[DigestEvent]) -> None:
+    """Fold events into the open digest of this recipient set (no commit)."""
+    if not events or not recipients:
+        return
+    D = models.EmailDigestEntry
+    key = _key(recipients)
+    # join the set's open window, or open one; two processes opening it at once is
+    # harmless: the flush goes by the earliest end and takes every line of the set
+    ends = db.execute(select(func.min(D.window_ends_at)).where(D.recipients_key == key)).scalar()
+    if ends is None:
+        ends = _now() + timedelta(seconds=config.NOTIFY_DIGEST_SECONDS)
+
+    ins = dialect_insert(db, D)
+    ex = ins.excluded
+    stmt = ins.on_conflict_do_update(
+        index_elements=["recipients_key", "kind", "code"],
+        set_={
+            "name": ex.name,
+            # stock lines add this event's delta; low_stock lines keep the latest total
+            "new_qty": case((ex.kind == STOCK, D.new_qty + ex.new_qty - ex.old_qty), else_=ex.new_qty),
+            "buffer": ex.buffer,
+            "events": D.events + ex.events,
+            "note": func.coalesce(ex.note, D.note),
+        },
+    )
+    db.execute(stmt, [
+        {
+            "recipients_key": key, "kind": e.kind, "code": e.code, "recipients": ", ".join(recipients),
+            "name": e.name, "old_qty": e.old_qty, "new_qty": e.new_qty, "buffer": e.buffer,
+            "events": e.events, "note": e.note or None, "window_ends_at": ends,
+        }
+        for e in _merge(events)
+    ])
+
+
+def due_keys(db: Session, force: bool = False) -> list[str]:
+    """Recipient sets whose window has closed (all of them with force)."""
+    D = models.EmailDigestEntry
+    stmt = select(D.recipients_key).group_by(D.recipients_key)
+    if not force:
+        stmt = stmt.having(func.min(D.window_ends_at) <= _now())
+    return db.execute(stmt).scalars().all()
+
+
+def take(db: Session, key: str) -> tuple[list[str], list, list]:
+    """
+    Remove the lines of one recipient set (uncommitted: the caller commits
+    together with the email it queues) and count them. Returns (recipients,
+    stock lines with a net change, low_stock lines); recipients is empty if
+    another worker took the set first.
+    """
+    D = models.EmailDigestEntry
+    rows = db.execute(
+        delete(D).where(D.recipients_key == key)
+        .returning(D.recipients, D.kind, D.code, D.name, D.old_qty, D.new_qty, D.buffer, D.events, D.note)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if not rows:
+        return [], [], []
+    changes = sorted((r for r in rows if r.kind == STOCK and r.new_qty != r.old_qty), key=lambda r: r.code)
+    low = sorted((r for r in rows if r.kind == LOW_STOCK), key=lambda r: r.code)
+    events = sum(r.events for r in rows)
+    counts = {
+        "digest_events": events,
+        "digest_merged": events - len(rows),
+        "digest_dropped": sum(r.events for r in rows if r.kind == STOCK and r.new_qty == r.old_qty),
+        "digest_emails": 1 if changes or low else 0,
+    }
+    _count(db, counts)
+    return [r.strip() for r in rows[0].recipients.split(",")], changes, low
+
+
+def _count(db: Session, counts: dict[str, int]) -> None:
+    """Add to the counters in the caller's transaction (one upsert; rows are created on first use)."""
+    C = models.EmailDigestCounter
+    rows = [{"name": name, "value": n} for name, n in counts.items() if n]
+    if not rows:
+        return
+    ins = dialect_insert(db, C)
+    db.execute(ins.on_conflict_do_update(index_elements=["name"], set_={"value": C.value + ins.excluded.value}), rows)
+
+
+def stats(db: Session) -> dict:
+    D = models.EmailDigestEntry
+    C = models.EmailDigestCounter
+    counters = dict(db.execute(select(C.name, C.value).where(C.name.in_(COUNTERS))).all())
+    pending = db.execute(
+        select(func.count(), func.coalesce(func.sum(D.events), 0),
+               func.count(func.distinct(D.recipients_key)), func.min(D.window_ends_at))
+    ).one()
+    return {
+        "stock_changes": config.NOTIFY_STOCK_CHANGES,
+        "low_stock": config.NOTIFY_LOW_STOCK,
+        "window_seconds": config.NOTIFY_DIGEST_SECONDS,
+        "pending_lines": pending[0],
+        "pending_events": pending[1],
+        "pending_recipient_sets": pending[2],
+        "next_window_ends_at": pending[3],
+        **{name: counters.get(name, 0) for name in COUNTERS},
+    }
@@ -11,105 +11,89 @@ from email.mime.multipart import MIMEMultipart
 from sqlalchemy.orm import Session
 
 from app import config
-from app import models
+from app.database import SessionLocal
+from app.utils import digest, outbox
+from app.utils.recipient_cache import recipient_cache
 
 # --- Helpers ---------------------------------------------------------------
 
-def _parse_recipients(value: Optional[str | Sequence[str]]) -> list[str]:
-    """
-    Accepts:
-      - None
-      - comma-separated string
-      - list/tuple of strings
-
-    Returns a deduped, trimmed list.
-    """
-    if not value:
-        return []
-    if isinstance(value, str):
-        parts = value.split(",")
-    else:
-        # list/tuple/etc.
-        parts = []
-        for v in value:
-            parts.extend(v.split(","))  # allow inner "a,b" too
-    seen = set()
-    out: list[str] = []
-    for raw in parts:
-        e = (raw or "").strip()
-        if not e:
-            continue
-        if e not in seen:
-            seen.add(e)
-            out.append(e)
-    return out
-
-
-def _default_env_recipients() -> list[str]:
-    return _parse_recipients(getattr(config, "EMAIL_TO_DEFAULT", ""))
-
-
-def _db_active_recipients(db: Optional[Session]) -> list[str]:
-    if db is None:
-        return []
-    try:
-        rows = (
-            db.query(models.EmailRecipient)
-              .filter(models.EmailRecipient.active.is_(True))
-              .all()
-        )
-        return _parse_recipients([r.email for r in rows])
-    except Exception:
-        # Soft-fail if DB not reachable during email
-        return []
-
-
-def _resolve_all_recipients(
-    db: Optional[Session],
-    extra_to: Optional[Sequence[str] | str],
-) -> list[str]:
-    """
-    Merge in this order:
-      1) EMAIL_TO_DEFAULT from env
-      2) active recipients from DB (email_recipients)
-      3) extra_to passed by the caller
-    """
-    merged = []
-    merged.extend(_default_env_recipients())
-    merged.extend(_db_active_recipients(db))
-    merged.extend(_parse_recipients(extra_to))
-    # de-dup while preserving order
-    seen = set()
-    final: list[str] = []
-    for e in merged:
-        if e not in seen:
-            seen.add(e)
-            final.append(e)
-    return final
-
-
 def _build_html_wrapper(inner_html: str) -> str:
     # one place for base wrapper if you want to add footer/branding consistently
     return inner_html
 
 
-def _send_via_smtp(msg: MIMEMultipart, all_rcpts: list[str]) -> None:
-    if not all_rcpts:
-        return
-
-    # Helpful when debugging delivery issues:
-    # print(f"[EMAIL] Sending to {all_rcpts}")
+class SMTPConnection:
+    """
+    One SMTP session reused for many messages (the email worker's): connects,
+    STARTTLS and login happen once per SMTP_MAX_MESSAGES_PER_CONNECTION
+    messages instead of once per message. A session the server dropped while
+    idle is reopened once before the send counts as failed.
+    """
 
-    ctx = ssl.create_default_context()
-    with smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT) as smtp:
-        smtp.ehlo()
-        smtp.starttls(context=ctx)
-        smtp.ehlo()
-        smtp.login(config.SMTP_USER, config.SMTP_PASS)
+    def __init__(self, max_messages: int | None = None):
+        self.max_messages = max_messages or config.SMTP_MAX_MESSAGES_PER_CONNECTION
+        self._smtp: smtplib.SMTP | None = None
+        self._sent_on_conn = 0
+        self.connects = 0
+        self.sent = 0
+
+    def _open(self) -> None:
+        smtp = smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT, timeout=config.SMTP_TIMEOUT)
+        try:
+            smtp.ehlo()
+            if config.SMTP_STARTTLS:
+                smtp.starttls(context=ssl.create_default_context())
+                smtp.ehlo()
+            if config.SMTP_USER:
+                smtp.login(config.SMTP_USER, config.SMTP_PASS)
+        except BaseException:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self._sent_on_conn = 0
+        self.connects += 1
+
+    def send(self, msg: MIMEMultipart, all_rcpts: list[str]) -> None:
+        if self._smtp is None or self._sent_on_conn >= self.max_messages:
+            self.close()
+            self._open()
+        try:
+            # send_message uses To/Cc/Bcc headers to determine recipients,
+            # but we also pass recipients explicitly to be safe.
+            self._smtp.send_message(msg, from_addr=config.EMAIL_FROM, to_addrs=all_rcpts)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._open()
+            self._smtp.send_message(msg, from_addr=config.EMAIL_FROM, to_addrs=all_rcpts)
+        self._sent_on_conn += 1
+        self.sent += 1
+
+    def close(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+
+def build_message(subject: str, html_body: str, all_to: list[str]) -> MIMEMultipart:
+    """
+    - places actual recipients in BCC (for privacy & better delivery)
+    - meant for send_message(), which is less error-prone for multiple rcpts
+    """
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = config.EMAIL_FROM
+    # Show a friendly "To" line without exposing everyone:
+    msg["To"] = "Undisclosed recipients"
+    # Put real recipients in BCC so providers deliver to all
+    msg["Bcc"] = ", ".join(all_to)
+    msg["Reply-To"] = config.SMTP_USER
 
-        # send_message uses To/Cc/Bcc headers to determine recipients,
-        # but we also pass recipients explicitly to be safe.
-        smtp.send_message(msg, from_addr=config.EMAIL_FROM, to_addrs=all_rcpts)
+    msg.attach(MIMEText(_build_html_wrapper(html_body), "html"))
+    return msg
 
 
 def send_email(
@@ -118,38 +102,77 @@ def send_email(
     *,
     db: Optional[Session] = None,
     to_list: Optional[Sequence[str] | str] = None,
+    kind: str = "email",
 ) -> None:
     """
     High-level sender that:
-      - merges env + DB active recipients + optional to_list
-      - places actual recipients in BCC (for privacy & better delivery)
-      - uses send_message() which is less error-prone for multiple rcpts
+      - merges env + DB active recipients (app.utils.recipient_cache, which reads
+        through a session of its own) + optional to_list
+      - queues the message in the email outbox (app.utils.outbox) in the caller's
+        transaction, which the caller commits; the email worker delivers it.
+        Without a db, a session of its own is used and committed.
     """
-    all_to = _resolve_all_recipients(db, to_list)
+    if db is None:
+        with SessionLocal() as own:
+            send_email(subject, html_body, db=own, to_list=to_list, kind=kind)
+            own.commit()
+        return
+
+    all_to = recipient_cache.resolve(to_list)
     if not all_to:
         # nothing to send to; you may log this
         return
+    outbox.enqueue(db, kind, subject, html_body, all_to)
 
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = config.EMAIL_FROM
-    # Show a friendly "To" line without exposing everyone:
-    msg["To"] = "Undisclosed recipients"
-    # Put real recipients in BCC so providers deliver to all
-    msg["Bcc"] = ", ".join(all_to)
-    msg["Reply-To"] = config.SMTP_USER
 
-    msg.attach(MIMEText(_build_html_wrapper(html_body), "html"))
+def _send_to_digest(
+    events: list[digest.DigestEvent],
+    *,
+    db: Optional[Session],
+    to_list: Optional[Sequence[str] | str],
+) -> None:
+    """Digest counterpart of send_email(): fold events into the recipients' open digest (no commit)."""
+    if db is None:
+        with SessionLocal() as own:
+            _send_to_digest(events, db=own, to_list=to_list)
+            own.commit()
+        return
+
+    all_to = recipient_cache.resolve(to_list)
+    if not all_to:
+        return
+    digest.add(db, all_to, events)
 
-    _send_via_smtp(msg, all_to)
+
+def flush_digests(db: Session, *, force: bool = False) -> int:
+    """
+    Queue one summary email per recipient set whose digest window has closed
+    (every pending digest with force). Called by the email worker each round.
+    Returns how many emails were queued.
+    """
+    queued = 0
+    for key in digest.due_keys(db, force=force):
+        recipients, changes, low = digest.take(db, key)
+        if not changes and not low:
+            db.commit()  # everything netted out (or another worker took it): just drop the lines
+            continue
+        subject, html = _render_digest(changes, low)
+        outbox.enqueue(db, "stock_digest", subject, html, recipients)
+        db.commit()  # the email and the removal of its lines go together
+        queued += 1
+    return queued
 
 
 # --- Templates -------------------------------------------------------------
 
 def send_low_stock(
     *, code: str, name: str, qty: int, buffer: int,
-    db: Optional[Session] = None, to: Optional[Sequence[str] | str] = None
+    db: Optional[Session] = None, to: Optional[Sequence[str] | str] = None,
+    immediate: bool = False,
 ):
+    if config.NOTIFY_LOW_STOCK == "digest" and not immediate:
+        event = digest.DigestEvent(digest.LOW_STOCK, code, name, qty, qty, buffer=buffer)
+        return _send_to_digest([event], db=db, to_list=to)
     subject = f"⚠️ Low Stock: {name} ({code}) — Qty {qty} / Buffer {buffer}"
     html = f"""
     <div style="font-family:Segoe UI,Arial,sans-serif;max-width:560px;margin:auto;border:1px solid #e5e7eb;border-radius:12px;padding:16px">
@@ -166,13 +189,17 @@ def send_low_stock(
       <div style="font-size:12px;color:#6b7280">Nidec MIS Inventory System</div>
     </div>
     """
-    send_email(subject, html, db=db, to_list=to)
+    send_email(subject, html, db=db, to_list=to, kind="low_stock")
 
 
 def send_stock_change(
     *, code: str, name: str, old_qty: int, new_qty: int, note: str = "",
-    db: Optional[Session] = None, to: Optional[Sequence[str] | str] = None
+    db: Optional[Session] = None, to: Optional[Sequence[str] | str] = None,
+    immediate: bool = False,
 ):
+    if config.NOTIFY_STOCK_CHANGES == "digest" and not immediate:
+        event = digest.DigestEvent(digest.STOCK, code, name, old_qty, new_qty, note=note)
+        return _send_to_digest([event], db=db, to_list=to)
     delta = new_qty - old_qty
     sign = "+" if delta >= 0 else ""
     subject = f"Stock Change: {name} ({code}) — {sign}{delta} → {new_qty}"
@@ -187,7 +214,7 @@ def send_stock_change(
       <div style="font-size:12px;color:#6b7280">Nidec MIS Inventory System</div>
     </div>
     """
-    send_email(subject, html, db=db, to_list=to)
+    send_email(subject, html, db=db, to_list=to, kind="stock_change")
 
 
 def send_category_low_stock(
@@ -200,16 +227,23 @@ def send_category_low_stock(
     *,
     db: Optional[Session] = None,
     to_list: Optional[Sequence[str] | str] = None,
+    immediate: bool = False,
+    critical: bool = False,
 ):
+    if config.NOTIFY_LOW_STOCK == "digest" and not immediate:
+        event = digest.DigestEvent(digest.LOW_STOCK, category_code, category_name, total_qty, total_qty, buffer=buffer)
+        return _send_to_digest([event], db=db, to_list=to_list)
+
+    level = "Critical Stock" if critical else "Low Stock"
     affected = ""
     if affected_item_code or affected_item_name:
         label = f"{affected_item_name or ''} ({affected_item_code or ''})".strip()
         affected = f'<p style="margin:0 0 8px 0;color:#374151;font-size:14px">Affected Item: <b>{label}</b></p>'
 
-    subject = f"⚠️ Low Stock (Category {category_name}) — Total {total_qty} / Buffer {buffer}"
+    subject = f"⚠️ {level} (Category {category_name}) — Total {total_qty} / Buffer {buffer}"
     html = f"""
     <div style="font-family:Segoe UI,Arial,sans-serif;max-width:560px;margin:auto;border:1px solid #e5e7eb;border-radius:12px;padding:16px">
-      <h2 style="margin:0 0 8px 0;font-size:18px;color:#111827">⚠️ Category Low Stock</h2>
+      <h2 style="margin:0 0 8px 0;font-size:18px;color:#111827">⚠️ Category {level}</h2>
       <p style="margin:0 0 12px 0;color:#374151;font-size:14px">{category_name} ({category_code})</p>
       {affected}
       <p style="margin:0 0 4px 0;color:#374151;font-size:14px">Total Quantity: <b>{total_qty}</b></p>
@@ -218,7 +252,7 @@ def send_category_low_stock(
       <div style="font-size:12px;color:#6b7280">Nidec MIS Inventory System</div>
     </div>
     """
-    send_email(subject, html, db=db, to_list=to_list)
+    send_email(subject, html, db=db, to_list=to_list, kind="category_low_stock")
 
 
 def send_item_created(
@@ -239,7 +273,7 @@ def send_item_created(
       <div style="font-size:12px;color:#6b7280">Nidec MIS Inventory System</div>
     </div>
     """
-    send_email(subject, html, db=db, to_list=to)
+    send_email(subject, html, db=db, to_list=to, kind="item_created")
 
 
 def send_item_deleted(
@@ -257,9 +291,12 @@ def send_item_deleted(
       <div style="font-size:12px;color:#6b7280">Nidec MIS Inventory System</div>
     </div>
     """
-    send_email(subject, html, db=db, to_list=to)
+    send_email(subject, html, db=db, to_list=to, kind="item_deleted")
 
-def send_bulk_item_deletion(*, items: list[dict], note: str | None = None, to: list[str] | None = None):
+def send_bulk_item_deletion(
+    *, items: list[dict], note: str | None = None,
+    db: Optional[Session] = None, to: list[str] | None = None
+):
     # items: [{"code": "...", "name": "...", "qty": 0}, ...]
     rows = "".join(
         f"<tr><td style='padding:6px 8px;border:1px solid #e5e7eb'>{i['code']}</td>"
@@ -286,4 +323,114 @@ def send_bulk_item_deletion(*, items: list[dict], note: str | None = None, to: l
     </div>
     """
     subject = f"Bulk Delete: {len(items)} item(s)"
-    send_email(subject, html, to_list=to)
+    send_email(subject, html, db=db, to_list=to, kind="bulk_item_deletion")
+
+def send_batch_stock_change(
+    *, items: list[dict], note: str | None = None,
+    db: Optional[Session] = None, to: Optional[Sequence[str] | str] = None,
+    immediate: bool = False,
+):
+    if config.NOTIFY_STOCK_CHANGES == "digest" and not immediate:
+        events = [
+            digest.DigestEvent(digest.STOCK, i["code"], i["name"], i["old_qty"], i["new_qty"], note=note)
+            for i in items
+        ]
+        return _send_to_digest(events, db=db, to_list=to)
+    # items: [{"code": "...", "name": "...", "old_qty": 0, "new_qty": 0}, ...]
+    rows = "".join(
+        f"<tr><td style='padding:6px 8px;border:1px solid #e5e7eb'>{i['code']}</td>"
+        f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{i['name']}</td>"
+        f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{i['old_qty']} → <b>{i['new_qty']}</b></td>"
+        f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{'+' if i['new_qty'] >= i['old_qty'] else ''}{i['new_qty'] - i['old_qty']}</td></tr>"
+        for i in items
+    )
+    note_html = f"<p style='margin:10px 0;color:#6b7280'>Note: {note}</p>" if note else ""
+    html = f"""
+    <div style="font-family:Segoe UI,Arial,sans-serif;max-width:560px;margin:auto;border:1px solid #e5e7eb;border-radius:12px;padding:16px">
+      <h2 style="margin:0 0 8px 0;font-size:18px;color:#111827">Stock Changes (Batch)</h2>
+      <p style="margin:0 0 12px 0;color:#374151;font-size:14px">The following items were adjusted in one batch:</p>
+      <table style="border-collapse:collapse;width:100%;font-size:14px">
+        <thead>
+          <tr>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Code</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Name</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Quantity</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Δ</th>
+          </tr>
+        </thead>
+        <tbody>{rows}</tbody>
+      </table>
+      {note_html}
+      <hr style="border:none;border-top:1px solid #e5e7eb;margin:16px 0">
+      <div style="font-size:12px;color:#6b7280">Nidec MIS Inventory System</div>
+    </div>
+    """
+    subject = f"Stock Changes: {len(items)} item(s) adjusted"
+    send_email(subject, html, db=db, to_list=to, kind="batch_stock_change")
+
+
+def _render_digest(changes: list, low: list) -> tuple[str, str]:
+    # changes / low: digest lines (app.utils.digest.take)
+    parts = [f"{len(changes)} item(s) changed"] if changes else []
+    if low:
+        parts.append(f"{len(low)} low stock")
+    subject = f"Stock Digest: {', '.join(parts)}"
+
+    sections = ""
+    if changes:
+        rows = "".join(
+            f"<tr><td style='padding:6px 8px;border:1px solid #e5e7eb'>{r.code}</td>"
+            f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{r.name}"
+            + (f"<div style='color:#6b7280;font-size:12px'>{r.note}</div>" if r.note else "")
+            + "</td>"
+            f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{r.old_qty} → <b>{r.new_qty}</b></td>"
+            f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{'+' if r.new_qty >= r.old_qty else ''}{r.new_qty - r.old_qty}</td>"
+            f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{r.events}</td></tr>"
+            for r in changes
+        )
+        sections += f"""
+      <p style="margin:0 0 12px 0;color:#374151;font-size:14px">Net stock changes since the last digest:</p>
+      <table style="border-collapse:collapse;width:100%;font-size:14px">
+        <thead>
+          <tr>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Code</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Name</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Quantity</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Δ</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Changes</th>
+          </tr>
+        </thead>
+        <tbody>{rows}</tbody>
+      </table>
+        """
+    if low:
+        rows = "".join(
+            f"<tr><td style='padding:6px 8px;border:1px solid #e5e7eb'>{r.code}</td>"
+            f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{r.name}</td>"
+            f"<td style='padding:6px 8px;border:1px solid #e5e7eb'><b>{r.new_qty}</b></td>"
+            f"<td style='padding:6px 8px;border:1px solid #e5e7eb'>{r.buffer}</td></tr>"
+            for r in low
+        )
+        sections += f"""
+      <h3 style="margin:16px 0 8px 0;font-size:16px;color:#111827">⚠️ Low Stock</h3>
+      <table style="border-collapse:collapse;width:100%;font-size:14px">
+        <thead>
+          <tr>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Code</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Name</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Quantity</th>
+            <th style="padding:6px 8px;border:1px solid #e5e7eb;background:#f9fafb;text-align:left">Buffer</th>
+          </tr>
+        </thead>
+        <tbody>{rows}</tbody>
+      </table>
+        """
+    html = f"""
+    <div style="font-family:Segoe UI,Arial,sans-serif;max-width:560px;margin:auto;border:1px solid #e5e7eb;border-radius:12px;padding:16px">
+      <h2 style="margin:0 0 8px 0;font-size:18px;color:#111827">Stock Digest</h2>
+      {sections}
+      <hr style="border:none;border-top:1px solid #e5e7eb;margin:16px 0">
+      <div style="font-size:12px;color:#6b7280">Nidec MIS Inventory System</div>
+    </div>
+    """
+    return subject, html
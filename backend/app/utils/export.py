@@ -0,0 +1,94 @@
+# app/utils/export.py
+"""
+Streaming CSV / NDJSON export for GET /items/export and GET /transactions/export.
+
+Rows are pulled through a server-side cursor (yield_per -> stream_results,
+i.e. a named cursor on psycopg2) and written out one partition at a time,
+optionally gzip-compressed on the fly, so memory stays flat whatever the
+table size. The generator owns its own session: the request's get_db
+session may already be closed by the time the response body is streamed.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Iterable, Iterator, Sequence
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from app.database import SessionLocal
+
+FORMATS = ("csv", "ndjson")
+BATCH_ROWS = 1000
+
+
+def _plain(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return v
+
+
+def iter_encoded(columns: list[str], partitions: Iterable[Sequence[Sequence]], fmt: str,
+                 compress: bool = False) -> Iterator[bytes]:
+    """Encode row partitions (lists of value tuples) as CSV/NDJSON, optionally gzipped."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31 -> gzip container
+
+    def out(chunk: str) -> bytes:
+        data = chunk.encode("utf-8")
+        return gz.compress(data) if gz else data
+
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(columns)
+        for part in partitions:
+            writer.writerows([[_plain(v) for v in row] for row in part])
+            piece = out(buf.getvalue())
+            buf.seek(0)
+            buf.truncate()
+            if piece:
+                yield piece
+    else:
+        for part in partitions:
+            piece = out("".join(
+                json.dumps({c: _plain(v) for c, v in zip(columns, row)}, ensure_ascii=False) + "\n"
+                for row in part
+            ))
+            if piece:
+                yield piece
+    if gz:
+        yield gz.flush()
+
+
+def iter_export(stmt: Select, fmt: str, compress: bool = False, batch_rows: int = BATCH_ROWS) -> Iterator[bytes]:
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_rows))
+        yield from iter_encoded(list(result.keys()), result.partitions(), fmt, compress)
+    finally:
+        db.close()
+
+
+def _response(body: Iterator[bytes], basename: str, fmt: str, compress: bool) -> StreamingResponse:
+    media = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    filename = f"{basename}.{fmt}"
+    if compress:
+        media = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(
+        body,
+        media_type=media,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def export_response(stmt: Select, basename: str, fmt: str, compress: bool) -> StreamingResponse:
+    return _response(iter_export(stmt, fmt, compress), basename, fmt, compress)
+
+
+def rows_response(columns: list[str], partitions: Iterable[Sequence[Sequence]], basename: str,
+                  fmt: str, compress: bool) -> StreamingResponse:
+    """Like export_response, for rows produced in Python rather than by one SELECT."""
+    return _response(iter_encoded(columns, partitions, fmt, compress), basename, fmt, compress)
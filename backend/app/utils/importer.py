@@ -0,0 +1,191 @@
+# app/utils/importer.py
+"""
+Streaming bulk item import (used by POST /items/import and
+`python -m app.scripts.import_items`).
+
+Rows are parsed one line at a time from a binary file object, validated
+against schemas.ItemCreate, given codes by a per-import CodeBlockAllocator
+and inserted in chunks with a single executemany INSERT per chunk (which
+SQLAlchemy batches into multi-row INSERT ... VALUES on Postgres). Nothing
+but the current chunk and the capped error list is held in memory.
+"""
+import codecs
+import csv
+import json
+from typing import BinaryIO, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import crud, models, schemas
+from app.utils import catalog
+from app.utils.codes import CodeBlockAllocator, claim_item_codes
+
+FORMATS = ("csv", "ndjson")
+CODE_RETRIES = 3  # fresh codes tried for a row whose code was taken concurrently
+
+
+def iter_rows(fileobj: BinaryIO, fmt: str) -> Iterator[tuple[int, dict | str]]:
+    """
+    Yields (line_no, row_dict) per record, or (line_no, error_message) for a
+    line that could not be parsed. CSV needs a header row (code,name,quantity,category_id).
+    """
+    text = codecs.getreader("utf-8-sig")(fileobj)
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            if not any((v or "").strip() for v in row.values() if isinstance(v, str)):
+                continue
+            yield reader.line_num, {k.strip(): (v.strip() if isinstance(v, str) else v)
+                                    for k, v in row.items() if k}
+    elif fmt == "ndjson":
+        for n, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                yield n, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(obj, dict):
+                yield n, "Expected a JSON object"
+                continue
+            yield n, obj
+    else:
+        raise ValueError(f"Unsupported format '{fmt}', expected one of {FORMATS}")
+
+
+def _validate(row: dict) -> schemas.ItemCreate:
+    row = {k: (None if v == "" else v) for k, v in row.items()}
+    return schemas.ItemCreate.model_validate(row)
+
+
+class _Report:
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.received = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+
+    def fail(self, line: int, error: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def import_items(
+    db: Session,
+    rows: Iterator[tuple[int, dict | str]],
+    chunk_size: int = 1000,
+    max_errors: int = 500,
+) -> dict:
+    """
+    Consumes iter_rows() output and inserts valid rows chunk by chunk
+    (one commit per chunk). Returns a report with counts and the first
+    `max_errors` per-row errors ({line, error}).
+    """
+    report = _Report(max_errors)
+    categories = {c.id: c for c in db.execute(select(models.Category)).scalars().all()}
+    alloc = CodeBlockAllocator(db)
+    chunk: list[tuple[int, str, bool, dict]] = []  # line, category code, code claimed, values
+
+    for line, row in rows:
+        report.received += 1
+        if isinstance(row, str):
+            report.fail(line, row)
+            continue
+        try:
+            item = _validate(row)
+        except ValidationError as e:
+            report.fail(line, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+            ))
+            continue
+
+        cat = categories.get(item.category_id) if item.category_id else None
+        if not cat:
+            report.fail(line, "category_id is required and must reference an existing category")
+            continue
+        if not cat.code:
+            report.fail(line, "Category must have a code")
+            continue
+
+        # same policy as POST /items/: a custom code that is taken or off-scheme is replaced
+        code = (item.code or "").strip()
+        claimed = bool(code) and alloc.claim(cat.code, code)
+        if not claimed:
+            code = alloc.allocate(cat.code)
+
+        chunk.append((line, cat.code, claimed, {"code": code, "name": item.name, "quantity": item.quantity,
+                                                "category_id": item.category_id}))
+        if len(chunk) >= chunk_size:
+            _flush(db, alloc, chunk, report)
+            chunk = []
+
+    if chunk:
+        _flush(db, alloc, chunk, report)
+    alloc.release_unused()
+    return report.as_dict()
+
+
+def _bump_totals(db: Session, values: list[dict]) -> None:
+    per_cat: dict[int, list[int]] = {}
+    for v in values:
+        acc = per_cat.setdefault(v["category_id"], [0, 0])
+        acc[0] += v["quantity"] or 0
+        acc[1] += 1
+    for cid, (dq, dc) in per_cat.items():
+        crud._bump_category_totals(db, cid, dq, dc)
+
+
+def _code_taken(db: Session, code: str) -> bool:
+    return db.execute(select(models.Item.id).where(models.Item.code == code)).first() is not None
+
+
+def _flush(db: Session, alloc: CodeBlockAllocator, chunk: list[tuple[int, str, bool, dict]],
+           report: _Report) -> None:
+    values = [v for _, _, _, v in chunk]
+    claimed = [v["code"] for _, _, c, v in chunk if c]
+    try:
+        claim_item_codes(db, claimed)
+        db.execute(insert(models.Item), values)
+        _bump_totals(db, values)
+        catalog.bump(db)
+        db.commit()
+        report.inserted += len(values)
+        return
+    except IntegrityError:
+        db.rollback()
+
+    # something in the chunk collided (e.g. a code taken concurrently):
+    # retry row by row; a row whose code was taken since it was handed out
+    # gets a fresh one (same policy as a taken custom code), the rest fail
+    claim_item_codes(db, claimed)
+    for line, cat_code, _, v in chunk:
+        for attempt in range(CODE_RETRIES + 1):
+            try:
+                with db.begin_nested():
+                    db.execute(insert(models.Item), [v])
+                    _bump_totals(db, [v])
+                report.inserted += 1
+                break
+            except IntegrityError as e:
+                if attempt == CODE_RETRIES or not _code_taken(db, v["code"]):
+                    report.fail(line, f"Could not insert {v['code']}: {e.orig}")
+                    break
+                v["code"] = alloc.allocate(cat_code)
+    catalog.bump(db)
+    db.commit()
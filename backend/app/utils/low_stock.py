@@ -0,0 +1,127 @@
+# app/utils/low_stock.py
+"""
+Category low-stock alerts with persisted state (category_stock_alerts).
+
+evaluate() reads every category (or the given ones) with its item total and
+stored alert state in one GROUP BY over categories ⟕ items ⟕ alert state,
+classifies each as OK / LOW / CRITICAL and writes only the categories whose
+state changed. A change for the worse (OK -> LOW, OK/LOW -> CRITICAL) queues a
+category low-stock email; easing back is recorded without one. So a category
+that stays low is reported once, however many decrements follow.
+
+- called with the touched category ids from each item write's notify callback
+  (in the write's transaction, commit=False) or after a category write (one
+  query, whatever the number of items), by the email worker for everything
+  every LOW_STOCK_EVAL_SECONDS (catching writes made behind the API, e.g.
+  imports), and on demand via POST /categories/low-stock/evaluate
+- hysteresis: see LOW_STOCK_HYSTERESIS in config
+- concurrent evaluators: a state change is an upsert conditional on the state
+  that was read, and the email is queued in the same transaction, so only the
+  evaluator whose write took effect notifies
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app import config, models
+from app.utils import email as email_utils
+from app.utils.schema import dialect_insert
+
+OK, LOW, CRITICAL = "OK", "LOW", "CRITICAL"
+_RANK = {OK: 0, LOW: 1, CRITICAL: 2}
+
+
+def classify(total: int, buffer: int, prev: str = OK) -> str:
+    if buffer <= 0:
+        return OK
+    margin = buffer * config.LOW_STOCK_HYSTERESIS
+    critical_below = buffer * config.LOW_STOCK_CRITICAL_RATIO
+    if total < critical_below or (prev == CRITICAL and total < critical_below + margin):
+        return CRITICAL
+    if total < buffer or (prev != OK and total < buffer + margin):
+        return LOW
+    return OK
+
+
+def _rows(db: Session, category_ids: list[int] | None):
+    C, I, S = models.Category, models.Item, models.CategoryStockAlert
+    stmt = (
+        select(C.id, C.code, C.name, C.buffer, func.coalesce(func.sum(I.quantity), 0), S.state)
+        .outerjoin(I, I.category_id == C.id)
+        .outerjoin(S, S.category_id == C.id)
+        .group_by(C.id, C.code, C.name, C.buffer, S.state)
+    )
+    if category_ids is not None:
+        stmt = stmt.where(C.id.in_(category_ids))
+    return db.execute(stmt).all()
+
+
+def evaluate(db: Session, category_ids=None, commit: bool = True) -> dict:
+    """
+    Re-evaluate all categories (category_ids None) or the given ones and
+    notify on changes for the worse. Commits unless commit=False (the caller's
+    transaction then carries the state changes and their emails). Returns a
+    summary with the state changes that took effect.
+    """
+    if category_ids is not None:
+        category_ids = sorted({c for c in category_ids if c is not None})
+        if not category_ids:
+            return {"evaluated": 0, "changes": []}
+    S = models.CategoryStockAlert
+    db.flush()  # totals must include the caller's pending item writes (autoflush is off)
+    rows = _rows(db, category_ids)
+    changes = []
+    for cid, code, name, buffer, total, prev in rows:
+        prev = prev or OK
+        buffer, total = int(buffer or 0), int(total)
+        state = classify(total, buffer, prev)
+        if state == prev:
+            continue
+        now = datetime.now(timezone.utc)
+        worse = _RANK[state] > _RANK[prev]
+        values = {"category_id": cid, "state": state, "total_quantity": total, "buffer": buffer,
+                  "changed_at": now, "last_notified_at": now if worse else None}
+        ins = dialect_insert(db, S).values(**values)
+        took = db.execute(
+            ins.on_conflict_do_update(
+                index_elements=["category_id"],
+                set_={k: v for k, v in values.items() if k != "category_id" and (worse or k != "last_notified_at")},
+                # lost the race if another evaluator moved the state since we read it
+                where=S.state == prev,
+            ).returning(S.category_id)
+        ).first()
+        if took is None:
+            continue
+        if worse:
+            # queued in the same transaction as the state change, so both commit or neither does
+            email_utils.send_category_low_stock(
+                category_code=code or "",
+                category_name=name,
+                total_qty=total,
+                buffer=buffer,
+                critical=state == CRITICAL,
+                db=db,
+            )
+        changes.append({"category_id": cid, "code": code, "name": name, "from_state": prev,
+                        "to_state": state, "total_quantity": total, "buffer": buffer, "notified": worse})
+    if commit:
+        db.commit()
+    return {"evaluated": len(rows), "changes": changes}
+
+
+def states(db: Session) -> list:
+    """Categories not OK, worst first."""
+    C, S = models.Category, models.CategoryStockAlert
+    rows = db.execute(
+        select(S.category_id, C.code, C.name, S.state, S.total_quantity, S.buffer, S.changed_at, S.last_notified_at)
+        .join(C, C.id == S.category_id)
+        .where(S.state != OK)
+    ).all()
+    return sorted(rows, key=lambda r: (-_RANK[r.state], r.name))
+
+
+def forget(db: Session, category_id: int) -> None:
+    """Drop the state of a deleted category (call before commit)."""
+    S = models.CategoryStockAlert
+    db.execute(delete(S).where(S.category_id == category_id).execution_options(synchronize_session=False))
@@ -0,0 +1,125 @@
+# app/utils/outbox.py
+"""
+Durable email outbox (email_outbox table).
+
+Request handlers never talk to SMTP: email.send_email(), and every template
+built on it, resolves the recipients and calls enqueue(), which adds a row to
+the caller's transaction: the email exists only if the write it reports on
+commits (the crud write functions take a notify callback for this). The
+worker process (python -m app.scripts.email_worker) delivers
+the rows:
+
+- claim(): one UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED)
+  RETURNING takes up to EMAIL_OUTBOX_BATCH due rows and leases them for
+  EMAIL_OUTBOX_LEASE_SECONDS, so concurrent workers never take the same row
+  (PostgreSQL; SQLite has no row locks but runs the UPDATE alone, to the same
+  effect). A row whose lease ran out (its worker died) is due again, so
+  delivery is at-least-once.
+- mark_sent() / mark_failed(): a failed row is retried after an exponential
+  backoff with jitter; after EMAIL_OUTBOX_MAX_ATTEMPTS, or on a permanent
+  failure, it is parked as "dead" with its last error.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app import config, models
+
+PENDING, SENDING, SENT, DEAD = "pending", "sending", "sent", "dead"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue(db: Session, kind: str, subject: str, html_body: str, recipients: list[str]) -> None:
+    """Queue one email in the caller's transaction (no commit: it goes out with the write it reports on)."""
+    db.add(models.EmailOutbox(
+        kind=kind, subject=subject, html_body=html_body, recipients=", ".join(recipients),
+        status=PENDING, attempts=0, next_attempt_at=_now(),
+    ))
+
+
+def claim(db: Session, limit: int, lease_seconds: float) -> list:
+    """
+    Lease up to `limit` due rows to the caller and commit. Returns rows of
+    (id, kind, subject, html_body, recipients, attempts), attempts counting this one.
+    """
+    O = models.EmailOutbox
+    now = _now()
+    due = or_(
+        and_(O.status == PENDING, O.next_attempt_at <= now),
+        and_(O.status == SENDING, O.locked_until <= now),  # lease of a dead worker ran out
+    )
+    ids = select(O.id).where(due).order_by(O.id).limit(limit).with_for_update(skip_locked=True)
+    rows = db.execute(
+        update(O)
+        .where(O.id.in_(ids))
+        .values(status=SENDING, locked_until=now + timedelta(seconds=lease_seconds), attempts=O.attempts + 1)
+        .returning(O.id, O.kind, O.subject, O.html_body, O.recipients, O.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted(rows, key=lambda r: r.id)
+
+
+def mark_sent(db: Session, outbox_id: int) -> None:
+    O = models.EmailOutbox
+    db.execute(
+        update(O).where(O.id == outbox_id, O.status == SENDING)
+        .values(status=SENT, sent_at=_now(), locked_until=None, last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before retry number `attempts` + 1: doubling from the base, capped, with jitter."""
+    delay = min(
+        config.EMAIL_OUTBOX_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0),
+        config.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS,
+    )
+    # spread retries so a relay outage does not end in a synchronized burst
+    return delay * random.uniform(0.5, 1.0)
+
+
+def mark_failed(db: Session, outbox_id: int, attempts: int, error: str, permanent: bool = False) -> bool:
+    """Schedule a retry, or park the row as dead. Returns True if it was parked."""
+    O = models.EmailOutbox
+    dead = permanent or attempts >= config.EMAIL_OUTBOX_MAX_ATTEMPTS
+    values = {"status": DEAD} if dead else {
+        "status": PENDING,
+        "next_attempt_at": _now() + timedelta(seconds=backoff_seconds(attempts)),
+    }
+    db.execute(
+        update(O).where(O.id == outbox_id, O.status == SENDING)
+        .values(locked_until=None, last_error=error[:2000], **values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return dead
+
+
+def prune(db: Session, keep_days: int) -> int:
+    """Delete sent rows older than keep_days; returns how many."""
+    O = models.EmailOutbox
+    n = db.execute(
+        delete(O).where(O.status == SENT, O.sent_at < _now() - timedelta(days=keep_days))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return n
+
+
+def stats(db: Session) -> dict:
+    O = models.EmailOutbox
+    counts = dict(db.execute(select(O.status, func.count()).group_by(O.status)).all())
+    oldest = db.execute(select(func.min(O.created_at)).where(O.status.in_((PENDING, SENDING)))).scalar()
+    if oldest is not None and oldest.tzinfo is None:
+        oldest = oldest.replace(tzinfo=timezone.utc)  # SQLite hands back naive UTC
+    return {
+        **{s: counts.get(s, 0) for s in (PENDING, SENDING, SENT, DEAD)},
+        "oldest_unsent_age_seconds": round((_now() - oldest).total_seconds(), 1) if oldest else None,
+    }
@@ -0,0 +1,91 @@
+# app/utils/password_pool.py
+"""
+A dedicated, size-limited thread pool for bcrypt.
+
+bcrypt is deliberately slow (~250 ms at cost 12). Run inside a sync endpoint it
+holds one of the threads FastAPI shares between all sync endpoints, so a few
+hundred simultaneous logins leave item reads waiting for a free thread.
+Async endpoints hand the work to this pool instead:
+
+- PASSWORD_HASH_WORKERS threads do the hashing, nothing else competes for them
+- at most PASSWORD_HASH_MAX_QUEUE calls wait for a thread; past that run()
+  raises PasswordPoolBusy at once (the router answers 503 + Retry-After)
+  rather than letting a queue build up whose tail would time out anyway
+
+Login verifies through it (routers/auth.py); account creation and password
+changes hash through it via hash_or_503(). The counters are served at
+GET /admin/metrics/password-pool.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException, status
+
+from app import config
+from app.security import hash_password, verify_and_update_password
+
+T = TypeVar("T")
+
+
+class PasswordPoolBusy(Exception):
+    """Every worker is busy and the wait queue is full."""
+
+
+class PasswordPool:
+    def __init__(self, workers: int = 4, max_queue: int = 64):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # only touched from the event loop thread, so plain ints are enough
+        self._pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def check(self) -> None:
+        """Raise PasswordPoolBusy now if a new call would be turned away."""
+        if self._pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordPoolBusy()
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        self.check()
+        self._pending += 1
+        self.peak_pending = max(self.peak_pending, self._pending)
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            self._pending -= 1
+            self.completed += 1
+
+    async def verify_and_update(self, plain: str, hashed: str) -> tuple[bool, str | None]:
+        return await self.run(verify_and_update_password, plain, hashed)
+
+    async def hash(self, plain: str) -> str:
+        return await self.run(hash_password, plain)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_pool = PasswordPool(config.PASSWORD_HASH_WORKERS, config.PASSWORD_HASH_MAX_QUEUE)
+
+
+async def hash_or_503(plain: str) -> str:
+    """password_pool.hash() for endpoints: a full pool answers 503 + Retry-After, as login does."""
+    try:
+        return await password_pool.hash(plain)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
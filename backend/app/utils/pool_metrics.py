@@ -0,0 +1,139 @@
+# app/utils/pool_metrics.py
+"""
+Connection pool metrics for GET /admin/metrics/pool.
+
+Per engine (database.engine, database.async_engine and the replica engines
+when DATABASE_READ_URL is set), collected with
+SQLAlchemy pool/engine events:
+
+- connects, checkouts, checkins, invalidations (hard and soft)
+- pre-ping failures (handle_error with is_pre_ping: a pooled connection was
+  found dead at checkout and replaced)
+- checkout wait time: how long getting a connection from the pool took,
+  as a histogram in WAIT_BUCKETS_MS, plus the number of pool timeouts.
+  There is no event for "started waiting", so this one comes from timed_pool(),
+  a subclass of the pool class that times _do_get.
+
+Live state (size, checked out, idle, overflow) is read from the pool itself
+at request time. Every number is per process: with several uvicorn workers,
+each answers for its own pools (the response carries the pid).
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool, QueuePool
+
+# upper bounds (ms) of the wait histogram buckets; the last bucket is "more than that"
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 30000)
+
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.pool: Pool | None = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.pre_ping_failures = 0
+        self.timeouts = 0
+        self._waits = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _inc(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def observe_wait(self, seconds: float) -> None:
+        ms = seconds * 1000
+        i = next((n for n, bound in enumerate(WAIT_BUCKETS_MS) if ms <= bound), len(WAIT_BUCKETS_MS))
+        with self._lock:
+            self._waits[i] += 1
+            self._wait_total += ms
+            self._wait_max = max(self._wait_max, ms)
+
+    def attach(self, engine: Engine) -> None:
+        """Listen on the engine's pool (and on the pools that replace it after dispose())."""
+        self.pool = engine.pool
+        event.listen(engine, "connect", lambda *a: self._inc("connects"))
+        event.listen(engine, "checkout", lambda *a: self._inc("checkouts"))
+        event.listen(engine, "checkin", lambda *a: self._inc("checkins"))
+        event.listen(engine, "invalidate", lambda *a: self._inc("invalidations"))
+        event.listen(engine, "soft_invalidate", lambda *a: self._inc("soft_invalidations"))
+        event.listen(engine, "handle_error", self._on_error)
+        event.listen(engine, "engine_disposed", lambda e: setattr(self, "pool", e.pool))
+
+    def _on_error(self, ctx) -> None:
+        if getattr(ctx, "is_pre_ping", False):
+            self._inc("pre_ping_failures")
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        live: dict = {"pool_class": type(pool).__name__ if pool is not None else None}
+        if isinstance(pool, QueuePool):
+            live.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                idle=pool.checkedin(),
+                # negative while the pool has not opened pool_size connections yet
+                overflow=pool.overflow(),
+                max_overflow=pool._max_overflow,
+                timeout_seconds=pool.timeout(),
+            )
+        with self._lock:
+            waited = sum(self._waits)
+            labels = [f"<={b}ms" for b in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                **live,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "soft_invalidations": self.soft_invalidations,
+                "pre_ping_failures": self.pre_ping_failures,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "count": waited,
+                    "avg": round(self._wait_total / waited, 3) if waited else None,
+                    "max": round(self._wait_max, 3),
+                    "histogram": dict(zip(labels, self._waits)),
+                },
+            }
+
+
+def timed_pool(poolclass: type[QueuePool], metrics: PoolMetrics) -> type[QueuePool]:
+    """poolclass whose checkouts feed metrics' wait histogram (kept across recreate())."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return poolclass._do_get(self)
+        except sa_exc.TimeoutError:
+            metrics._inc("timeouts")
+            raise
+        finally:
+            metrics.observe_wait(time.perf_counter() - t0)
+
+    return type(f"Timed{poolclass.__name__}", (poolclass,), {"_do_get": _do_get})
+
+
+sync_pool = PoolMetrics("sync")
+async_pool = PoolMetrics("async")
+# replica engines (DATABASE_READ_URL); only reported when configured
+read_pool = PoolMetrics("read")
+async_read_pool = PoolMetrics("read_async")
+
+
+def report() -> dict:
+    out = {"pid": os.getpid()}
+    for m in (sync_pool, async_pool, read_pool, async_read_pool):
+        if m.pool is not None:
+            out[m.name] = m.snapshot()
+    return out
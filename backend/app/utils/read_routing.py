@@ -0,0 +1,121 @@
+# app/utils/read_routing.py
+"""
+Which database a read endpoint talks to (database.get_read_db / get_async_read_db).
+
+With DATABASE_READ_URL unset there is no replica and every read session is a
+primary session. With it set, list/get endpoints read from the replica, except:
+
+- read-your-writes: StickyWritesMiddleware notes every client that sent a
+  POST/PUT/PATCH/DELETE (keyed by its Authorization header, else its address)
+  when the response starts; for READ_STICKY_SECONDS after that its reads stay
+  on the primary, so it does not read past its own write while the replica
+  catches up. The window is kept per process: with several workers, a client
+  is only sticky on the worker that served its write, so keep
+  READ_STICKY_SECONDS above the replica's usual lag rather than relying on it.
+- fallback: the read session checks out its connection before the endpoint
+  runs (pool_pre_ping validates it). If the replica cannot be reached, that
+  request and every read for the next READ_REPLICA_RETRY_SECONDS use the
+  primary. Errors after the checkout are not retried.
+
+Counters: GET /admin/metrics/read-routing.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from app import config
+
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def client_key(headers, client) -> str:
+    """Who a request belongs to: its bearer token if any, else the peer address."""
+    auth = headers.get("authorization")
+    if auth:
+        return auth
+    return client[0] if client else ""
+
+
+class ReadRouter:
+    def __init__(self, enabled: bool, sticky_seconds: float = 5.0, retry_seconds: float = 30.0):
+        self.enabled = enabled
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._lock = threading.Lock()
+        # client key -> monotonic time until which it reads from the primary (oldest first)
+        self._sticky: OrderedDict[str, float] = OrderedDict()
+        self._down_until = 0.0
+        self.replica_reads = 0
+        self.sticky_reads = 0
+        self.down_reads = 0
+        self.replica_failures = 0
+
+    def mark_write(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._sticky[key] = now + self.sticky_seconds
+            self._sticky.move_to_end(key)
+            while self._sticky and next(iter(self._sticky.values())) <= now:
+                self._sticky.popitem(last=False)
+
+    def use_replica(self, key: str) -> bool:
+        """True if this client's read may go to the replica (counted as such)."""
+        if not self.enabled:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if self._sticky.get(key, 0.0) > now:
+                self.sticky_reads += 1
+                return False
+            if self._down_until > now:
+                self.down_reads += 1
+                return False
+            self.replica_reads += 1
+            return True
+
+    def replica_failed(self) -> None:
+        """The replica could not be reached: use the primary for retry_seconds."""
+        with self._lock:
+            self.replica_failures += 1
+            self.replica_reads -= 1
+            self.down_reads += 1
+            self._down_until = time.monotonic() + self.retry_seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "replica_configured": self.enabled,
+                "replica_up": self._down_until <= now,
+                "sticky_seconds": self.sticky_seconds,
+                "sticky_clients": sum(1 for until in self._sticky.values() if until > now),
+                "replica_reads": self.replica_reads,
+                "primary_reads_sticky": self.sticky_reads,
+                "primary_reads_replica_down": self.down_reads,
+                "replica_failures": self.replica_failures,
+            }
+
+
+read_router = ReadRouter(bool(config.DATABASE_READ_URL), config.READ_STICKY_SECONDS, config.READ_REPLICA_RETRY_SECONDS)
+
+
+class StickyWritesMiddleware:
+    """ASGI middleware: a client whose unsafe request gets an answer reads from the primary for a while."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not read_router.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        key = client_key(headers, scope.get("client"))
+
+        async def send_marked(message):
+            # marked when the response starts, i.e. after the endpoint committed
+            if message["type"] == "http.response.start":
+                read_router.mark_write(key)
+            await send(message)
+
+        await self.app(scope, receive, send_marked)
@@ -0,0 +1,130 @@
+# app/utils/recipient_cache.py
+"""
+In-process cache of the default notification recipient set: EMAIL_TO_DEFAULT
+followed by the active email_recipients rows, de-duplicated in that order.
+Every email template resolves its recipients here (email.send_email).
+
+- owns its DB access: loads and version checks use a short session of their
+  own, so a sender never depends on the request session it was handed (which
+  get_db may already have closed)
+- write-through invalidation: routers/admin_recipients.py calls invalidate()
+  after each commit, so this worker is never stale
+- cross-worker coherence: those writes also bump the "recipients" counter in
+  catalog_versions; at most every RECIPIENT_CACHE_CHECK_SECONDS a lookup reads
+  it (one PK lookup) and reloads if it moved
+- if the DB cannot be read, the last loaded set keeps being served (only the
+  env defaults if there is none yet) and the next lookup tries again
+"""
+import logging
+import threading
+import time
+from typing import Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import config, models
+from app.database import SessionLocal
+from app.utils import catalog
+
+VERSION_NAME = "recipients"
+
+log = logging.getLogger(__name__)
+
+
+def parse_recipients(value: Optional[str | Sequence[str]]) -> list[str]:
+    """
+    Accepts None, a comma-separated string or a list/tuple of strings (each may
+    hold "a,b" too). Returns a deduped, trimmed list in order.
+    """
+    if not value:
+        return []
+    parts: list[str] = []
+    for v in [value] if isinstance(value, str) else value:
+        parts.extend((v or "").split(","))
+    return list(dict.fromkeys(e.strip() for e in parts if e.strip()))
+
+
+class RecipientCache:
+    def __init__(self, check_seconds: float = 5.0):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._recipients: tuple[str, ...] | None = None
+        self._version: int | None = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def _load(self) -> None:
+        """Check the shared version (when due) and reload the set if it moved or was invalidated."""
+        now = time.monotonic()
+        with self._lock:
+            if self._recipients is not None and now - self._checked_at < self.check_seconds:
+                self.hits += 1
+                return
+        try:
+            with SessionLocal() as db:
+                version = catalog.current(db, VERSION_NAME)
+                with self._lock:
+                    if self._recipients is not None and version == self._version:
+                        self._checked_at = now
+                        self.hits += 1
+                        return
+                R = models.EmailRecipient
+                emails = db.execute(select(R.email).where(R.active.is_(True)).order_by(R.id)).scalars().all()
+        except SQLAlchemyError as e:
+            with self._lock:
+                self.errors += 1
+                self._checked_at = now  # do not hammer a DB that is down: retry after check_seconds
+                if self._recipients is None:
+                    self.misses += 1
+                    self._recipients = tuple(parse_recipients(config.EMAIL_TO_DEFAULT))
+                else:
+                    self.hits += 1
+            log.warning("Could not load email recipients, using the last known set: %s", e)
+            return
+        recipients = tuple(parse_recipients([*parse_recipients(config.EMAIL_TO_DEFAULT), *emails]))
+        with self._lock:
+            self.misses += 1
+            self._recipients = recipients
+            self._version = version
+            self._checked_at = now
+
+    def resolve(self, extra_to: Optional[Sequence[str] | str] = None) -> list[str]:
+        """The cached set followed by extra_to (the caller's addresses), de-duplicated."""
+        self._load()
+        with self._lock:
+            recipients = self._recipients or ()
+        if not extra_to:
+            return list(recipients)
+        return parse_recipients([*recipients, *parse_recipients(extra_to)])
+
+    def invalidate(self) -> None:
+        """Drop the set after a recipient write in this process."""
+        with self._lock:
+            self.invalidations += 1
+            self._recipients = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._recipients) if self._recipients is not None else None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+                "errors": self.errors,
+                "version": self._version,
+            }
+
+
+recipient_cache = RecipientCache(config.RECIPIENT_CACHE_CHECK_SECONDS)
+
+
+def bump_version(db: Session) -> None:
+    """Call in the same transaction as a recipient write (before commit)."""
+    catalog.bump(db, VERSION_NAME)
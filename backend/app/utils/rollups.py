@@ -0,0 +1,182 @@
+# app/utils/rollups.py
+"""
+Daily stock-movement rollups: daily_item_movement and daily_category_movement
+hold qty_in / qty_out / net / tx_count per item (resp. category) per day.
+
+refresh() folds ledger rows above the watermark (rollup_watermarks) into both
+tables with additive upserts, one window of ids per DB transaction. The
+watermark is advanced with a compare-and-set at the start of each window, so
+two refreshes running at once never count the same rows twice: the loser
+updates nothing, rolls back and stops. Rows younger than
+config.ROLLUP_SAFETY_LAG_SECONDS are left for the next run.
+
+Reads (series()) touch one rollup row per day, however busy the ledger is.
+History: `python -m app.scripts.backfill_rollups [--rebuild]`.
+"""
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import Date, case, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app import config, models
+from app.crud import _ts_param
+from app.utils.schema import dialect_insert
+
+WATERMARK = "daily_movement"
+BATCH = 10_000
+_VALUES = ("qty_in", "qty_out", "net", "tx_count")
+
+
+def _upsert_add(db: Session, model, keys: tuple[str, ...], rows: list[dict]) -> None:
+    """INSERT the rows; on a key collision add their values onto the stored ones."""
+    if not rows:
+        return
+    stmt = dialect_insert(db, model)
+    table = model.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={c: table.c[c] + stmt.excluded[c] for c in _VALUES},
+    )
+    db.execute(stmt, rows)
+
+
+def watermark(db: Session) -> int:
+    W = models.RollupWatermark
+    wm = db.execute(select(W.last_tx_id).where(W.name == WATERMARK)).scalar()
+    if wm is not None:
+        return wm
+    db.execute(
+        dialect_insert(db, W).on_conflict_do_nothing(),
+        [{"name": WATERMARK, "last_tx_id": 0}],
+    )
+    db.commit()
+    return db.execute(select(W.last_tx_id).where(W.name == WATERMARK)).scalar_one()
+
+
+def _fold_window(db: Session, lo: int, hi: int) -> int:
+    """Aggregate ledger ids lo < id <= hi by item and day and add them in."""
+    T, I = models.Transaction, models.Item
+    day = func.date(T.created_at, type_=Date)
+    rows = db.execute(
+        select(
+            T.item_id,
+            I.category_id,
+            day.label("day"),
+            func.sum(case((T.qty_change > 0, T.qty_change), else_=0)),
+            func.sum(case((T.qty_change < 0, -T.qty_change), else_=0)),
+            func.sum(T.qty_change),
+            func.count(),
+        )
+        .join(I, I.id == T.item_id)
+        .where(T.id > lo, T.id <= hi)
+        .group_by(T.item_id, I.category_id, day)
+    ).all()
+
+    item_rows = []
+    per_cat: dict[tuple[int, date], list[int]] = {}
+    for item_id, cat_id, d, q_in, q_out, net, n in rows:
+        item_rows.append({"item_id": item_id, "day": d, "category_id": cat_id,
+                          "qty_in": q_in, "qty_out": q_out, "net": net, "tx_count": n})
+        acc = per_cat.setdefault((cat_id, d), [0, 0, 0, 0])
+        acc[0] += q_in
+        acc[1] += q_out
+        acc[2] += net
+        acc[3] += n
+
+    _upsert_add(db, models.DailyItemMovement, ("item_id", "day"), item_rows)
+    _upsert_add(db, models.DailyCategoryMovement, ("category_id", "day"), [
+        {"category_id": cid, "day": d, **dict(zip(_VALUES, acc))}
+        for (cid, d), acc in per_cat.items()
+    ])
+    return sum(r["tx_count"] for r in item_rows)
+
+
+def refresh(db: Session, max_rows: int | None = None, batch: int = BATCH) -> int:
+    """
+    Catch the rollups up with the ledger. Returns how many ledger rows were
+    folded in (at most max_rows, if given).
+    """
+    T, W = models.Transaction, models.RollupWatermark
+    wm = watermark(db)
+    cutoff = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(
+        seconds=config.ROLLUP_SAFETY_LAG_SECONDS
+    )
+    # stop in front of the first row that is still inside the safety lag
+    stop = db.execute(
+        select(func.min(T.id)).where(T.id > wm, T.created_at >= _ts_param(db, cutoff))
+    ).scalar()
+
+    done = 0
+    while max_rows is None or done < max_rows:
+        take = batch if max_rows is None else min(batch, max_rows - done)
+        window = select(T.id).where(T.id > wm).order_by(T.id).limit(take)
+        if stop is not None:
+            window = window.where(T.id < stop)
+        window = window.subquery()
+        hi = db.execute(select(func.max(window.c.id))).scalar()
+        if hi is None:
+            break
+
+        claimed = db.execute(
+            update(W)
+            .where(W.name == WATERMARK, W.last_tx_id == wm)
+            .values(last_tx_id=hi)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            # another refresh got there first
+            db.rollback()
+            break
+        done += _fold_window(db, wm, hi)
+        db.commit()
+        wm = hi
+    return done
+
+
+def rebuild(db: Session) -> None:
+    """Empty both rollup tables and rewind the watermark (refresh() then backfills)."""
+    db.execute(delete(models.DailyItemMovement))
+    db.execute(delete(models.DailyCategoryMovement))
+    db.execute(delete(models.RollupWatermark).where(models.RollupWatermark.name == WATERMARK))
+    db.commit()
+
+
+def series(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    *,
+    item_id: int | None = None,
+    category_id: int | None = None,
+    granularity: str = "day",
+) -> list[dict]:
+    """
+    Movement per day (or per ISO week, keyed by its Monday) over
+    date_from..date_to inclusive, zero-filled. Scope: one item, one category,
+    or everything when neither id is given.
+    """
+    if item_id is not None:
+        M = models.DailyItemMovement
+        stmt = select(M.day, M.qty_in, M.qty_out, M.net, M.tx_count).where(M.item_id == item_id)
+    else:
+        M = models.DailyCategoryMovement
+        stmt = select(M.day, func.sum(M.qty_in), func.sum(M.qty_out), func.sum(M.net), func.sum(M.tx_count))
+        if category_id is not None:
+            stmt = stmt.where(M.category_id == category_id)
+        stmt = stmt.group_by(M.day)
+    rows = db.execute(stmt.where(M.day >= date_from, M.day <= date_to)).all()
+
+    def bucket(d: date) -> date:
+        return d - timedelta(days=d.weekday()) if granularity == "week" else d
+
+    points: dict[date, list[int]] = {}
+    d = bucket(date_from)
+    step = timedelta(days=7 if granularity == "week" else 1)
+    while d <= date_to:
+        points[d] = [0, 0, 0, 0]
+        d += step
+    for day, *vals in rows:
+        acc = points[bucket(day)]
+        for i, v in enumerate(vals):
+            acc[i] += int(v or 0)
+    return [{"day": d, **dict(zip(_VALUES, acc))} for d, acc in points.items()]
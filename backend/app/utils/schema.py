@@ -0,0 +1,60 @@
+# app/utils/schema.py
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+
+
+def dialect_insert(db: Session, model):
+    """INSERT into model with the postgresql or sqlite insert() of db's bind, for ON CONFLICT upserts."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"INSERT ... ON CONFLICT needs postgresql or sqlite, not {dialect}")
+    return insert(model)
+
+
+def ensure_columns(engine: Engine, model) -> list[str]:
+    """
+    create_all() never alters existing tables, so columns added to a model
+    after the table was first created are missing on old databases.
+    Adds them with ALTER TABLE ... ADD COLUMN (using the column's
+    server_default) and returns the names that were added.
+    """
+    table = model.__table__
+    insp = inspect(engine)
+    if not insp.has_table(table.name):
+        return []
+    existing = {c["name"] for c in insp.get_columns(table.name)}
+    added: list[str] = []
+    with engine.begin() as conn:
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            ddl = CreateColumn(col).compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            added.append(col.name)
+    return added
+
+
+def ensure_indexes(engine: Engine, model) -> list[str]:
+    """
+    Same story for indexes declared on a model (e.g. in __table_args__):
+    creates the ones an existing table lacks and returns their names.
+    """
+    table = model.__table__
+    insp = inspect(engine)
+    if not insp.has_table(table.name):
+        return []
+    existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+    added: list[str] = []
+    with engine.begin() as conn:
+        for ix in table.indexes:
+            if ix.name in existing:
+                continue
+            ix.create(conn)
+            added.append(ix.name)
+    return added
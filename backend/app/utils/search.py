@@ -0,0 +1,169 @@
+# app/utils/search.py
+"""
+Indexed item search behind GET /items?q=.
+
+- PostgreSQL: pg_trgm GIN indexes on lower(code) / lower(name), so the
+  '%q%' LIKE is served by the index and similarity() is available for ranking.
+- SQLite: an FTS5 shadow table (trigram tokenizer) kept in sync with `items`
+  by triggers; queries of 3+ chars go through MATCH.
+- Anything else (or if the index could not be created) falls back to LIKE.
+
+Results are ranked by an integer score (lower is better):
+    bucket * 1000 + dissimilarity
+where bucket is 0 = exact code, 1 = code prefix, 2 = name prefix, 3 = substring,
+and dissimilarity (0..1000) orders hits within a bucket. The score is an int
+so it can be carried in a keyset cursor as (score, id).
+"""
+import logging
+
+from sqlalchemy import case, column, func, literal, or_, select, table, text, cast, Integer
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import models
+
+log = logging.getLogger(__name__)
+
+# databases (see _db_key) on which the dialect-specific index was created successfully
+_trgm_ready: set[str] = set()
+_fts_ready: set[str] = set()
+
+
+def _db_key(engine: Engine) -> str:
+    # the URL without its driver, so the sync and the async engine of one database match
+    return str(engine.url.set(drivername=engine.dialect.name))
+
+_items_fts = table("items_fts", column("rowid"), column("items_fts"))
+
+_PG_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_items_code_trgm ON items USING gin (lower(code) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_items_name_trgm ON items USING gin (lower(name) gin_trgm_ops)",
+]
+
+_SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+         code, name, content='items', content_rowid='id', tokenize='trigram'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_ai AFTER INSERT ON items BEGIN
+         INSERT INTO items_fts(rowid, code, name) VALUES (new.id, new.code, new.name);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_ad AFTER DELETE ON items BEGIN
+         INSERT INTO items_fts(items_fts, rowid, code, name) VALUES ('delete', old.id, old.code, old.name);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS items_fts_au AFTER UPDATE OF code, name ON items BEGIN
+         INSERT INTO items_fts(items_fts, rowid, code, name) VALUES ('delete', old.id, old.code, old.name);
+         INSERT INTO items_fts(rowid, code, name) VALUES (new.id, new.code, new.name);
+       END""",
+]
+
+
+def ensure_search_indexes(engine: Engine) -> None:
+    """
+    Idempotent migration for the search indexes. Safe to run on every start
+    (main.py does, right after create_all); also available as
+    `python -m app.scripts.migrate_search`.
+    """
+    key = _db_key(engine)
+    dialect = engine.dialect.name
+    try:
+        if dialect == "postgresql":
+            with engine.begin() as conn:
+                for ddl in _PG_DDL:
+                    conn.execute(text(ddl))
+            _trgm_ready.add(key)
+        elif dialect == "sqlite":
+            with engine.begin() as conn:
+                existed = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='items_fts'")
+                ).first()
+                for ddl in _SQLITE_DDL:
+                    conn.execute(text(ddl))
+                if not existed:
+                    # backfill rows that predate the shadow table
+                    conn.execute(text("INSERT INTO items_fts(items_fts) VALUES ('rebuild')"))
+            _fts_ready.add(key)
+    except DBAPIError as e:
+        # e.g. no permission for CREATE EXTENSION, or SQLite built without FTS5/trigram
+        log.warning("Item search index unavailable on %s, falling back to LIKE: %s", dialect, e)
+
+
+def detect_search_indexes(engine: Engine) -> None:
+    """
+    Read-only counterpart of ensure_search_indexes for a database we must not
+    run DDL on (the read replica): use its indexes if replication brought them.
+    """
+    key = _db_key(engine)
+    dialect = engine.dialect.name
+    try:
+        with engine.connect() as conn:
+            if dialect == "postgresql":
+                found = conn.execute(text(
+                    "SELECT count(*) FROM pg_indexes WHERE tablename = 'items' "
+                    "AND indexname IN ('ix_items_code_trgm', 'ix_items_name_trgm')"
+                )).scalar()
+                if found == 2:
+                    _trgm_ready.add(key)
+            elif dialect == "sqlite":
+                if conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type='table' AND name='items_fts'")
+                ).first():
+                    _fts_ready.add(key)
+    except DBAPIError as e:
+        # replica down at startup: LIKE until the next restart
+        log.warning("Could not inspect search indexes on the read replica (%s): %s", dialect, e)
+
+
+def search_backend(engine: Engine) -> str:
+    key = _db_key(engine)
+    if key in _trgm_ready:
+        return "pg_trgm"
+    if key in _fts_ready:
+        return "fts5"
+    return "like"
+
+
+def _like_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def item_search(db: Session, q: str):
+    """
+    Returns (where_clause, score_expr) for matching items against q.
+    Works with an AsyncSession too (only the bind is inspected).
+    """
+    q = q.strip().lower()
+    key = _db_key(db.get_bind())
+    dialect = db.get_bind().dialect.name
+
+    code = func.lower(models.Item.code)
+    name = func.lower(models.Item.name)
+    esc = _like_escape(q)
+    contains = f"%{esc}%"
+    prefix = f"{esc}%"
+
+    if dialect == "sqlite" and key in _fts_ready and len(q) >= 3:
+        phrase = '"' + q.replace('"', '""') + '"'
+        where = models.Item.id.in_(
+            select(_items_fts.c.rowid).where(_items_fts.c.items_fts.match(phrase))
+        )
+    else:
+        where = or_(code.like(contains, escape="\\"), name.like(contains, escape="\\"))
+
+    bucket = case(
+        (code == q, 0),
+        (code.like(prefix, escape="\\"), 1),
+        (name.like(prefix, escape="\\"), 2),
+        else_=3,
+    )
+
+    if dialect == "postgresql" and key in _trgm_ready:
+        sim = func.greatest(func.similarity(code, q), func.similarity(name, q))
+        dissim = cast(func.round(1000 - 1000 * sim), Integer)
+    else:
+        # substring hit: the shorter the name, the larger the share q covers
+        longest = case((func.length(name) > len(q), func.length(name)), else_=max(len(q), 1))
+        dissim = literal(1000) - (1000 * len(q)) // longest
+
+    return where, bucket * 1000 + dissim
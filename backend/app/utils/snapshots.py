@@ -0,0 +1,133 @@
+# app/utils/snapshots.py
+"""
+Stock snapshots and point-in-time inventory ("stock as of T").
+
+A snapshot copies (item_id, code, category_id, quantity) of every item with one
+INSERT ... SELECT and records the ledger position it reflects (last_tx_id).
+Quantity at T is then:
+
+- items in the latest snapshot taken at or before T:
+      snapshot quantity + sum(qty_change of ledger rows after the snapshot with created_at <= T)
+- items created after that snapshot (or everything, if there is none yet):
+      current quantity - sum(qty_change with created_at > T)
+
+so only the ledger delta between the snapshot and T is read. Snapshot rows of
+items deleted by T (models.ItemDeletion) are left out; items deleted after T
+are reported from the snapshot (their later ledger rows are gone with them).
+Snapshots are taken by `python -m app.scripts.take_snapshot` (cron) or
+POST /inventory/snapshots.
+"""
+from datetime import datetime
+
+from sqlalchemy import Select, and_, delete, exists, func, insert, literal, select, text, union_all
+from sqlalchemy.orm import Session
+
+from app import models
+from app.crud import _ts_param
+
+
+def take_snapshot(db: Session, kind: str = "periodic") -> models.StockSnapshot:
+    T, I, R = models.Transaction, models.Item, models.StockSnapshotRow
+    if db.get_bind().dialect.name == "postgresql":
+        # wait for in-flight item/ledger writes and hold new ones off for the copy,
+        # so quantities and last_tx_id describe the same moment
+        db.execute(text("LOCK TABLE items, transactions IN SHARE MODE"))
+    last = db.execute(select(func.coalesce(func.max(T.id), 0))).scalar_one()
+    snap = models.StockSnapshot(last_tx_id=last, kind=kind)
+    db.add(snap)
+    db.flush()
+    snap.item_count = db.execute(
+        insert(R).from_select(
+            ["snapshot_id", "item_id", "code", "category_id", "quantity"],
+            select(literal(snap.id), I.id, I.code, I.category_id, I.quantity),
+        )
+    ).rowcount
+    db.commit()
+    db.refresh(snap)
+    return snap
+
+
+def latest_snapshot(db: Session, ts: datetime) -> models.StockSnapshot | None:
+    S = models.StockSnapshot
+    return db.execute(
+        select(S).where(S.taken_at <= _ts_param(db, ts))
+        .order_by(S.taken_at.desc(), S.id.desc()).limit(1)
+    ).scalars().first()
+
+
+def as_of_stmt(
+    db: Session,
+    ts: datetime,
+    item_id: int | None = None,
+    category_id: int | None = None,
+) -> tuple[Select, models.StockSnapshot | None]:
+    """
+    SELECT item_id, code, category_id, quantity as of ts (ordered by item_id),
+    plus the snapshot it starts from. The statement can be executed directly
+    or streamed with app.utils.export.
+    """
+    T, I, R, D = models.Transaction, models.Item, models.StockSnapshotRow, models.ItemDeletion
+    t = _ts_param(db, ts)
+    snap = latest_snapshot(db, ts)
+    parts = []
+
+    live_where = [I.created_at <= t]
+    later = [T.created_at > t]
+    if snap is not None:
+        delta = (
+            select(T.item_id, func.sum(T.qty_change).label("d"))
+            .where(T.id > snap.last_tx_id, T.created_at <= t)
+            .group_by(T.item_id)
+            .subquery()
+        )
+        from_snap = (
+            select(
+                R.item_id, R.code, R.category_id,
+                (R.quantity + func.coalesce(delta.c.d, 0)).label("quantity"),
+            )
+            .outerjoin(delta, delta.c.item_id == R.item_id)
+            .where(R.snapshot_id == snap.id)
+            # deleted between the snapshot and ts (>=: same-second deletes on SQLite)
+            .where(~exists().where(and_(
+                D.item_id == R.item_id, D.deleted_at >= _ts_param(db, snap.taken_at), D.deleted_at <= t,
+            )))
+        )
+        if item_id is not None:
+            from_snap = from_snap.where(R.item_id == item_id)
+        if category_id is not None:
+            from_snap = from_snap.where(R.category_id == category_id)
+        parts.append(from_snap)
+
+        live_where.append(~exists().where(and_(R.snapshot_id == snap.id, R.item_id == I.id)))
+        later.append(T.id > snap.last_tx_id)
+
+    after = select(T.item_id, func.sum(T.qty_change).label("d")).where(*later).group_by(T.item_id).subquery()
+    from_live = (
+        select(
+            I.id.label("item_id"), I.code, I.category_id,
+            (I.quantity - func.coalesce(after.c.d, 0)).label("quantity"),
+        )
+        .outerjoin(after, after.c.item_id == I.id)
+        .where(*live_where)
+    )
+    if item_id is not None:
+        from_live = from_live.where(I.id == item_id)
+    if category_id is not None:
+        from_live = from_live.where(I.category_id == category_id)
+    parts.append(from_live)
+
+    u = (union_all(*parts) if len(parts) > 1 else parts[0]).subquery()
+    return select(u).order_by(u.c.item_id), snap
+
+
+def prune_snapshots(db: Session, keep: int) -> int:
+    """Delete all but the `keep` newest periodic snapshots; closing ones are kept."""
+    S = models.StockSnapshot
+    old = db.execute(
+        select(S.id).where(S.kind == "periodic").order_by(S.taken_at.desc(), S.id.desc()).offset(keep)
+    ).scalars().all()
+    for sid in old:
+        db.execute(delete(models.StockSnapshotRow).where(models.StockSnapshotRow.snapshot_id == sid))
+        db.execute(delete(S).where(S.id == sid))
+    db.commit()
+    return len(old)
@@ -0,0 +1,130 @@
+# app/utils/user_cache.py
+"""
+In-process cache of authenticated principals for deps.get_current_user.
+
+- keyed by (sub, token version): the version is a per-user counter stored in
+  users.token_version and embedded in each access token as "ver"; bumping it
+  (password or admin-flag change) revokes older tokens and makes them miss
+- bounded LRU of USER_CACHE_SIZE entries, each kept at most
+  USER_CACHE_TTL_SECONDS, which bounds how long another worker can serve a
+  principal after a change made elsewhere
+- write-through invalidation: routers/users.py and routers/admin_users.py call
+  invalidate() after each committed change, so this worker is never stale
+
+Only positive lookups are cached; unknown users always go to the DB.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import config, models
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as the routers see it (same fields as schemas.UserResponse)."""
+    id: int
+    username: str
+    is_admin: bool
+    token_version: int = 0
+    name: str | None = None
+    email: str | None = None
+    role: str | None = None
+    created_at: datetime | None = None
+    # True when built from signed token claims only (AUTH_TRUST_TOKEN_CLAIMS): no profile fields
+    from_claims: bool = False
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            id=user.id, username=user.username, is_admin=bool(user.is_admin),
+            token_version=int(user.token_version or 0), name=user.name, email=user.email,
+            role=user.role, created_at=user.created_at,
+        )
+
+
+class UserCache:
+    def __init__(self, maxsize: int = 4096, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, int], tuple[float, Principal]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _cached(self, key: tuple[str, int], now: float) -> Principal | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def _store(self, key: tuple[str, int], now: float, user: models.User | None) -> Principal | None:
+        if user is None or int(user.token_version or 0) != key[1]:
+            return None
+        principal = Principal.from_user(user)
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (now + self.ttl, principal)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return principal
+
+    def get(self, db: Session, username: str, version: int) -> Principal | None:
+        """The principal for a token's (sub, ver), or None if the user is gone or the token revoked."""
+        key, now = (username, version), time.monotonic()
+        hit = self._cached(key, now)
+        if hit is not None:
+            return hit
+        user = db.execute(select(models.User).where(models.User.username == username)).scalars().first()
+        return self._store(key, now, user)
+
+    async def get_async(self, db: AsyncSession, username: str, version: int) -> Principal | None:
+        key, now = (username, version), time.monotonic()
+        hit = self._cached(key, now)
+        if hit is not None:
+            return hit
+        user = (await db.execute(select(models.User).where(models.User.username == username))).scalars().first()
+        return self._store(key, now, user)
+
+    def invalidate(self, *usernames: str) -> None:
+        """Drop every cached version of these users (or all, with no argument)."""
+        with self._lock:
+            self.invalidations += 1
+            if not usernames:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] in usernames]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+
+user_cache = UserCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL_SECONDS)
+
+
+def revoke_tokens(user: models.User) -> None:
+    """Bump the user's token version (before commit): tokens issued so far stop working."""
+    user.token_version = (user.token_version or 0) + 1
@@ -56,6 +56,9 @@ export async function getItems(params = {}) {
     const o = Number(params.offset);
     if (!Number.isNaN(o)) cleaned.offset = Math.max(0, o);
   }
+  // keyset paging: pass "" for the first page, then next_cursor.
+  // The response becomes { items, next_cursor } instead of a plain array.
+  if (typeof params.cursor === "string") cleaned.cursor = params.cursor;
 
   const res = await api.get("/items", { params: cleaned }); // "/items" is fine; FastAPI may 307 to "/items/"
   return res.data;
@@ -66,6 +69,42 @@ export async function getCategories({ q = "", limit = 50, offset = 0 } = {}) {
   return data;
 }
 
+/* -------------- Dashboard -------------- */
+export async function getDashboardSummary({ fresh = false } = {}) {
+  const { data } = await api.get("/dashboard/summary", { params: fresh ? { fresh: true } : {} });
+  return data; // { total_items, total_quantity, categories: [{ id, name, buffer, item_count, total_quantity, severity }] }
+}
+
+// scope: { itemId } | { categoryId } | {} for everything; params: { date_from, date_to, granularity: "day"|"week" }
+export async function getMovement(scope = {}, params = {}) {
+  const path = scope.itemId != null
+    ? `/dashboard/movement/items/${scope.itemId}`
+    : scope.categoryId != null
+      ? `/dashboard/movement/categories/${scope.categoryId}`
+      : "/dashboard/movement";
+  const { data } = await api.get(path, { params });
+  return data; // { scope, scope_id, granularity, date_from, date_to, points: [{ day, qty_in, qty_out, net, tx_count }] }
+}
+
+/* -------------- Inventory -------------- */
+// ts: ISO datetime; pass { item_id } or { category_id } for JSON, nothing for the streamed catalog
+export async function getStockAsOf(ts, params = {}) {
+  const { data } = await api.get("/inventory/as-of", { params: { ts, ...params } });
+  return data;
+}
+
+/* ------------- Transactions ------------- */
+// params: { item_id, performed_by, date_from, date_to, direction: "in"|"out", limit, cursor }
+export async function getTransactions(params = {}) {
+  const { data } = await api.get("/transactions", { params });
+  return data; // { transactions, next_cursor }
+}
+
+export async function getItemTransactions(itemId, params = {}) {
+  const { data } = await api.get(`/items/${itemId}/transactions`, { params });
+  return data; // { transactions, next_cursor }
+}
+
 /* ---------------- Items ---------------- */
 export async function createItem(payload) {
   const { data } = await api.post("/items", payload);
@@ -84,6 +123,11 @@ export async function adjustItem(id, change, note = "") {
   });
   return data;
 }
+// lines: [{ item_id, change, note }]; atomic=false applies the valid lines only
+export async function adjustItemsBatch(lines, { atomic = true, note = "" } = {}) {
+  const { data } = await api.post("/items/adjust/batch", { lines, atomic, note: note || null });
+  return data; // { applied, rejected, results: [...] }
+}
 
 /* -------------- Categories -------------- */
 export async function createCategory(payload) {
@@ -1,19 +1,12 @@
 // src/pages/Dashboard.jsx
 import { useMemo } from "react";
 import { useQuery } from "@tanstack/react-query";
-import { getItems, getCategories } from "../lib/api.js";
+import { getDashboardSummary } from "../lib/api.js";
 import { getUser } from "../lib/auth.js";
 import "./dashboard.css";
 
-function getCatSeverity(total, buffer) {
-  const b = Number(buffer || 0);
-  if (b <= 0) return { key: "ok", label: "OK" };
-  const ratio = total / b;
-  if (ratio < 0.5) return { key: "critical", label: "Critical" };
-  if (ratio < 1)   return { key: "low",      label: "Low" };
-  if (ratio < 1.25)return { key: "warn",     label: "Watch" };
-  return { key: "ok", label: "OK" };
-}
+// severity is computed server-side (GET /dashboard/summary)
+const SEVERITY_LABEL = { ok: "OK", warn: "Watch", low: "Low", critical: "Critical" };
 
 const pillStyle = {
   base: { display: "inline-block", padding: "4px 8px", borderRadius: 999, fontSize: 12, fontWeight: 600 },
@@ -34,42 +27,26 @@ export default function DashboardPage() {
   const user = getUser();
   const firstName = (user?.name || "").split(" ")[0] || "User";
 
-  const { data: items = [] } = useQuery({
-    queryKey: ["items"],
-    queryFn: getItems, // safe helper (no 1000 limit)
-  });
-
-  const { data: categories = [] } = useQuery({
-    queryKey: ["categories"],
-    queryFn: getCategories,
+  const { data: summary } = useQuery({
+    queryKey: ["dashboard-summary"],
+    queryFn: () => getDashboardSummary(),
   });
 
   // count of item records
-  const totalItems = items.length;
+  const totalItems = summary?.total_items ?? 0;
 
   // total quantity across ALL items
-  const totalQuantity = useMemo(
-    () => (items || []).reduce((sum, it) => sum + Number(it.quantity ?? 0), 0),
-    [items]
-  );
+  const totalQuantity = summary?.total_quantity ?? 0;
 
-  // Build totals per category
-  const totalsByCategory = useMemo(() => {
-    const m = new Map();
-    (items || []).forEach((it) => {
-      const cid = Number(it.category_id);
-      m.set(cid, (m.get(cid) || 0) + Number(it.quantity ?? 0));
-    });
-    return m;
-  }, [items]);
-
-  // Compute category statuses; keep only non-OK
+  // Category statuses from the server; keep only non-OK
   const attentionCats = useMemo(() => {
-    const rows = (categories || []).map((c) => {
-      const total = totalsByCategory.get(Number(c.id)) || 0;
-      const sev = getCatSeverity(total, c.buffer);
-      return { id: c.id, name: c.name, buffer: Number(c.buffer || 0), total, sev };
-    });
+    const rows = (summary?.categories || []).map((c) => ({
+      id: c.id,
+      name: c.name,
+      buffer: Number(c.buffer || 0),
+      total: Number(c.total_quantity || 0),
+      sev: { key: c.severity, label: SEVERITY_LABEL[c.severity] || c.severity },
+    }));
     const filtered = rows.filter((r) => r.sev.key !== "ok");
     const order = { critical: 3, low: 2, warn: 1, ok: 0 };
     filtered.sort((a, b) => {
@@ -80,7 +57,7 @@ export default function DashboardPage() {
       return db - da;
     });
     return filtered;
-  }, [categories, totalsByCategory]);
+  }, [summary]);
 
   return (
     <section className="dash-wrap">
@@ -4,6 +4,7 @@ import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import {
   getItems,
   getCategories,
+  getDashboardSummary,
   updateCategory,
   createCategory,
   deleteCategory,
@@ -53,16 +54,20 @@ export default function ProductCategoryPage() {
   const [showEditCat, setShowEditCat] = useState(false);  // <-- renamed
   const [showConfirmDel, setShowConfirmDel] = useState(false);
 
+  // per-category totals come from the server-side GROUP BY
+  const { data: summary } = useQuery({
+    queryKey: ["dashboard-summary"],
+    queryFn: () => getDashboardSummary(),
+  });
+
   /* ---------- totals per category (cid -> total qty) ---------- */
   const totalsByCategory = useMemo(() => {
     const map = new Map();
-    (items || []).forEach((it) => {
-      const cid = Number(it.category_id);
-      const prev = map.get(cid) || 0;
-      map.set(cid, prev + Number(it.quantity ?? 0));
+    (summary?.categories || []).forEach((c) => {
+      map.set(Number(c.id), Number(c.total_quantity ?? 0));
     });
     return map;
-  }, [items]);
+  }, [summary]);
 
   /* ---------- categories shown on the left (respect onlyLow) ---------- */
   const visibleCats = useMemo(() => {
@@ -97,6 +102,7 @@ export default function ProductCategoryPage() {
     onSuccess: () => {
       qc.invalidateQueries({ queryKey: ["categories"] });
       qc.invalidateQueries({ queryKey: ["items"] });
+      qc.invalidateQueries({ queryKey: ["dashboard-summary"] });
       setShowEditCat(false);
     },
   });
@@ -117,6 +123,7 @@ export default function ProductCategoryPage() {
       setActiveId(null);
       qc.invalidateQueries({ queryKey: ["categories"] });
       qc.invalidateQueries({ queryKey: ["items"] });
+      qc.invalidateQueries({ queryKey: ["dashboard-summary"] });
     },
   });
 
@@ -138,12 +145,7 @@ export default function ProductCategoryPage() {
     });
   }, [items, activeCat, needle, onlyLow]);
 
-  const totalQtyInCat = useMemo(() => {
-    if (!activeCat) return 0;
-    return (items || [])
-      .filter((it) => Number(it.category_id) === Number(activeCat.id))
-      .reduce((sum, it) => sum + Number(it.quantity ?? 0), 0);
-  }, [items, activeCat]);
+  const totalQtyInCat = activeCat ? totalsByCategory.get(Number(activeCat.id)) || 0 : 0;
 
   const canDeleteActive = !!activeCat && totalQtyInCat === 0;
 
@@ -158,6 +160,7 @@ export default function ProductCategoryPage() {
             onClick={() => {
               qc.invalidateQueries({ queryKey: ["categories"] });
               qc.invalidateQueries({ queryKey: ["items"] });
+              qc.invalidateQueries({ queryKey: ["dashboard-summary"] });
             }}
           >
             Refresh